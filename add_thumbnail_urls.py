@@ -19,6 +19,7 @@ import requests
 from bs4 import BeautifulSoup
 from urllib.parse import unquote, urlparse, parse_qs
 import hashlib
+from http_cache import CachedSession, commons_endpoint
 
 # Configure logging
 logging.basicConfig(
@@ -33,12 +34,14 @@ logging.basicConfig(
 INPUT_CSV = "aircraft_images.csv"
 OUTPUT_CSV = "aircraft_images_with_thumbnails.csv"
 
-def get_thumbnail_url(commons_url):
+def get_thumbnail_url(commons_url, session=None):
     """
     Extract the lowest resolution thumbnail URL from a Wikimedia Commons page.
     
     Args:
         commons_url (str): The URL of the Wikimedia Commons page
+        session (requests.Session): Session to use, e.g. a CachedSession
+            (default: plain requests calls)
         
     Returns:
         str: The URL of the lowest resolution thumbnail, or None if not found
@@ -46,8 +49,9 @@ def get_thumbnail_url(commons_url):
     if not commons_url or not commons_url.startswith("https://commons.wikimedia.org/wiki/File:"):
         return None
     
+    http = session if session is not None else requests
     try:
-        response = requests.get(commons_url)
+        response = http.get(commons_endpoint(commons_url))
         if response.status_code != 200:
             logging.warning(f"Failed to get page: {commons_url}, status code: {response.status_code}")
             return None
@@ -75,7 +79,7 @@ def get_thumbnail_url(commons_url):
             thumbnail_url = f"https://upload.wikimedia.org/wikipedia/commons/thumb/{hash_path}/{filename}/320px-{filename}"
             
             # Verify if the thumbnail exists
-            thumb_response = requests.head(thumbnail_url)
+            thumb_response = http.head(thumbnail_url)
             if thumb_response.status_code == 200:
                 return thumbnail_url
         
@@ -106,7 +110,9 @@ def add_thumbnail_urls():
     """
     parser = argparse.ArgumentParser(description='Add thumbnail URLs to aircraft images CSV')
     parser.add_argument('--test', type=str, help='Test with a specific aircraft code')
+    parser.add_argument('--no-cache', action='store_true', help='Fetch every page instead of using the on-disk HTTP cache')
     args = parser.parse_args()
+    session = None if args.no_cache else CachedSession()
     
     # Read the input CSV
     try:
@@ -152,7 +158,7 @@ def add_thumbnail_urls():
         
         if commons_url:
             logging.info(f"Processing {icao_code}: {commons_url}")
-            thumbnail_url = get_thumbnail_url(commons_url)
+            thumbnail_url = get_thumbnail_url(commons_url, session)
             
             if thumbnail_url:
                 # Make sure the row is long enough
@@ -170,6 +176,9 @@ def add_thumbnail_urls():
         else:
             logging.warning(f"No commons URL found for {icao_code}")
             
+        if session is not None:
+            logging.info(session.cache.stats.report())
+            session.close()
         # Don't write to file in test mode
         return
     
@@ -182,7 +191,7 @@ def add_thumbnail_urls():
         
         if commons_url:
             logging.info(f"Processing {icao_code}: {commons_url}")
-            thumbnail_url = get_thumbnail_url(commons_url)
+            thumbnail_url = get_thumbnail_url(commons_url, session)
             
             if thumbnail_url:
                 # Make sure the row is long enough
@@ -207,6 +216,10 @@ def add_thumbnail_urls():
         if processed_count % 10 == 0:
             logging.info(f"Progress: {processed_count} entries processed, {success_count} thumbnail URLs found")
     
+    if session is not None:
+        logging.info(session.cache.stats.report())
+        session.close()
+    
     # Write the output file
     try:
         with open(OUTPUT_CSV, 'w', newline='', encoding='utf-8') as file:
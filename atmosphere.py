@@ -0,0 +1,269 @@
+"""
+International Standard Atmosphere (ISA) model.
+
+Implements the U.S. Standard Atmosphere 1976, which matches the ICAO ISA up
+to 32 km, from -5 km to 86 km geometric altitude (84 852 m geopotential),
+with an optional ISA+ΔT temperature offset. Every function accepts either
+scalars or NumPy arrays of altitudes; scalars are evaluated with the math
+module so per-record callers do not pay NumPy call overhead.
+
+For large altitude arrays, IsaTable precomputes temperature and log-pressure
+at fixed steps and evaluates by linear interpolation, with an error bound
+derived from the layer lapse rates.
+"""
+
+import math
+from functools import lru_cache
+from typing import NamedTuple, Union
+
+import numpy as np
+
+# Physical constants of the 1976 standard
+G0 = 9.80665        # Standard gravitational acceleration in m/s²
+R_AIR = 287.05287   # Specific gas constant for dry air in J/(kg·K)
+GAMMA = 1.4         # Ratio of specific heats for air
+EARTH_RADIUS_M = 6356766.0  # Effective Earth radius for geopotential altitude
+
+# Layer base geopotential altitudes (m) and temperature lapse rates (K/m)
+LAYER_BASES_M = (0.0, 11000.0, 20000.0, 32000.0, 47000.0, 51000.0, 71000.0)
+LAYER_LAPSE_RATES = (-0.0065, 0.0, 0.001, 0.0028, 0.0, -0.0028, -0.002)
+
+# Valid geopotential altitude range of the model, -5 km to 86 km geometric
+MIN_ALTITUDE_M = EARTH_RADIUS_M * -5000.0 / (EARTH_RADIUS_M - 5000.0)
+MAX_ALTITUDE_M = EARTH_RADIUS_M * 86000.0 / (EARTH_RADIUS_M + 86000.0)
+
+# Sea level conditions
+SEA_LEVEL_TEMPERATURE = 288.15   # K
+SEA_LEVEL_PRESSURE = 101325.0    # Pa
+
+
+def _layer_base_conditions():
+    """Integrate the hydrostatic equation up the layers once, at import."""
+    temperatures = [SEA_LEVEL_TEMPERATURE]
+    pressures = [SEA_LEVEL_PRESSURE]
+    for i in range(len(LAYER_BASES_M) - 1):
+        T_base, P_base, lapse = temperatures[i], pressures[i], LAYER_LAPSE_RATES[i]
+        thickness = LAYER_BASES_M[i + 1] - LAYER_BASES_M[i]
+        T_top = T_base + lapse * thickness
+        if lapse == 0:
+            P_top = P_base * math.exp(-G0 * thickness / (R_AIR * T_base))
+        else:
+            P_top = P_base * (T_base / T_top) ** (G0 / (R_AIR * lapse))
+        temperatures.append(T_top)
+        pressures.append(P_top)
+    return tuple(temperatures), tuple(pressures)
+
+
+LAYER_BASE_TEMPERATURES, LAYER_BASE_PRESSURES = _layer_base_conditions()
+
+SEA_LEVEL_DENSITY = SEA_LEVEL_PRESSURE / (R_AIR * SEA_LEVEL_TEMPERATURE)
+SEA_LEVEL_SPEED_OF_SOUND = math.sqrt(GAMMA * R_AIR * SEA_LEVEL_TEMPERATURE)
+
+# Array versions of the layer tables for the vectorized path
+_BASES = np.array(LAYER_BASES_M)
+_LAPSES = np.array(LAYER_LAPSE_RATES)
+_BASE_T = np.array(LAYER_BASE_TEMPERATURES)
+_BASE_P = np.array(LAYER_BASE_PRESSURES)
+
+Number = Union[float, np.ndarray]
+
+
+class AtmosphereState(NamedTuple):
+    """Atmospheric conditions, as floats or arrays matching the input."""
+    temperature_K: Number
+    pressure_Pa: Number
+    density_kgm3: Number
+    speed_of_sound_ms: Number
+
+
+def geopotential_altitude(geometric_altitude_m: Number) -> Number:
+    """
+    Convert geometric altitude to geopotential altitude.
+
+    Parameters:
+    geometric_altitude_m (float or np.ndarray): Geometric altitude in meters
+
+    Returns:
+    float or np.ndarray: Geopotential altitude in meters
+    """
+    return EARTH_RADIUS_M * geometric_altitude_m / (EARTH_RADIUS_M + geometric_altitude_m)
+
+
+def _is_scalar(value) -> bool:
+    return isinstance(value, (int, float)) or np.ndim(value) == 0
+
+
+def _check_range(altitude_m: Number) -> None:
+    if isinstance(altitude_m, float):
+        in_range = MIN_ALTITUDE_M <= altitude_m <= MAX_ALTITUDE_M
+    else:
+        in_range = not (np.any(altitude_m < MIN_ALTITUDE_M) | np.any(altitude_m > MAX_ALTITUDE_M) | np.any(np.isnan(altitude_m)))
+    if not in_range:
+        raise ValueError(
+            f"altitude outside the ISA model range "
+            f"[{MIN_ALTITUDE_M:.1f}, {MAX_ALTITUDE_M:.1f}] m geopotential"
+        )
+
+
+def _standard_scalar(altitude_m: float):
+    """Standard temperature and pressure at one geopotential altitude."""
+    layer = 0
+    while layer + 1 < len(LAYER_BASES_M) and altitude_m >= LAYER_BASES_M[layer + 1]:
+        layer += 1
+    T_base = LAYER_BASE_TEMPERATURES[layer]
+    lapse = LAYER_LAPSE_RATES[layer]
+    height = altitude_m - LAYER_BASES_M[layer]
+    T = T_base + lapse * height
+    if lapse == 0:
+        P = LAYER_BASE_PRESSURES[layer] * math.exp(-G0 * height / (R_AIR * T_base))
+    else:
+        P = LAYER_BASE_PRESSURES[layer] * (T_base / T) ** (G0 / (R_AIR * lapse))
+    return T, P
+
+
+def _standard_array(altitude_m: np.ndarray):
+    """Standard temperature and pressure for an array of geopotential altitudes."""
+    layer = np.clip(np.searchsorted(_BASES, altitude_m, side='right') - 1, 0, len(_BASES) - 1)
+    T_base = _BASE_T[layer]
+    lapse = _LAPSES[layer]
+    height = altitude_m - _BASES[layer]
+    T = T_base + lapse * height
+    isothermal = lapse == 0
+    safe_lapse = np.where(isothermal, 1.0, lapse)
+    P = _BASE_P[layer] * np.where(
+        isothermal,
+        np.exp(-G0 * height / (R_AIR * T_base)),
+        (T_base / T) ** (G0 / (R_AIR * safe_lapse))
+    )
+    return T, P
+
+
+def isa_atmosphere(altitude_m: Number, delta_T: Number = 0.0, geometric: bool = False) -> AtmosphereState:
+    """
+    Compute temperature, pressure, density and speed of sound in the ISA.
+
+    With a temperature offset the pressure still follows the standard
+    profile (ISA+ΔT convention), and density and speed of sound use the
+    offset temperature.
+
+    Parameters:
+    altitude_m (float or np.ndarray): Altitude in meters
+    delta_T (float or np.ndarray): Temperature offset from ISA in K
+    geometric (bool): Treat altitude_m as geometric rather than geopotential
+
+    Returns:
+    AtmosphereState: Conditions as floats for scalar input, arrays otherwise
+
+    Raises:
+    ValueError: If an altitude lies outside the model range
+    """
+    if _is_scalar(altitude_m) and _is_scalar(delta_T):
+        altitude_m = float(altitude_m)
+        if geometric:
+            altitude_m = geopotential_altitude(altitude_m)
+        _check_range(altitude_m)
+        T, P = _standard_scalar(altitude_m)
+        T += delta_T
+        return AtmosphereState(T, P, P / (R_AIR * T), math.sqrt(GAMMA * R_AIR * T))
+
+    altitude_m = np.asarray(altitude_m, dtype=float)
+    if geometric:
+        altitude_m = geopotential_altitude(altitude_m)
+    _check_range(altitude_m)
+    T, P = _standard_array(altitude_m)
+    T = T + delta_T
+    P = np.broadcast_to(P, np.shape(T))
+    return AtmosphereState(T, P, P / (R_AIR * T), np.sqrt(GAMMA * R_AIR * T))
+
+
+def isa_density(altitude_m: Number, delta_T: Number = 0.0, geometric: bool = False) -> Number:
+    """
+    Compute air density in the ISA.
+
+    Parameters:
+    altitude_m (float or np.ndarray): Altitude in meters
+    delta_T (float or np.ndarray): Temperature offset from ISA in K
+    geometric (bool): Treat altitude_m as geometric rather than geopotential
+
+    Returns:
+    float or np.ndarray: Air density in kg/m³
+    """
+    return isa_atmosphere(altitude_m, delta_T, geometric).density_kgm3
+
+
+class IsaTable:
+    """
+    Precomputed ISA lookup table evaluated by linear interpolation.
+
+    Nodes are spaced uniformly from sea level, so a lookup is a multiply and
+    an index instead of a search, and every layer base is a node. Since
+    temperature is piecewise linear between layer bases, interpolated
+    temperatures (and speeds of sound) are exact. Log-pressure is exactly
+    linear in the isothermal layers and elsewhere has curvature at most
+    g·|L| / (R·T²), so the relative error of pressure and density is bounded
+    by step² · max(g·|L| / (R·T²)) / 8. That bound is stored in
+    max_relative_error; it is about 5.9e-8 for the default 10 m step.
+    """
+
+    def __init__(self, step_m: float = 10.0):
+        """
+        Build the table over the full model range.
+
+        Parameters:
+        step_m (float): Spacing between table nodes in meters; must divide
+            1000 m so that the layer bases fall on nodes
+        """
+        if step_m <= 0 or 1000.0 % step_m != 0:
+            raise ValueError("step_m must be a positive divisor of 1000 m")
+        self.step_m = step_m
+        first = math.floor(MIN_ALTITUDE_M / step_m)
+        last = math.ceil(MAX_ALTITUDE_M / step_m)
+        self.origin_m = first * step_m
+        altitudes = np.arange(first, last + 1) * step_m
+        temperatures, pressures = _standard_array(altitudes)
+        log_pressures = np.log(pressures)
+        # Store each cell as value at its lower node plus slope per meter
+        self._temperatures = temperatures[:-1]
+        self._temperature_slopes = np.diff(temperatures) / step_m
+        self._log_pressures = log_pressures[:-1]
+        self._log_pressure_slopes = np.diff(log_pressures) / step_m
+
+        curvature = 0.0
+        for i, lapse in enumerate(LAYER_LAPSE_RATES):
+            if lapse != 0:
+                top = LAYER_BASES_M[i + 1] if i + 1 < len(LAYER_BASES_M) else MAX_ALTITUDE_M
+                coldest = min(LAYER_BASE_TEMPERATURES[i], _standard_scalar(top)[0])
+                curvature = max(curvature, G0 * abs(lapse) / (R_AIR * coldest ** 2))
+        self.max_relative_error = math.expm1(step_m ** 2 * curvature / 8)
+
+    def __call__(self, altitude_m: Number, delta_T: Number = 0.0, geometric: bool = False) -> AtmosphereState:
+        """
+        Evaluate the table; see isa_atmosphere for the parameters.
+
+        Returns:
+        AtmosphereState: Conditions as floats for scalar input, arrays otherwise
+
+        Raises:
+        ValueError: If an altitude lies outside the model range
+        """
+        scalar = _is_scalar(altitude_m) and _is_scalar(delta_T)
+        altitude_m = np.asarray(altitude_m, dtype=float)
+        if geometric:
+            altitude_m = geopotential_altitude(altitude_m)
+        _check_range(altitude_m)
+        offset = altitude_m - self.origin_m
+        cell = np.minimum((offset / self.step_m).astype(np.intp), len(self._temperatures) - 1)
+        height = offset - cell * self.step_m
+        T = self._temperatures[cell] + self._temperature_slopes[cell] * height + delta_T
+        P = np.exp(self._log_pressures[cell] + self._log_pressure_slopes[cell] * height)
+        P = np.broadcast_to(P, np.shape(T))
+        state = AtmosphereState(T, P, P / (R_AIR * T), np.sqrt(GAMMA * R_AIR * T))
+        if scalar:
+            return AtmosphereState(*(float(value) for value in state))
+        return state
+
+
+@lru_cache(maxsize=None)
+def default_table() -> IsaTable:
+    """Return a shared full-range IsaTable with the default step, built on first use."""
+    return IsaTable()
@@ -0,0 +1,508 @@
+"""
+Single-pass extraction of attribution fields from Commons description pages.
+
+wiki_image_scraper used to answer each of its questions about a page
+(author, license, date, public-domain markers, ...) with a separate
+BeautifulSoup search, many of them walking every text node of the
+document. Here the page is parsed once with html.parser.HTMLParser into a
+minimal tree that records each node's position in document order, and the
+parse also builds the indexes those questions need: elements by tag name
+and by id, and the list of strings. Searching "the next <td> after this
+node" then becomes a binary search in the list of <td> elements, and all
+text-marker checks share a single scan of the strings.
+
+The tree reproduces the parts of BeautifulSoup's html.parser behaviour the
+extraction depends on (void elements, end tags closing the nearest open
+element of the same name, whitespace-only strings collapsed to ' ' or '\\n',
+entity handling, the .string and get_text(strip=True) rules and which
+strings count as text), so extract_fields returns exactly what the
+BeautifulSoup implementation it replaced returns for the same page. That
+implementation lives on in scripts/benchmark_attribution.py, which checks
+the two agree and compares their speed.
+"""
+
+import itertools
+import re
+from bisect import bisect_right
+from html.entities import html5
+from html.parser import HTMLParser
+from typing import Dict, Iterator, List, Optional
+
+# Elements that never have content, as BeautifulSoup's HTML tree builder knows them
+VOID_ELEMENTS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link',
+    'menuitem', 'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound',
+    'command', 'frame', 'image', 'isindex', 'nextid', 'spacer',
+))
+# Elements whose strings are kept apart from the document text (BeautifulSoup's
+# Script, Stylesheet, TemplateString and ruby string classes)
+STRING_CONTAINERS = frozenset(('script', 'style', 'template', 'rt', 'rp'))
+PRESERVE_WHITESPACE = frozenset(('pre', 'textarea'))
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+# String kinds that are not part of any element's text
+NON_TEXT_KINDS = frozenset(('comment', 'doctype', 'declaration', 'pi'))
+
+PD_MARKERS = (
+    'This file is in the public domain',
+    'This work is in the public domain',
+    'Public domain',
+    'PD-old',
+    'Creative Commons Public Domain Mark',
+    'CC0',
+    'CC-Zero',
+)
+GFDL_MARKER = 'GNU Free Documentation License'
+
+
+class Text:
+    """A string in the document; kind is 'text', a container tag name or a non-text kind."""
+
+    __slots__ = ('value', 'kind', 'parent', 'order')
+
+    def __init__(self, value: str, kind: str, parent: 'Element', order: int):
+        self.value = value
+        self.kind = kind
+        self.parent = parent
+        self.order = order
+
+    def get_text(self) -> str:
+        """Return the stripped string, or '' for comments and declarations."""
+        return '' if self.kind in NON_TEXT_KINDS else self.value.strip()
+
+
+class Element:
+    """An element with its children; order and end bound its subtree in document order."""
+
+    __slots__ = ('name', 'attrs', 'classes', 'children', 'parent', 'order', 'end')
+
+    def __init__(self, name: str, attrs: Dict[str, str], parent: Optional['Element'], order: int):
+        self.name = name
+        self.attrs = attrs
+        self.classes = attrs['class'].split() if 'class' in attrs else []
+        self.children = []
+        self.parent = parent
+        self.order = order
+        self.end = order
+
+    def has_class(self, name: str) -> bool:
+        """Match a class the way BeautifulSoup's class_ argument does."""
+        return name in self.classes or (len(self.classes) > 1 and ' '.join(self.classes) == name)
+
+    @property
+    def string(self) -> Optional[str]:
+        """The element's only string, looking through elements with a single child."""
+        node = self
+        while isinstance(node, Element):
+            if len(node.children) != 1:
+                return None
+            node = node.children[0]
+        return node.value
+
+    def strings(self) -> Iterator[Text]:
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, Text):
+                yield node
+            else:
+                stack.extend(reversed(node.children))
+
+    def get_text(self) -> str:
+        """Concatenate the stripped, non-empty text of the subtree."""
+        kind = self.name if self.name in STRING_CONTAINERS else 'text'
+        parts = []
+        for node in self.strings():
+            if node.kind == kind:
+                value = node.value.strip()
+                if value:
+                    parts.append(value)
+        return ''.join(parts)
+
+    def next_sibling(self):
+        siblings = self.parent.children
+        index = next(i for i, child in enumerate(siblings) if child is self)
+        return siblings[index + 1] if index + 1 < len(siblings) else None
+
+
+class Document:
+    """A parsed page with elements indexed by tag name and id."""
+
+    def __init__(self, html: str):
+        builder = _TreeBuilder()
+        builder.feed(html)
+        builder.close()
+        self.root = builder.finish()
+        self.by_tag: Dict[str, List[Element]] = builder.by_tag
+        self.by_id: Dict[str, List[Element]] = builder.by_id
+        self.strings: List[Text] = builder.strings
+        self._orders = {name: [element.order for element in elements] for name, elements in self.by_tag.items()}
+
+    def find(self, name: str, within: Element = None, **attrs) -> Optional[Element]:
+        """First element with the tag name (inside within, if given) matching every attribute."""
+        return next(self.find_all(name, within, **attrs), None)
+
+    def find_all(self, name: str, within: Element = None, **attrs) -> Iterator[Element]:
+        """
+        Elements with the tag name in document order.
+
+        Parameters:
+        name (str): Tag name
+        within (Element): Only search this element's subtree
+        attrs: id=... for an exact id, class_=... for a class, and
+            string=<callable> to test the element's .string
+        """
+        element_id = attrs.get('id')
+        if element_id is not None:
+            candidates = self.by_id.get(element_id, ())
+        elif within is not None:
+            # A subtree is a contiguous range of document order
+            start = bisect_right(self._orders.get(name, ()), within.order)
+            candidates = itertools.islice(self.by_tag.get(name, ()), start, None)
+        else:
+            candidates = self.by_tag.get(name, ())
+        class_name = attrs.get('class_')
+        string_test = attrs.get('string')
+        for element in candidates:
+            if within is not None and not within.order < element.order <= within.end:
+                if element.order > within.end:
+                    break
+                continue
+            if element.name != name:
+                continue
+            if class_name is not None and not element.has_class(class_name):
+                continue
+            if string_test is not None:
+                string = element.string
+                if string is None or not string_test(string):
+                    continue
+            yield element
+
+    def find_next(self, node, *names: str) -> Optional[Element]:
+        """First element with one of the tag names after node (its own descendants included)."""
+        found = None
+        for name in names:
+            orders = self._orders.get(name)
+            if not orders:
+                continue
+            index = bisect_right(orders, node.order)
+            if index < len(orders) and (found is None or orders[index] < found.order):
+                found = self.by_tag[name][index]
+        return found
+
+
+class _TreeBuilder(HTMLParser):
+    """Builds a Document's tree and indexes in one pass, with BeautifulSoup's html.parser rules."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.order = 0
+        self.root = Element('[document]', {}, None, 0)
+        self.stack = [self.root]
+        self.containers = []
+        self.preserving = 0
+        self.pending = []
+        self.closed_voids = []
+        self.by_tag: Dict[str, List[Element]] = {}
+        self.by_id: Dict[str, List[Element]] = {}
+        self.strings: List[Text] = []
+
+    def _next_order(self) -> int:
+        self.order += 1
+        return self.order
+
+    def _flush(self, kind: str = None) -> None:
+        if not self.pending:
+            return
+        value = ''.join(self.pending)
+        self.pending = []
+        if not value.translate(_ASCII_SPACE_TABLE) and not self.preserving:
+            value = '\n' if '\n' in value else ' '
+        if kind is None:
+            kind = self.containers[-1] if self.containers else 'text'
+        parent = self.stack[-1]
+        node = Text(value, kind, parent, self._next_order())
+        parent.children.append(node)
+        self.strings.append(node)
+
+    def _special(self, value: str, kind: str) -> None:
+        self._flush()
+        self.pending.append(value)
+        self._flush(kind)
+
+    def handle_starttag(self, tag, attrs):
+        self._open(tag, attrs)
+        if tag in VOID_ELEMENTS:
+            self._close(tag)
+            # A later </br> for this <br> is ignored without even ending the current string
+            self.closed_voids.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._open(tag, attrs)
+        self._close(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.closed_voids:
+            self.closed_voids.remove(tag)
+        else:
+            self._close(tag)
+
+    def _open(self, tag, attrs):
+        self._flush()
+        attributes = {name: value if value is not None else '' for name, value in attrs}
+        parent = self.stack[-1]
+        element = Element(tag, attributes, parent, self._next_order())
+        parent.children.append(element)
+        self.stack.append(element)
+        self.by_tag.setdefault(tag, []).append(element)
+        if 'id' in attributes:
+            self.by_id.setdefault(attributes['id'], []).append(element)
+        if tag in STRING_CONTAINERS:
+            self.containers.append(tag)
+        if tag in PRESERVE_WHITESPACE:
+            self.preserving += 1
+
+    def _close(self, tag):
+        """Close the most recently opened element with this name, and everything inside it."""
+        self._flush()
+        for depth in range(len(self.stack) - 1, 0, -1):
+            if self.stack[depth].name == tag:
+                break
+        else:
+            return
+        while len(self.stack) > depth:
+            self._pop()
+
+    def _pop(self):
+        element = self.stack.pop()
+        element.end = self.order
+        if element.name in STRING_CONTAINERS:
+            self.containers.pop()
+        if element.name in PRESERVE_WHITESPACE:
+            self.preserving -= 1
+
+    def handle_data(self, data):
+        self.pending.append(data)
+
+    def handle_entityref(self, name):
+        character = html5.get(name + ';')
+        self.handle_data(character if character is not None else '&' + name)
+
+    def handle_charref(self, name):
+        if name[:1] in ('x', 'X'):
+            codepoint = int(name.lstrip('xX'), 16)
+        else:
+            codepoint = int(name)
+        data = None
+        if codepoint < 256:
+            # Numeric references below 256 are read as windows-1252, like BeautifulSoup does
+            try:
+                data = bytes([codepoint]).decode('windows-1252')
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(codepoint)
+            except (ValueError, OverflowError):
+                pass
+        self.handle_data(data or '\N{REPLACEMENT CHARACTER}')
+
+    def handle_comment(self, data):
+        self._special(data, 'comment')
+
+    def handle_decl(self, data):
+        self._special(data[len('DOCTYPE '):], 'doctype')
+
+    def unknown_decl(self, data):
+        if data.upper().startswith('CDATA['):
+            self._special(data[len('CDATA['):], 'text')
+        else:
+            self._special(data, 'declaration')
+
+    def handle_pi(self, data):
+        self._special(data, 'pi')
+
+    def finish(self) -> Element:
+        self._flush()
+        while len(self.stack) > 1:
+            self._pop()
+        self.root.end = self.order
+        return self.root
+
+
+_ASCII_SPACE_TABLE = {ord(c): None for c in ASCII_SPACES}
+
+_AUTHOR_HEADER = re.compile(r'Author|Creator|Photographer', re.IGNORECASE)
+_LICENSE_HEADER = re.compile(r'License|Copyright', re.IGNORECASE)
+_DESCRIPTION_HEADER = re.compile(r'Description', re.IGNORECASE)
+_DATE_HEADER = re.compile(r'Date', re.IGNORECASE)
+_SOURCE_HEADER = re.compile(r'Source', re.IGNORECASE)
+
+
+class _StringScan:
+    """The first string containing each marker the extraction looks for, from one scan."""
+
+    def __init__(self, strings: List[Text]):
+        self.copyright_license = None
+        self.creator = None
+        self.public_domain = None
+        self.gfdl = None
+        for node in strings:
+            value = node.value
+            lowered = value.lower()
+            if self.copyright_license is None and 'copyright license' in lowered:
+                self.copyright_license = node
+            if self.creator is None and 'creator' in lowered:
+                self.creator = node
+            if self.public_domain is None and any(marker in value for marker in PD_MARKERS):
+                self.public_domain = node
+            if self.gfdl is None and GFDL_MARKER in value:
+                self.gfdl = node
+
+
+def extract_fields(html: str, description_url: str) -> Dict[str, Optional[str]]:
+    """
+    Extract the attribution fields of a Commons description page.
+
+    Parameters:
+    html (str): The description page
+    description_url (str): Its URL, stored as the 'url' field
+
+    Returns:
+    dict: author, license, description, date, source, url and
+        formatted_attribution, before whitespace clean-up
+    """
+    doc = Document(html)
+    author_info = {
+        "author": None,
+        "license": None,
+        "description": None,
+        "date": None,
+        "source": None,
+        "url": description_url,
+        "formatted_attribution": None,
+    }
+    scan = None
+
+    attribution_input = doc.find('input', id='stockphoto_attribution')
+    if attribution_input and attribution_input.attrs.get('value'):
+        author_info["formatted_attribution"] = attribution_input.attrs['value']
+
+    def cell_after(node) -> Optional[str]:
+        cell = doc.find_next(node, 'td') if node else None
+        return cell.get_text() if cell else None
+
+    # Method 1: the information template table
+    info_section = doc.find('table', class_='fileinfotpl-type-information')
+    if info_section:
+        author_td = doc.find('td', id='fileinfotpl_aut')
+        if author_td and doc.find_next(author_td, 'td'):
+            author_info["author"] = cell_after(author_td)
+        else:
+            header = doc.find('th', info_section, string=_AUTHOR_HEADER.search)
+            if header and doc.find_next(header, 'td'):
+                author_info["author"] = cell_after(header)
+        for key, pattern in (("license", _LICENSE_HEADER), ("description", _DESCRIPTION_HEADER),
+                             ("date", _DATE_HEADER), ("source", _SOURCE_HEADER)):
+            header = doc.find('th', info_section, string=pattern.search)
+            if header and doc.find_next(header, 'td'):
+                author_info[key] = cell_after(header)
+
+    # Method 2: the credit line
+    if not author_info["author"]:
+        credit_div = doc.find('div', class_='commons-file-information-credit')
+        if credit_div:
+            author_info["author"] = credit_div.get_text()
+
+    # Method 3: structured data
+    if doc.find('h2', string=lambda s: 'Structured data' in s):
+        scan = _StringScan(doc.strings)
+        for key, node in (("license", scan.copyright_license), ("author", scan.creator)):
+            if node:
+                element = doc.find_next(node, 'a', 'div', 'span')
+                if element:
+                    text = element.get_text()
+                    if text and not author_info[key]:
+                        author_info[key] = text
+
+    # Method 4: license templates
+    if not author_info["license"]:
+        scan = scan or _StringScan(doc.strings)
+        if scan.public_domain:
+            author_info["license"] = "Public Domain"
+        elif scan.gfdl:
+            version_match = re.search(r'Version (\d+\.\d+)', scan.gfdl.value)
+            if version_match:
+                author_info["license"] = f"GNU Free Documentation License, version {version_match.group(1)}"
+            else:
+                author_info["license"] = "GNU Free Documentation License"
+        else:
+            for template in doc.find_all('div', class_='licensetpl'):
+                template_text = template.get_text()
+                if template_text:
+                    author_info["license"] = template_text
+                    break
+
+    # Method 5: paragraphs of the page body
+    if not any(author_info.values()):
+        file_info = doc.find('div', class_='mw-parser-output')
+        if file_info:
+            paragraphs = [p.get_text() for p in doc.find_all('p', file_info)]
+            for p_text in paragraphs:
+                lowered = p_text.lower()
+                if 'author' in lowered or 'creator' in lowered or 'photographer' in lowered:
+                    author_info["author"] = p_text
+                    break
+            if not author_info["license"]:
+                for p_text in paragraphs:
+                    lowered = p_text.lower()
+                    if 'public domain' in lowered or 'pd-old' in lowered or 'cc0' in lowered:
+                        author_info["license"] = "Public Domain"
+                        break
+
+    # Method 6: other information template tables
+    if not any(author_info.values()):
+        for table in doc.find_all('table'):
+            if not any('fileinfotpl' in name for name in table.classes):
+                continue
+            for row in doc.find_all('tr', table):
+                header = doc.find('th', row)
+                if not header:
+                    continue
+                header_text = header.get_text().lower()
+                value = doc.find('td', row)
+                if not value:
+                    continue
+                value_text = value.get_text()
+                if 'author' in header_text or 'creator' in header_text or 'photographer' in header_text:
+                    author_info["author"] = value_text
+                elif 'license' in header_text or 'copyright' in header_text:
+                    author_info["license"] = value_text
+                elif 'description' in header_text:
+                    author_info["description"] = value_text
+                elif 'date' in header_text:
+                    author_info["date"] = value_text
+                elif 'source' in header_text:
+                    author_info["source"] = value_text
+
+    # Method 7: labelled spans in the page content
+    metadata_section = doc.find('div', id='mw-imagepage-content')
+    if metadata_section and not any(author_info.values()):
+        for span in doc.find_all('span', metadata_section):
+            span_text = span.get_text().lower()
+            if 'author' in span_text or 'creator' in span_text:
+                next_sibling = span.next_sibling()
+                # An empty string is falsy, like BeautifulSoup's NavigableString
+                if isinstance(next_sibling, Element) or (next_sibling and next_sibling.value):
+                    author_info["author"] = next_sibling.get_text()
+
+    # Method 8: the author cell and a Photographer row
+    if not author_info["author"]:
+        author_td = doc.find('td', id='fileinfotpl_aut')
+        if author_td and doc.find_next(author_td, 'td'):
+            author_info["author"] = cell_after(author_td)
+        photographer_row = doc.find('th', string=lambda s: s == 'Photographer')
+        if photographer_row and doc.find_next(photographer_row, 'td'):
+            author_info["author"] = cell_after(photographer_row)
+
+    return author_info
@@ -0,0 +1,8 @@
+"""
+Benchmark suite for the processing, scraping, sync and serving hot paths.
+
+Cases live in benchmarks/cases.py and are registered with
+benchmarks.harness.case; the harness times them, saves the results with a
+description of the machine, and compares them with a stored baseline. Run
+it with `python -m benchmarks` (see benchmarks/__main__.py).
+"""
@@ -0,0 +1,102 @@
+"""
+Run the benchmark suite.
+
+Usage:
+    python -m benchmarks                      # run every case, compare with benchmarks/baseline.json
+    python -m benchmarks --quick -k urls      # smaller inputs, only cases matching "urls"
+    python -m benchmarks --save-baseline      # store this run as the baseline
+    python -m benchmarks --list
+"""
+
+import argparse
+import datetime
+import fnmatch
+import os
+import socket
+import sys
+import tempfile
+
+from benchmarks.harness import (BASELINE_FILE, CASES, DEFAULT_THRESHOLD, RESULTS_DIR, Context, compare_results,
+                                load_results, machine_differences, new_results, print_results, run_case,
+                                save_results)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', '--cases', action='append',
+                        help='only cases whose name contains this or matches this glob (repeatable)')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    parser.add_argument('--quick', action='store_true', help='smaller inputs, for a fast smoke run')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case (default: 5)')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs before them (default: 1)')
+    parser.add_argument('--output', help=f'results file (default: a new file in {os.path.relpath(RESULTS_DIR)})')
+    parser.add_argument('--baseline', default=BASELINE_FILE,
+                        help=f'results to compare with (default: {os.path.relpath(BASELINE_FILE)})')
+    parser.add_argument('--save-baseline', action='store_true', help='also store the results as the baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'slowdown per item flagged as a regression (default: {DEFAULT_THRESHOLD})')
+    return parser.parse_args()
+
+
+def selected(name: str, patterns) -> bool:
+    return not patterns or any(pattern in name or fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+
+def main() -> int:
+    args = parse_args()
+    # The Commons tools read the stand-in's address when the cases import them
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        os.environ['COMMONS_BASE_URL'] = f"http://127.0.0.1:{sock.getsockname()[1]}"
+    import benchmarks.cases  # noqa: F401  (registers the cases)
+
+    names = [name for name in CASES if selected(name, args.cases)]
+    if args.list or not names:
+        for name in names:
+            print(f"{name:<34} {CASES[name].description}")
+        if not names:
+            print("no cases match", file=sys.stderr)
+        return 0 if names else 2
+
+    results = new_results(args.quick)
+    with tempfile.TemporaryDirectory() as workdir:
+        context = Context(quick=args.quick, workdir=workdir)
+        try:
+            for name in names:
+                print(f"  {name}...", end='', flush=True, file=sys.stderr)
+                results['cases'][name] = run_case(CASES[name], context, args.repeat, args.warmup)
+                print(f" {results['cases'][name]['median']:.3f}s", file=sys.stderr)
+        finally:
+            context.close()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    save_results(results, output)
+
+    comparison = None
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        baseline = load_results(args.baseline)
+        comparison = compare_results(results, baseline, args.threshold)
+        regressions = [entry['name'] for entry in comparison if entry['regressed']]
+    print(f"\nMachine: {results['machine']['python']} on {results['machine']['platform']}, "
+          f"{results['machine']['cpus']} CPU(s), commit {results['machine']['commit']}")
+    print_results(results, comparison)
+    print(f"\nResults saved to {os.path.relpath(output)}")
+    if comparison is not None:
+        differences = machine_differences(results, baseline)
+        print(f"Compared with {os.path.relpath(args.baseline)} (commit {baseline['machine'].get('commit')}, "
+              f"{baseline['created']})")
+        if differences:
+            print(f"  Measured on a different setup ({'; '.join(differences)}); expect noise")
+        if regressions:
+            print(f"{len(regressions)} case(s) got more than {args.threshold:.0%} slower per item: "
+                  f"{', '.join(regressions)}")
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f"Stored as the baseline in {os.path.relpath(args.baseline)}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+The benchmark cases, one per hot path.
+
+Inputs are synthetic or come from the repository's own data, so every run
+does the same work: aircraft records from synthetic_fleet.py with a fixed
+seed, generated description pages, the URLs and licenses of the datasets,
+and fixtures synthesized from the image store for the cases that talk to
+Commons. Those reach a commons_standin.py server on the port in
+COMMONS_BASE_URL, which benchmarks/__main__.py sets before importing this
+module, since the tools read it when first imported.
+"""
+
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+from typing import List
+from urllib.parse import urlsplit
+
+import requests
+
+from benchmarks.harness import ROOT, Context, case
+
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+import process_aircraft_data  # noqa: E402
+import sync_wikimedia_images  # noqa: E402
+import wiki_image_scraper  # noqa: E402
+from benchmark_attribution import synthetic_page  # noqa: E402
+from benchmark_serve import free_port, run_load, wait_for_port  # noqa: E402
+from commons_standin import Fixtures, StandinServer, start_server, synthesize_fixtures  # noqa: E402
+from rate_limit import AIMDController  # noqa: E402
+from synthetic_fleet import DATASETS, FleetModel  # noqa: E402
+
+
+def quiet():
+    """Swallow what the processing and scraping code prints per item."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def synthetic_records(context: Context) -> List[dict]:
+    def build():
+        model = FleetModel.from_file('aircraft', DATASETS['aircraft'])
+        return [record for chunk in model.generate(context.size(20000, 2000), seed=1) for record in chunk]
+    return context.shared('records', build)
+
+
+def synthetic_input_file(context: Context) -> str:
+    def build():
+        path = os.path.join(context.workdir, 'aircraft.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'aircraft': synthetic_records(context)}, f)
+        return path
+    return context.shared('input_file', build)
+
+
+def dataset_urls(context: Context) -> List[str]:
+    """Every kind of Commons URL the datasets hold, repeated to a fixed count."""
+    def build():
+        urls = []
+        for name in ('aircraft', 'birds'):
+            with open(os.path.join(ROOT, 'data', f'{name}.json'), 'r', encoding='utf-8') as f:
+                items = json.load(f)[name]
+            for item in items:
+                urls.extend(item[field] for field in ('image_original_url', 'image_source_url', 'image_remote_url')
+                            if item.get(field))
+        count = context.size(20000, 2000)
+        return [urls[i % len(urls)] for i in range(count)]
+    return context.shared('urls', build)
+
+
+def standin(context: Context) -> StandinServer:
+    """A stand-in with fixtures from the image store, on the port in COMMONS_BASE_URL."""
+    def build():
+        fixtures = Fixtures(os.path.join(context.workdir, 'commons_fixtures'))
+        synthesize_fixtures(fixtures, ROOT)
+        server = start_server(fixtures, port=urlsplit(os.environ['COMMONS_BASE_URL']).port)
+        context.cleanups.append(server.server_close)
+        context.cleanups.append(server.shutdown)
+        return server
+    return context.shared('standin', build)
+
+
+@case('processing.derive_record', unit='records')
+def derive_record(context: Context) -> int:
+    """compute_derived_values called once per record."""
+    records = synthetic_records(context)
+    with quiet():
+        for record in records:
+            process_aircraft_data.compute_derived_values(record)
+    return len(records)
+
+
+@case('processing.derive_batch', unit='records')
+def derive_batch(context: Context) -> int:
+    """compute_derived_values_batch over all records at once, including copying them."""
+    records = [dict(record) for record in synthetic_records(context)]
+    with quiet():
+        process_aircraft_data.compute_derived_values_batch(records)
+    return len(records)
+
+
+@case('processing.process_database', unit='records', repeat=3)
+def process_database(context: Context) -> int:
+    """process_database end to end, record by record, without a manifest."""
+    output_file = os.path.join(context.workdir, 'aircraft_processed.json')
+    with quiet():
+        process_aircraft_data.process_database(synthetic_input_file(context), output_file)
+    return len(synthetic_records(context))
+
+
+@case('processing.process_database_batch', unit='records', repeat=3)
+def process_database_batch(context: Context) -> int:
+    """process_database end to end with batch=True."""
+    output_file = os.path.join(context.workdir, 'aircraft_processed.json')
+    with quiet():
+        process_aircraft_data.process_database(synthetic_input_file(context), output_file, batch=True)
+    return len(synthetic_records(context))
+
+
+@case('scraping.parse_author_info', unit='pages')
+def parse_author_info(context: Context) -> int:
+    """parse_author_info on generated Commons-like description pages."""
+    def build():
+        rng = random.Random(1)
+        return [synthetic_page(rng) for _ in range(context.size(200, 40))]
+    pages = context.shared('pages', build)
+    for html in pages:
+        wiki_image_scraper.parse_author_info(html, 'https://commons.wikimedia.org/wiki/File:Example.jpg')
+    return len(pages)
+
+
+@case('scraping.extract_author_info', unit='pages', repeat=3)
+def extract_author_info(context: Context) -> int:
+    """extract_author_info fetching each description page from the stand-in."""
+    server = standin(context)
+    urls = [f"{server.base_url}{key}" for key in server.fixtures.responses if key.startswith('/wiki/File:')]
+    with requests.Session() as session, quiet():
+        for url in urls:
+            wiki_image_scraper.extract_author_info(url, session=session)
+    return len(urls)
+
+
+@case('scraping.extract_license_short', unit='licenses')
+def extract_license_short(context: Context) -> int:
+    """extract_license_short on the licenses of the datasets."""
+    def build():
+        licenses = []
+        for name in ('aircraft', 'birds'):
+            with open(os.path.join(ROOT, 'attribution_results', f'{name}_attribution.json'), 'r',
+                      encoding='utf-8') as f:
+                licenses.extend(entry.get('license') for entry in json.load(f)['attributions'])
+        count = context.size(20000, 2000)
+        return [licenses[i % len(licenses)] for i in range(count)]
+    licenses = context.shared('licenses', build)
+    for license_text in licenses:
+        wiki_image_scraper.extract_license_short(license_text)
+    return len(licenses)
+
+
+@case('urls.commons_filename', unit='urls')
+def commons_filename(context: Context) -> int:
+    """commons_filename on upload, thumbnail and description page URLs."""
+    urls = dataset_urls(context)
+    for url in urls:
+        sync_wikimedia_images.commons_filename(url)
+    return len(urls)
+
+
+@case('urls.convert_to_description_url', unit='urls')
+def convert_to_description_url(context: Context) -> int:
+    """convert_to_description_url on upload, thumbnail and description page URLs."""
+    urls = dataset_urls(context)
+    for url in urls:
+        wiki_image_scraper.convert_to_description_url(url)
+    return len(urls)
+
+
+@case('sync.audit_dataset', unit='images', repeat=3)
+def audit_dataset(context: Context) -> int:
+    """Read-only audit of both datasets, resolving every image through the stand-in's API."""
+    standin(context)
+    controller = AIMDController(initial=1, maximum=2)
+    total = 0
+    with quiet():
+        for config in sync_wikimedia_images.DATASETS:
+            items, _, failures, _ = sync_wikimedia_images.audit_dataset(config, 960, False, api_controller=controller)
+            if failures:
+                raise RuntimeError(f"audit failed against the stand-in: {failures[0]}")
+            total += items
+    return total
+
+
+@case('serve.requests', unit='requests', repeat=3)
+def serve_requests(context: Context) -> tuple:
+    """serve.py answering the comparative page's assets to 8 client threads."""
+    def build():
+        port = free_port()
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'serve.py'), '--bind', '127.0.0.1',
+                                    '--port', str(port)], cwd=ROOT,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        context.cleanups.append(process.wait)
+        context.cleanups.append(process.terminate)
+        wait_for_port(port)
+        return port
+    port = context.shared('serve_port', build)
+    result = run_load(port, 8, context.size(3.0, 1.0), 0)
+    if result['errors']:
+        raise RuntimeError(f"serve.py answered {result['errors']} request(s) with errors")
+    return result['requests'], result['requests'] / result['rps']
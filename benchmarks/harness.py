@@ -0,0 +1,243 @@
+"""
+Case registry, timing, and result files of the benchmark suite.
+
+A case is a function registered with @case that does a fixed amount of work
+and returns how many items it handled, or (items, seconds) when it times
+itself. run_case calls it once to warm up and then `repeat` times, and keeps
+the seconds of every run; a case faster than MIN_RUN_SECONDS is called
+several times per run, so that timer resolution and scheduling noise stay
+small. Cases are compared by the median seconds per item, which the slowest
+and fastest runs do not move.
+
+Results are saved as JSON together with a description of the machine and
+the commit they were measured at:
+
+    {"version": 1, "created": ..., "quick": false, "machine": {...},
+     "cases": {"processing.derive_record": {"group", "unit", "items", "loops", "runs",
+                                            "median", "best", "per_second"}}}
+
+compare_results lines a run up against a stored baseline and reports every
+case that got slower per item by more than the threshold.
+"""
+
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_VERSION = 1
+RESULTS_DIR = os.path.join(ROOT, '.cache', 'benchmarks')
+BASELINE_FILE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+# Slowdown per item, relative to the baseline, reported as a regression
+DEFAULT_THRESHOLD = 0.25
+# Shortest timed run; quicker cases are looped
+MIN_RUN_SECONDS = 0.2
+
+CaseResult = Union[int, Tuple[int, float]]
+
+
+class Case:
+    """A registered benchmark case."""
+
+    def __init__(self, name: str, run: Callable[['Context'], CaseResult], unit: str, repeat: Optional[int]):
+        self.name = name
+        self.group = name.split('.', 1)[0]
+        self.run = run
+        self.unit = unit
+        self.repeat = repeat
+        self.description = (run.__doc__ or '').strip().splitlines()[0] if run.__doc__ else ''
+
+
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str, unit: str = 'items', repeat: int = None) -> Callable:
+    """
+    Register a benchmark case.
+
+    Parameters:
+    name (str): "<group>.<case>", e.g. "processing.derive_record"
+    unit (str): What the returned item count counts
+    repeat (int): Timed runs for this case instead of the suite's setting,
+        for cases that take long or time themselves
+    """
+    def register(function: Callable[['Context'], CaseResult]) -> Callable[['Context'], CaseResult]:
+        CASES[name] = Case(name, function, unit, repeat)
+        return function
+    return register
+
+
+class Context:
+    """Shared inputs of the cases, built the first time a case asks for them."""
+
+    def __init__(self, quick: bool = False, workdir: str = None):
+        """
+        Parameters:
+        quick (bool): Use smaller inputs, for a fast smoke run
+        workdir (str): Directory for files the cases write
+        """
+        self.quick = quick
+        self.workdir = workdir
+        self.cache: dict = {}
+        self.cleanups: List[Callable[[], None]] = []
+
+    def size(self, full: int, quick: int) -> int:
+        return quick if self.quick else full
+
+    def shared(self, key: str, build: Callable[[], object]) -> object:
+        """Return the input stored under key, building it on first use."""
+        if key not in self.cache:
+            self.cache[key] = build()
+        return self.cache[key]
+
+    def close(self) -> None:
+        while self.cleanups:
+            self.cleanups.pop()()
+
+
+def run_case(bench: Case, context: Context, repeat: int, warmup: int = 1) -> dict:
+    """
+    Time one case.
+
+    Returns:
+    dict: {'group', 'unit', 'items', 'loops', 'runs', 'median', 'best',
+        'per_second'}, with the seconds of each timed run in 'runs' and the
+        items handled per run in 'items'
+    """
+    def call() -> Tuple[int, float]:
+        start = time.perf_counter()
+        result = bench.run(context)
+        if isinstance(result, tuple):
+            return result
+        return result, time.perf_counter() - start
+
+    loops = 1
+    for _ in range(max(1, warmup)):
+        items, elapsed = call()
+        loops = max(loops, math.ceil(MIN_RUN_SECONDS / elapsed) if elapsed > 0 else 1)
+    runs = []
+    for _ in range(bench.repeat or repeat):
+        items = seconds = 0
+        for _ in range(loops):
+            count, elapsed = call()
+            items += count
+            seconds += elapsed
+        runs.append(seconds)
+    median = statistics.median(runs)
+    return {
+        'group': bench.group,
+        'unit': bench.unit,
+        'items': items,
+        'loops': loops,
+        'runs': [round(seconds, 6) for seconds in runs],
+        'median': round(median, 6),
+        'best': round(min(runs), 6),
+        'per_second': round(items / median, 3) if median else None,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def machine_info() -> dict:
+    """Describe the machine and software the results were measured with."""
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor() or None,
+        'cpus': os.cpu_count(),
+        'python': f"{platform.python_implementation()} {platform.python_version()}",
+        'numpy': numpy_version,
+        'commit': git_commit(),
+    }
+
+
+def save_results(results: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(path + '.tmp', path)
+
+
+def load_results(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        results = json.load(f)
+    if results.get('version') != RESULTS_VERSION:
+        raise ValueError(f"{path}: unsupported results version {results.get('version')}")
+    return results
+
+
+def new_results(quick: bool) -> dict:
+    return {
+        'version': RESULTS_VERSION,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'quick': quick,
+        'machine': machine_info(),
+        'cases': {},
+    }
+
+
+def compare_results(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """
+    Compare the median seconds per item of every case both runs have.
+
+    Parameters:
+    current (dict): Results of this run
+    baseline (dict): Stored results to compare against
+    threshold (float): Relative slowdown beyond which a case regressed,
+        e.g. 0.25 for 25% more time per item
+
+    Returns:
+    list: {'name', 'change', 'regressed'} per case, where change is the
+        relative change in time per item (negative is faster)
+    """
+    comparison = []
+    for name, result in current['cases'].items():
+        previous = baseline['cases'].get(name)
+        if not previous or not result['items'] or not previous['items'] or not previous['median']:
+            continue
+        change = (result['median'] / result['items']) / (previous['median'] / previous['items']) - 1
+        comparison.append({'name': name, 'change': change, 'regressed': change > threshold})
+    return comparison
+
+
+def machine_differences(current: dict, baseline: dict) -> List[str]:
+    """Name the machine properties that differ, which make a comparison less meaningful."""
+    fields = ('machine', 'processor', 'cpus', 'python', 'numpy')
+    return [
+        f"{field}: {baseline['machine'].get(field)} -> {current['machine'].get(field)}"
+        for field in fields
+        if baseline['machine'].get(field) != current['machine'].get(field)
+    ] + (["quick mode differs"] if current.get('quick') != baseline.get('quick') else [])
+
+
+def print_results(results: dict, comparison: List[dict] = None, stream=sys.stdout) -> None:
+    changes = {entry['name']: entry for entry in comparison or []}
+    print(f"{'case':<34} {'items':>8} {'median s':>10} {'best s':>10} {'per second':>14}"
+          f"{'   vs baseline' if comparison is not None else ''}", file=stream)
+    for name, result in results['cases'].items():
+        line = (f"{name:<34} {result['items']:>8} {result['median']:>10.4f} {result['best']:>10.4f} "
+                f"{result['per_second'] or 0:>10.1f} {result['unit'][:3]:<3}")
+        if name in changes:
+            entry = changes[name]
+            line += f"   {entry['change']:+7.1%}{'  REGRESSION' if entry['regressed'] else ''}"
+        print(line, file=stream)
@@ -0,0 +1,228 @@
+"""
+Columnar (struct-of-arrays) export of the processed datasets.
+
+The processed files hold an array of objects that repeats every key name in
+every record. The columnar file stores one array per field instead, and
+string columns with repeated values are dictionary-encoded: the distinct
+values are stored once and each row holds an index into them. Long text
+fields that the chart pages never read (notes, image provenance and
+renditions) are moved to a separate file, so those pages download and parse
+only what they plot. js/columnar-data.js turns both files back into the original records.
+
+Layout of data/processed/<name>_columns.json:
+
+    {
+      "format": "columnar-v1",
+      "key": "aircraft",            # member holding the records
+      "count": 40,                  # number of records
+      "metadata": {...},            # metadata of the processed file
+      "fields": ["name", ...],      # fields in first-seen order
+      "columns": {
+        "mtow_N": [775000.0, ...],                        # plain column
+        "WTC": {"dictionary": ["Medium", ...], "codes": [0, ...]}
+      },
+      "missing": {"max_speed_ms": [3, 17]}   # rows without the field
+    }
+
+<name>_text.json has the same layout for the text fields, without metadata.
+"""
+
+import json
+import time
+from typing import Dict, List, Tuple
+
+COLUMNAR_FORMAT = 'columnar-v1'
+
+# Fields moved to the text file: free text, image provenance and image
+# renditions, which only the detail and gallery pages display
+TEXT_FIELDS = (
+    'notes',
+    'image_attribution',
+    'image_author',
+    'image_license',
+    'image_license_url',
+    'image_source_url',
+    'image_original_url',
+    'image_remote_url',
+    'image_width',
+    'image_height',
+    'image_variants',
+)
+
+
+def encode_column(values: list) -> object:
+    """
+    Encode one column, dictionary-encoding it if it holds only strings and
+    nulls and at least one value repeats.
+
+    Parameters:
+    values (list): The value of the field for every record
+
+    Returns:
+    list or dict: The values, or {'dictionary': [...], 'codes': [...]}
+    """
+    if not all(value is None or isinstance(value, str) for value in values):
+        return values
+    codes_by_value = {}
+    codes = [codes_by_value.setdefault(value, len(codes_by_value)) for value in values]
+    if len(codes_by_value) == len(values):
+        return values
+    return {'dictionary': list(codes_by_value), 'codes': codes}
+
+
+def decode_column(column: object) -> list:
+    """Return the list of values of a column written by encode_column."""
+    if isinstance(column, dict):
+        dictionary = column['dictionary']
+        return [dictionary[code] for code in column['codes']]
+    return column
+
+
+def encode_records(records: List[dict], fields: List[str]) -> dict:
+    """
+    Encode the given fields of a list of records as columns.
+
+    Parameters:
+    records (list): Records to encode
+    fields (list): Fields to include, in order
+
+    Returns:
+    dict: {'count', 'fields', 'columns', 'missing'}
+    """
+    columns = {}
+    missing = {}
+    for field in fields:
+        values = []
+        absent = []
+        for row, record in enumerate(records):
+            if field in record:
+                values.append(record[field])
+            else:
+                values.append(None)
+                absent.append(row)
+        columns[field] = encode_column(values)
+        if absent:
+            missing[field] = absent
+    return {'count': len(records), 'fields': list(fields), 'columns': columns, 'missing': missing}
+
+
+def decode_records(document: dict, records: List[dict] = None) -> List[dict]:
+    """
+    Rebuild records from a columnar document.
+
+    Parameters:
+    document (dict): A columns or text document
+    records (list): Records to add the fields to; new records are created
+        if omitted
+
+    Returns:
+    list: The records
+    """
+    if records is None:
+        records = [{} for _ in range(document['count'])]
+    for field in document['fields']:
+        absent = set(document['missing'].get(field, ()))
+        for row, value in enumerate(decode_column(document['columns'][field])):
+            if row not in absent:
+                records[row][field] = value
+    return records
+
+
+def to_columnar(data: dict, key: str, text_fields: Tuple[str, ...] = TEXT_FIELDS) -> Tuple[dict, dict]:
+    """
+    Split a processed dataset into a columns document and a text document.
+
+    Parameters:
+    data (dict): Processed dataset, e.g. {'metadata': ..., 'aircraft': [...]}
+    key (str): Member of data holding the records
+    text_fields (tuple): Fields to move to the text document
+
+    Returns:
+    tuple: (columns document, text document)
+    """
+    records = data[key]
+    fields = list(dict.fromkeys(field for record in records for field in record))
+    text = set(text_fields)
+
+    columns_document = {'format': COLUMNAR_FORMAT, 'key': key}
+    columns_document.update(encode_records(records, [field for field in fields if field not in text]))
+    columns_document['metadata'] = data.get('metadata', {})
+    text_document = {'format': COLUMNAR_FORMAT, 'key': key}
+    text_document.update(encode_records(records, [field for field in fields if field in text]))
+    return columns_document, text_document
+
+
+def from_columnar(columns_document: dict, text_document: dict = None) -> dict:
+    """Rebuild the processed dataset from the documents written by to_columnar."""
+    records = decode_records(columns_document)
+    if text_document is not None:
+        decode_records(text_document, records)
+    return {'metadata': columns_document['metadata'], columns_document['key']: records}
+
+
+def _parse_seconds(text: str, repeat: int = 5) -> float:
+    """Best-of-repeat time to parse text with json.loads."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        json.loads(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def export_columnar(processed_file: str, columns_file: str, text_file: str, key: str) -> Dict[str, float]:
+    """
+    Write the columnar and text files for a processed dataset and measure
+    how much smaller and faster to parse they are than the processed file.
+
+    Parameters:
+    processed_file (str): Path to the processed JSON file
+    columns_file (str): Path for the columns document
+    text_file (str): Path for the text document
+    key (str): Member of the processed file holding the records
+
+    Returns:
+    dict: Sizes in bytes and JSON parse times in seconds of the processed file
+        ('rows_*'), the columns file alone ('columns_*') and both files
+        ('columns_text_*')
+
+    Raises:
+    ValueError: If the columnar files do not reproduce the processed data
+    """
+    with open(processed_file, 'r', encoding='utf-8') as f:
+        rows_text = f.read()
+    data = json.loads(rows_text)
+    columns_document, text_document = to_columnar(data, key)
+
+    columns_text = json.dumps(columns_document, separators=(',', ':'))
+    text_text = json.dumps(text_document, separators=(',', ':'))
+    if from_columnar(json.loads(columns_text), json.loads(text_text)) != data:
+        raise ValueError(f"columnar export of {processed_file} does not round-trip")
+    with open(columns_file, 'w', encoding='utf-8') as f:
+        f.write(columns_text)
+    with open(text_file, 'w', encoding='utf-8') as f:
+        f.write(text_text)
+
+    rows_seconds = _parse_seconds(rows_text)
+    columns_seconds = _parse_seconds(columns_text)
+    text_seconds = _parse_seconds(text_text)
+    return {
+        'rows_bytes': len(rows_text.encode('utf-8')),
+        'rows_seconds': rows_seconds,
+        'columns_bytes': len(columns_text.encode('utf-8')),
+        'columns_seconds': columns_seconds,
+        'columns_text_bytes': len(columns_text.encode('utf-8')) + len(text_text.encode('utf-8')),
+        'columns_text_seconds': columns_seconds + text_seconds,
+    }
+
+
+def format_savings(report: Dict[str, float]) -> str:
+    """Summarize an export_columnar report on one line."""
+    def saving(prefix: str) -> str:
+        size = report[f'{prefix}_bytes'] / report['rows_bytes']
+        parse = report[f'{prefix}_seconds'] / report['rows_seconds']
+        return (f"{report[f'{prefix}_bytes'] / 1024:.1f} kB ({1 - size:.0%} smaller), "
+                f"parse {report[f'{prefix}_seconds'] * 1000:.2f} ms ({1 - parse:.0%} faster)")
+
+    return (f"rows {report['rows_bytes'] / 1024:.1f} kB, parse {report['rows_seconds'] * 1000:.2f} ms; "
+            f"columns {saving('columns')}; with text {saving('columns_text')}")
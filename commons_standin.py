@@ -0,0 +1,640 @@
+"""
+Local stand-in for Wikimedia Commons, for benchmarking the network stages offline.
+
+The attribution, thumbnail and image sync stages all talk to Commons:
+description pages and the MediaWiki API on commons.wikimedia.org, image
+bytes on upload.wikimedia.org. Their paths never collide, so one local
+server can answer for both hosts. It replays fixtures, and can put back the
+conditions that decide how fast the stages run against the real site:
+round-trip latency, 429 answers with Retry-After (at random, or once too
+many requests are in flight), and bandwidth per connection and in total.
+
+Fixtures are a directory with an index.json and the response bodies, named
+by their SHA-1:
+
+    <fixtures>/index.json     {"version": 1,
+                               "responses": {"/wiki/File:X.jpg": {"status", "headers", "body"}},
+                               "pages": {"File:X.jpg": <API page with imageinfo>},
+                               "redirects": {"File:Old.jpg": "File:X.jpg"}}
+    <fixtures>/bodies/<sha1>
+
+Responses are keyed by their decoded path and sorted query. An imageinfo API
+query that was not recorded as such is answered from the pages, so batches
+of any size replay. Links to either Commons host in HTML and JSON bodies
+are rewritten to the stand-in, which makes clients fetch the images from it
+too.
+
+Fixtures come from a recording or from the repository itself:
+
+    # Proxy to Commons, saving every page, API answer and image passed through
+    python commons_standin.py record --fixtures fixtures/commons
+    # Build pages, API answers and images from the image store, offline
+    python commons_standin.py synthesize --fixtures fixtures/commons
+    # Replay with 120 ms latency, 5% 429s and 2 MB/s per connection
+    python commons_standin.py serve --fixtures fixtures/commons --latency 120 \\
+        --throttle-rate 0.05 --bandwidth 2000
+
+The tools use the stand-in when COMMONS_BASE_URL points at it (see
+http_cache.py), e.g.
+
+    COMMONS_BASE_URL=http://127.0.0.1:8765 python scripts/sync_wikimedia_images.py --no-cache
+
+scripts/benchmark_network.py runs every network stage against it and
+reports the throughput of each.
+"""
+
+import argparse
+import email.utils
+import hashlib
+import http.server
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit
+from urllib.request import Request, urlopen
+
+from image_store import CHUNK_SIZE, ImageStore
+from rate_limit import TokenBucket
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURES = os.path.join(ROOT, '.cache', 'commons_fixtures')
+FIXTURES_VERSION = 1
+DEFAULT_PORT = 8765
+STATS_PATH = '/__standin__/stats'
+
+COMMONS_HOST = 'commons.wikimedia.org'
+UPLOAD_HOST = 'upload.wikimedia.org'
+# upload.wikimedia.org paths; everything else is on commons.wikimedia.org
+UPLOAD_PREFIX = '/wikipedia/'
+USER_AGENT = (
+    "aircraft-databank-standin/1.0 "
+    "(https://github.com/flavioluiz/FlightDataBank)"
+)
+# Response headers kept in fixtures; the rest describe the transfer
+RECORDED_HEADERS = ('content-type', 'last-modified')
+# Bodies whose links to Commons are rewritten to the stand-in
+TEXT_TYPES = ('text/html', 'application/json')
+# Statuses not worth recording, since Commons may answer differently next time
+TRANSIENT_STATUSES = (429, 500, 502, 503, 504)
+
+
+def request_key(target: str) -> str:
+    """Return the fixture key of a request target: decoded path and sorted query."""
+    parts = urlsplit(target)
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True))
+    key = unquote(parts.path) or '/'
+    return f"{key}?{urlencode(query)}" if query else key
+
+
+def canonical_title(title: str) -> str:
+    """Normalize a page title the way MediaWiki does: spaces, upper-case first letter."""
+    title = title.replace('_', ' ').strip()
+    namespace, _, name = title.rpartition(':')
+    name = name[:1].upper() + name[1:]
+    return f"{namespace}:{name}" if namespace else name
+
+
+def rewrite_links(body: bytes, base_url: str) -> bytes:
+    """Point absolute and protocol-relative links to both Commons hosts at base_url."""
+    base = base_url.encode('ascii')
+    escaped = base.replace(b'/', b'\\/')
+    for host in (COMMONS_HOST, UPLOAD_HOST):
+        host = host.encode('ascii')
+        body = body.replace(b'https://' + host, base).replace(b'https:\\/\\/' + host, escaped)
+        body = body.replace(b'"//' + host, b'"' + base).replace(b'"\\/\\/' + host, b'"' + escaped)
+    return body
+
+
+class Fixtures:
+    """Recorded responses and API pages, loaded from and saved to a directory."""
+
+    def __init__(self, directory: str = DEFAULT_FIXTURES):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+        index = {}
+        if os.path.isfile(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        if index and index.get('version') != FIXTURES_VERSION:
+            raise ValueError(f"{self.index_path}: unsupported fixtures version {index.get('version')}")
+        self.responses: Dict[str, dict] = index.get('responses', {})
+        self.pages: Dict[str, dict] = index.get('pages', {})
+        self.redirects: Dict[str, str] = index.get('redirects', {})
+        self.lock = threading.Lock()
+
+    def body_path(self, sha1: str) -> str:
+        return os.path.join(self.directory, 'bodies', sha1)
+
+    def get(self, key: str) -> Optional[Tuple[int, Dict[str, str], bytes, str]]:
+        """
+        Look up a recorded response.
+
+        Returns:
+        tuple: (status, headers, body, body SHA-1), or None if there is none
+        """
+        entry = self.responses.get(key)
+        if entry is None:
+            return None
+        with open(self.body_path(entry['body']), 'rb') as f:
+            body = f.read()
+        return entry['status'], entry['headers'], body, entry['body']
+
+    def put(self, key: str, status: int, headers: Dict[str, str], body: bytes) -> None:
+        """Record a response; bodies are stored once however many keys share them."""
+        sha1 = hashlib.sha1(body).hexdigest()
+        path = self.body_path(sha1)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_file = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_file, 'wb') as f:
+                f.write(body)
+            os.replace(temp_file, path)
+        headers = {name: value for name, value in headers.items() if name.lower() in RECORDED_HEADERS}
+        with self.lock:
+            self.responses[key] = {'status': status, 'headers': headers, 'body': sha1}
+
+    def add_api_pages(self, payload: dict) -> None:
+        """Keep the pages and redirects of a recorded imageinfo answer for composed replies."""
+        query = payload.get('query', {})
+        with self.lock:
+            for mapping in query.get('redirects', []):
+                self.redirects[mapping['from']] = mapping['to']
+            for page in query.get('pages', []):
+                if page.get('imageinfo') or page.get('missing'):
+                    self.pages[page['title']] = page
+
+    def api_answer(self, params: Dict[str, str]) -> Optional[dict]:
+        """
+        Compose an imageinfo API answer from the recorded pages.
+
+        Parameters:
+        params (dict): Query parameters of the request
+
+        Returns:
+        dict: The answer in formatversion 2, or None for other API requests
+        """
+        if params.get('action') != 'query' or params.get('prop') != 'imageinfo' or 'titles' not in params:
+            return None
+        normalized, redirects, pages = [], [], {}
+        for title in params['titles'].split('|'):
+            canonical = canonical_title(title)
+            if canonical != title:
+                normalized.append({'from': title, 'to': canonical})
+            seen = {canonical}
+            while canonical in self.redirects and self.redirects[canonical] not in seen:
+                redirects.append({'from': canonical, 'to': self.redirects[canonical]})
+                canonical = self.redirects[canonical]
+                seen.add(canonical)
+            pages[canonical] = self.pages.get(canonical, {'ns': 6, 'title': canonical, 'missing': True})
+        query = {'pages': list(pages.values())}
+        if normalized:
+            query['normalized'] = normalized
+        if redirects:
+            query['redirects'] = redirects
+        return {'batchcomplete': True, 'query': query}
+
+    def save(self) -> None:
+        with self.lock:
+            index = {
+                'version': FIXTURES_VERSION,
+                'responses': dict(sorted(self.responses.items())),
+                'pages': dict(sorted(self.pages.items())),
+                'redirects': dict(sorted(self.redirects.items())),
+            }
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.index_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False, indent=1)
+                f.write('\n')
+            os.replace(self.index_path + '.tmp', self.index_path)
+
+
+class Conditions:
+    """Network conditions the stand-in imposes on every response."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: int = 1, max_concurrent: int = 0, bandwidth: float = 0.0,
+                 link_bandwidth: float = 0.0, seed: int = None):
+        """
+        Parameters:
+        latency (float): Seconds before each response starts
+        jitter (float): Up to this many further seconds, uniformly at random
+        throttle_rate (float): Share of requests answered with 429
+        retry_after (int): Retry-After seconds sent with each 429
+        max_concurrent (int): Requests served at once; more are answered
+            with 429 (0: no limit)
+        bandwidth (float): Bytes per second sent on each connection (0: no limit)
+        link_bandwidth (float): Bytes per second sent on all connections
+            together (0: no limit)
+        seed (int): Seed for the latency jitter and throttling decisions
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.max_concurrent = max_concurrent
+        self.bandwidth = bandwidth
+        self.link = TokenBucket(link_bandwidth, capacity=CHUNK_SIZE) if link_bandwidth else None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self.lock:
+            return self.latency + self.random.uniform(0, self.jitter)
+
+    def throttled(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.throttle_rate
+
+    def describe(self) -> str:
+        parts = [f"latency {self.latency * 1000:.0f}+{self.jitter * 1000:.0f} ms"]
+        if self.throttle_rate:
+            parts.append(f"{self.throttle_rate:.0%} throttled")
+        if self.max_concurrent:
+            parts.append(f"at most {self.max_concurrent} in flight")
+        if self.bandwidth:
+            parts.append(f"{self.bandwidth / 1000:.0f} kB/s per connection")
+        if self.link is not None:
+            parts.append(f"{self.link.rate / 1000:.0f} kB/s in total")
+        return ", ".join(parts)
+
+
+class StandinStats:
+    """Thread-safe counters of what the stand-in answered."""
+
+    FIELDS = ('requests', 'served', 'not_modified', 'partial', 'throttled', 'missing', 'recorded', 'bytes_sent')
+
+    def __init__(self):
+        self.counts = dict.fromkeys(self.FIELDS, 0)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+
+    def add(self, field: str, count: int = 1) -> None:
+        with self.lock:
+            self.counts[field] += count
+
+    def enter(self, limit: int) -> bool:
+        """Count a request in flight, unless limit are already; returns whether it was."""
+        with self.lock:
+            if limit and self.in_flight >= limit:
+                return False
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return True
+
+    def leave(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.counts, peak_in_flight=self.peak_in_flight)
+
+    def report(self) -> str:
+        counts = self.snapshot()
+        return (f"{counts['requests']} requests: {counts['served']} served "
+                f"({counts['bytes_sent'] / 1e6:.1f} MB), {counts['partial']} partial, "
+                f"{counts['not_modified']} not modified, {counts['throttled']} throttled, "
+                f"{counts['missing']} missing; {counts['recorded']} recorded; "
+                f"at most {counts['peak_in_flight']} in flight")
+
+
+class StandinRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Answers Commons requests from the server's fixtures."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'CommonsStandin/1.0'
+    # Headers and body go out in separate writes; without this the body
+    # waits for the client's delayed ACK on every kept-alive request
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.respond(head=False)
+
+    def do_HEAD(self):
+        self.respond(head=True)
+
+    def respond(self, head: bool) -> None:
+        if self.path == STATS_PATH:
+            body = json.dumps(self.server.stats.snapshot()).encode('utf-8')
+            self.send_bytes(200, {'Content-Type': 'application/json'}, body, head)
+            return
+        stats = self.server.stats
+        conditions = self.server.conditions
+        stats.add('requests')
+        if not stats.enter(conditions.max_concurrent):
+            self.send_throttled()
+            return
+        try:
+            time.sleep(conditions.delay())
+            if conditions.throttled():
+                self.send_throttled()
+                return
+            response = self.lookup()
+            if response is None:
+                stats.add('missing')
+                self.send_bytes(404, {'Content-Type': 'text/plain'}, b'No fixture for this request\n', head)
+                return
+            self.send_fixture(*response, head=head)
+        finally:
+            stats.leave()
+
+    def lookup(self) -> Optional[Tuple[int, Dict[str, str], bytes, str]]:
+        """Find the response to this request, recording it first in record mode."""
+        fixtures = self.server.fixtures
+        key = request_key(self.path)
+        response = fixtures.get(key)
+        if response is None and self.server.record:
+            response = self.record(key)
+        if response is None:
+            parts = urlsplit(self.path)
+            if parts.path == '/w/api.php':
+                answer = fixtures.api_answer(dict(parse_qsl(parts.query)))
+                if answer is not None:
+                    body = json.dumps(answer).encode('utf-8')
+                    response = (200, {'Content-Type': 'application/json; charset=utf-8'}, body,
+                                hashlib.sha1(body).hexdigest())
+        return response
+
+    def record(self, key: str) -> Optional[Tuple[int, Dict[str, str], bytes, str]]:
+        """Fetch the request from Commons and add the answer to the fixtures."""
+        host = UPLOAD_HOST if self.path.startswith(UPLOAD_PREFIX) else COMMONS_HOST
+        headers = {'User-Agent': self.headers.get('User-Agent') or USER_AGENT}
+        if self.headers.get('Accept'):
+            headers['Accept'] = self.headers['Accept']
+        try:
+            with urlopen(Request(f"https://{host}{self.path}", headers=headers), timeout=60) as upstream:
+                status, upstream_headers, body = upstream.status, upstream.headers, upstream.read()
+        except HTTPError as exc:
+            status, upstream_headers, body = exc.code, exc.headers, exc.read()
+        if status in TRANSIENT_STATUSES:
+            # Pass the answer on without keeping it
+            return status, dict(upstream_headers.items()), body, hashlib.sha1(body).hexdigest()
+        fixtures = self.server.fixtures
+        fixtures.put(key, status, dict(upstream_headers.items()), body)
+        if status == 200 and urlsplit(self.path).path == '/w/api.php':
+            try:
+                fixtures.add_api_pages(json.loads(body))
+            except ValueError:
+                pass
+        # Saved as it goes, so an interrupted recording keeps what it has
+        fixtures.save()
+        self.server.stats.add('recorded')
+        return fixtures.get(key)
+
+    def send_fixture(self, status: int, headers: Dict[str, str], body: bytes, sha1: str, head: bool) -> None:
+        headers = dict(headers)
+        content_type = next((value for name, value in headers.items() if name.lower() == 'content-type'), '')
+        if content_type.split(';')[0].strip() in TEXT_TYPES:
+            body = rewrite_links(body, self.server.base_url)
+        if status != 200:
+            self.send_bytes(status, headers, body, head)
+            return
+        etag = f'"{sha1}"'
+        headers['ETag'] = etag
+        headers['Accept-Ranges'] = 'bytes'
+        if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            self.server.stats.add('not_modified')
+            self.send_bytes(304, {'ETag': etag}, b'', head=True)
+            return
+        byte_range = self.headers.get('Range', '')
+        if_range = self.headers.get('If-Range')
+        if byte_range.startswith('bytes=') and (if_range is None or if_range == etag):
+            first, _, last = byte_range[len('bytes='):].partition('-')
+            if not first.isdigit() or int(first) >= len(body):
+                headers['Content-Range'] = f"bytes */{len(body)}"
+                self.send_bytes(416, headers, b'', head)
+                return
+            start = int(first)
+            end = min(int(last), len(body) - 1) if last.isdigit() else len(body) - 1
+            headers['Content-Range'] = f"bytes {start}-{end}/{len(body)}"
+            self.server.stats.add('partial')
+            self.send_bytes(206, headers, body[start:end + 1], head)
+            return
+        self.send_bytes(200, headers, body, head)
+
+    def send_throttled(self) -> None:
+        self.server.stats.add('throttled')
+        self.send_bytes(429, {'Content-Type': 'text/plain', 'Retry-After': str(self.server.conditions.retry_after)},
+                        b'Too many requests\n', head=False)
+
+    def send_bytes(self, status: int, headers: Dict[str, str], body: bytes, head: bool) -> None:
+        """Send a response, no faster than the bandwidth limits allow."""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if head or not body:
+            return
+        conditions = self.server.conditions
+        connection = TokenBucket(conditions.bandwidth, capacity=CHUNK_SIZE) if conditions.bandwidth else None
+        try:
+            for offset in range(0, len(body), CHUNK_SIZE):
+                chunk = body[offset:offset + CHUNK_SIZE]
+                for bucket in (connection, conditions.link):
+                    if bucket is not None:
+                        bucket.acquire(len(chunk))
+                self.wfile.write(chunk)
+                self.server.stats.add('bytes_sent', len(chunk))
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        else:
+            if status in (200, 206):
+                self.server.stats.add('served')
+
+
+class StandinServer(http.server.ThreadingHTTPServer):
+    """Threaded HTTP server holding the fixtures, conditions and counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], fixtures: Fixtures, conditions: Conditions = None,
+                 record: bool = False, verbose: bool = False):
+        super().__init__(address, StandinRequestHandler)
+        self.fixtures = fixtures
+        self.conditions = conditions or Conditions()
+        self.record = record
+        self.verbose = verbose
+        self.stats = StandinStats()
+        host, port = self.server_address[:2]
+        self.base_url = f"http://{host}:{port}"
+
+
+def start_server(fixtures: Fixtures, conditions: Conditions = None, host: str = '127.0.0.1', port: int = 0,
+                 record: bool = False) -> StandinServer:
+    """
+    Start a stand-in on a background thread.
+
+    Parameters:
+    fixtures (Fixtures): Responses to replay (and to record into)
+    conditions (Conditions): Network conditions (default: none)
+    host (str): Address to listen on
+    port (int): Port to listen on (default: any free port)
+    record (bool): Fetch requests without a fixture from Commons
+
+    Returns:
+    StandinServer: The running server; its base_url is what COMMONS_BASE_URL
+        should be set to, and shutdown() stops it
+    """
+    server = StandinServer((host, port), fixtures, conditions, record)
+    threading.Thread(target=server.serve_forever, name='commons-standin', daemon=True).start()
+    return server
+
+
+def description_page(title: str, attribution: dict, image_url: str, variant: str) -> str:
+    """A Commons-like description page with the information template and a license tag."""
+    def escape(value):
+        return (str(value or '').replace('&', '&amp;').replace('<', '&lt;')
+                .replace('>', '&gt;').replace('"', '&quot;'))
+
+    rows = [('desc', 'Description', attribution.get('description')), ('date', 'Date', attribution.get('date')),
+            ('src', 'Source', attribution.get('source')), ('aut', 'Author', attribution.get('author'))]
+    table = ''.join(
+        f'<tr><td id="fileinfotpl_{field}" class="fileinfo-paramfield" lang="en">{label}</td>'
+        f'<td>{escape(value)}</td></tr>'
+        for field, label, value in rows if value
+    )
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><title>{escape(title)} - Wikimedia Commons</title></head><body>'
+        f'<div class="fullImageLink" id="file"><a href="{escape(image_url)}"><img src="{escape(image_url)}"></a></div>'
+        f'<div class="fullMedia"><span class="mw-filepage-other-resolutions">Other resolutions: '
+        f'<a href="{escape(image_url)}" class="mw-thumbnail-link">{escape(variant)}</a></span></div>'
+        '<div id="mw-imagepage-content"><div class="mw-parser-output">'
+        f'<table class="fileinfotpl-type-information toccolours"><tbody>{table}</tbody></table>'
+        '<table class="licensetpl"><tr><td>'
+        f'<span class="licensetpl_short">{escape(attribution.get("license"))}</span>'
+        f'<span class="licensetpl_link">{escape(attribution.get("license_url"))}</span>'
+        '</td></tr></table></div></div></body></html>'
+    )
+
+
+def synthesize_fixtures(fixtures: Fixtures, root: str = ROOT) -> int:
+    """
+    Build fixtures for every item in the image store, without network access.
+
+    Each item's cached rendition is served at the URL it was downloaded
+    from, its description page carries the attribution recorded in
+    attribution_results/, and the API reports both. The stages then see the
+    same titles, URLs and files they see on Commons.
+
+    Parameters:
+    fixtures (Fixtures): Fixtures to add to
+    root (str): Repository root
+
+    Returns:
+    int: Number of items added
+    """
+    store = ImageStore(root)
+    added = 0
+    for dataset, entries in sorted(store.items.items()):
+        attribution_file = os.path.join(root, 'attribution_results', f'{dataset}_attribution.json')
+        attributions = {}
+        if os.path.isfile(attribution_file):
+            with open(attribution_file, 'r', encoding='utf-8') as f:
+                attributions = {entry.get('item_name'): entry for entry in json.load(f).get('attributions', [])}
+        for name, entry in sorted(entries.items()):
+            stored = store.objects.get(entry['sha1'])
+            if stored is None or not entry.get('source_url'):
+                continue
+            with open(store.full_path(stored['path']), 'rb') as f:
+                body = f.read()
+            last_modified = email.utils.formatdate(os.path.getmtime(store.full_path(stored['path'])), usegmt=True)
+            image_url = entry['source_url']
+            fixtures.put(request_key(urlsplit(image_url).path), 200,
+                         {'Content-Type': stored['mime'], 'Last-Modified': last_modified}, body)
+
+            attribution = attributions.get(name, {})
+            title = canonical_title(entry['title'])
+            page_url = f"https://{COMMONS_HOST}/wiki/" + quote(title.replace(' ', '_'), safe="/:(),'")
+            page = description_page(title, attribution, image_url, entry.get('variant') or 'original')
+            fixtures.put(request_key(urlsplit(page_url).path), 200,
+                         {'Content-Type': 'text/html; charset=UTF-8', 'Last-Modified': last_modified},
+                         page.encode('utf-8'))
+
+            original = entry.get('variant') == 'original'
+            info = {
+                # Only the cached rendition is served; its checksum stands in
+                # for the original's when the original is what was cached
+                'url': image_url if original else attribution.get('original_url') or image_url,
+                'descriptionurl': page_url,
+                'mime': stored['mime'],
+                'sha1': entry['sha1'] if original else entry.get('original_sha1'),
+                'size': stored['size'] if original else entry.get('original_size'),
+                'extmetadata': {
+                    key: {'value': attribution[field]}
+                    for key, field in (('Artist', 'author'), ('LicenseShortName', 'license'),
+                                       ('LicenseUrl', 'license_url'), ('ImageDescription', 'description'),
+                                       ('DateTimeOriginal', 'date'), ('Credit', 'source'))
+                    if attribution.get(field)
+                },
+            }
+            if not original:
+                info.update(thumburl=image_url, thumbmime=stored['mime'])
+            fixtures.pages[title] = {'ns': 6, 'title': title, 'imageinfo': [info]}
+            added += 1
+    return added
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('serve', 'record', 'synthesize'))
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES,
+                        help=f'fixtures directory (default: {os.path.relpath(DEFAULT_FIXTURES)})')
+    parser.add_argument('--bind', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--latency', type=float, default=0.0, help='milliseconds before each response (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many further milliseconds at random')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds of each 429 (default: 1)')
+    parser.add_argument('--max-concurrent', type=int, default=0,
+                        help='requests served at once; more get 429 (default: no limit)')
+    parser.add_argument('--bandwidth', type=float, default=0.0, help='kB/s per connection (default: no limit)')
+    parser.add_argument('--link-bandwidth', type=float, default=0.0,
+                        help='kB/s over all connections (default: no limit)')
+    parser.add_argument('--seed', type=int, help='random seed for jitter and throttling')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    fixtures = Fixtures(args.fixtures)
+    if args.command == 'synthesize':
+        added = synthesize_fixtures(fixtures)
+        fixtures.save()
+        print(f"Wrote fixtures for {added} image(s) to {args.fixtures}")
+        return 0
+
+    if not fixtures.responses and args.command == 'serve':
+        print(f"No fixtures in {args.fixtures}; run 'record' or 'synthesize' first", file=sys.stderr)
+        return 1
+    conditions = Conditions(args.latency / 1000, args.jitter / 1000, args.throttle_rate, args.retry_after,
+                            args.max_concurrent, args.bandwidth * 1000, args.link_bandwidth * 1000, args.seed)
+    server = StandinServer((args.bind, args.port), fixtures, conditions, record=args.command == 'record',
+                           verbose=args.verbose)
+    mode = 'Recording' if server.record else 'Replaying'
+    print(f"{mode} {len(fixtures.responses)} response(s) from {args.fixtures} at {server.base_url} "
+          f"({conditions.describe()})")
+    print(f"Run the tools with COMMONS_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n{server.stats.report()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
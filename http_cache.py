@@ -0,0 +1,330 @@
+"""
+Persistent HTTP response cache shared by the Wikimedia Commons tools.
+
+Successful GET responses are kept in a SQLite database keyed by their
+normalized URL (lower-case scheme and host, no fragment, sorted query
+parameters), together with their ETag and Last-Modified validators. A
+response younger than the cache's TTL is served without touching the
+network; an older one is revalidated with If-None-Match/If-Modified-Since,
+so an unchanged page costs a 304 instead of a full download. Server
+Cache-Control freshness is not used, since Commons marks its pages
+max-age=0; only no-store keeps a response out of the cache. When the
+stored bodies exceed max_bytes, the least recently used entries are
+evicted.
+
+CachedSession is a requests.Session that goes through the cache, and
+HTTPCache.fetch does the same for urllib callers. Both count fresh hits,
+revalidations, changed responses and misses in HTTPCache.stats, which the
+tools print at the end of a run.
+
+The tools reach Commons at COMMONS_URL, which the COMMONS_BASE_URL
+environment variable can point at a stand-in such as commons_standin.py.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from urllib.request import Request, urlopen
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'http_cache.sqlite')
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+CANONICAL_COMMONS_URL = 'https://commons.wikimedia.org'
+# Where the tools send Commons page and API requests
+COMMONS_URL = os.environ.get('COMMONS_BASE_URL', CANONICAL_COMMONS_URL).rstrip('/')
+
+# Headers that describe the transfer rather than the stored body
+UNSTORED_HEADERS = frozenset((
+    'connection', 'content-encoding', 'content-length', 'keep-alive',
+    'set-cookie', 'transfer-encoding',
+))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def commons_endpoint(url: str) -> str:
+    """Return a commons.wikimedia.org URL on the configured Commons host (COMMONS_URL)."""
+    if url.startswith(CANONICAL_COMMONS_URL + '/'):
+        return COMMONS_URL + url[len(CANONICAL_COMMONS_URL):]
+    return url
+
+
+def normalize_url(url: str, params: dict = None) -> str:
+    """Return the cache key of a URL with optional extra query parameters."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((str(name), str(value)) for name, value in params.items() if value is not None)
+    netloc = parts.netloc.lower()
+    if parts.scheme.lower() == 'https' and netloc.endswith(':443'):
+        netloc = netloc[:-4]
+    elif parts.scheme.lower() == 'http' and netloc.endswith(':80'):
+        netloc = netloc[:-3]
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path or '/', urlencode(sorted(query)), ''))
+
+
+class CacheEntry(NamedTuple):
+    """A stored response."""
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers that ask the server to answer 304 if the response is unchanged."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class CacheStats:
+    """Thread-safe counters of how requests were answered."""
+
+    def __init__(self):
+        self.hits = 0
+        self.revalidated = 0
+        self.changed = 0
+        self.misses = 0
+        self.evicted = 0
+        self.lock = threading.Lock()
+
+    def add(self, field: str, count: int = 1) -> None:
+        with self.lock:
+            setattr(self, field, getattr(self, field) + count)
+
+    def report(self) -> str:
+        return (f"HTTP cache: {self.hits} fresh hits, {self.revalidated} revalidated (304), "
+                f"{self.changed} changed, {self.misses} misses, {self.evicted} evicted")
+
+
+class HTTPCache:
+    """SQLite-backed response store with TTL freshness and LRU eviction."""
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Parameters:
+        path (str): Database file, created with its directory if missing
+        ttl (float): Seconds a response is served without revalidation
+        max_bytes (int): Total body size kept before evicting the least
+            recently used responses
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self.lock = threading.Lock()
+        # One connection shared by every thread, serialized by self.lock
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+        self.total_bytes = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+    def __enter__(self) -> 'HTTPCache':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def lookup(self, url: str, params: dict = None) -> Tuple[str, Optional[CacheEntry]]:
+        """
+        Find the stored response for a URL, counting a hit if it is fresh.
+
+        Returns:
+        tuple: (cache key, CacheEntry or None)
+        """
+        key = normalize_url(url, params)
+        with self.lock:
+            row = self.db.execute(
+                'SELECT url, status, headers, body, etag, last_modified, expires_at FROM responses WHERE key = ?',
+                (key,),
+            ).fetchone()
+            if row is None:
+                return key, None
+            self.db.execute('UPDATE responses SET last_used = ? WHERE key = ?', (time.time(), key))
+        entry = CacheEntry(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5], row[6])
+        if entry.fresh:
+            self.stats.add('hits')
+        return key, entry
+
+    def is_fresh(self, url: str, params: dict = None) -> bool:
+        """Whether a request for the URL would be answered without the network."""
+        key = normalize_url(url, params)
+        with self.lock:
+            row = self.db.execute('SELECT expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+        return row is not None and time.time() < row[0]
+
+    def update(self, key: str, previous: Optional[CacheEntry], url: str, status: int,
+               headers, body: bytes = b'') -> Optional[CacheEntry]:
+        """
+        Record the server's answer to a request for key.
+
+        Parameters:
+        key (str): Key returned by lookup
+        previous (CacheEntry): The stale entry the request revalidated, if any
+        url (str): Final URL of the response
+        status (int): Response status
+        headers: Response headers (any mapping)
+        body (bytes): Decoded response body
+
+        Returns:
+        CacheEntry: The entry now answering for key: the refreshed previous
+            entry after a 304, the new one after a cacheable 200, else None
+        """
+        now = time.time()
+        if status == 304 and previous is not None:
+            self.stats.add('revalidated')
+            etag = headers.get('ETag') or previous.etag
+            last_modified = headers.get('Last-Modified') or previous.last_modified
+            with self.lock:
+                self.db.execute(
+                    'UPDATE responses SET etag = ?, last_modified = ?, expires_at = ?, last_used = ? WHERE key = ?',
+                    (etag, last_modified, now + self.ttl, now, key),
+                )
+            return previous._replace(etag=etag, last_modified=last_modified, expires_at=now + self.ttl)
+
+        self.stats.add('changed' if previous is not None else 'misses')
+        if status != 200 or 'no-store' in headers.get('Cache-Control', '').lower():
+            return None
+        stored = {name: value for name, value in headers.items() if name.lower() not in UNSTORED_HEADERS}
+        entry = CacheEntry(url, status, stored, body, headers.get('ETag'), headers.get('Last-Modified'), now + self.ttl)
+        with self.lock:
+            old = self.db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, url, status, json.dumps(stored), body, entry.etag, entry.last_modified,
+                 now, entry.expires_at, now, len(body)),
+            )
+            self.total_bytes += len(body) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+        return entry
+
+    def _evict(self) -> None:
+        """Drop least recently used responses until under max_bytes; call with the lock held."""
+        evicted = 0
+        for key, size in self.db.execute('SELECT key, size FROM responses ORDER BY last_used').fetchall():
+            if self.total_bytes <= self.max_bytes:
+                break
+            self.db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.total_bytes -= size
+            evicted += 1
+        self.stats.add('evicted', evicted)
+
+    def fetch(self, url: str, headers: Dict[str, str] = None, timeout: float = 30) -> CacheEntry:
+        """
+        GET a URL with urllib through the cache.
+
+        Returns:
+        CacheEntry: The fresh, revalidated or newly fetched response (not
+            stored if the server sent no-store)
+
+        Raises:
+        urllib.error.URLError: If the request fails or the status is not 200
+        """
+        key, entry = self.lookup(url)
+        if entry is not None and entry.fresh:
+            return entry
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers.update(entry.conditional_headers())
+        try:
+            with urlopen(Request(url, headers=request_headers), timeout=timeout) as response:
+                body = response.read()
+                final_url, status, response_headers = response.geturl(), response.status, response.headers
+        except HTTPError as exc:
+            if exc.code == 304 and entry is not None:
+                return self.update(key, entry, url, 304, exc.headers)
+            self.stats.add('changed' if entry is not None else 'misses')
+            raise
+        stored = self.update(key, entry, final_url, status, response_headers, body)
+        return stored or CacheEntry(final_url, status, dict(response_headers), body, None, None, 0.0)
+
+
+class CachedSession(requests.Session):
+    """A requests.Session whose GET requests go through an HTTPCache."""
+
+    def __init__(self, cache: HTTPCache = None):
+        """
+        Parameters:
+        cache (HTTPCache): Cache to use (default: the shared on-disk cache)
+        """
+        super().__init__()
+        self.owns_cache = cache is None
+        self.cache = cache if cache is not None else HTTPCache()
+
+    def close(self) -> None:
+        super().close()
+        if self.owns_cache:
+            self.cache.close()
+
+    def is_fresh(self, url: str, params: dict = None) -> bool:
+        return self.cache.is_fresh(url, params)
+
+    def request(self, method, url, params=None, headers=None, **kwargs):
+        if method.upper() != 'GET' or not isinstance(params, (dict, type(None))):
+            return super().request(method, url, params=params, headers=headers, **kwargs)
+        key, entry = self.cache.lookup(url, params)
+        if entry is not None and entry.fresh:
+            return self._cached_response(entry)
+        headers = dict(headers or {})
+        if entry is not None:
+            headers.update(entry.conditional_headers())
+        response = super().request(method, url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            return self._cached_response(self.cache.update(key, entry, response.url, 304, response.headers))
+        self.cache.update(key, entry, response.url, response.status_code, response.headers, response.content)
+        response.from_cache = False
+        return response
+
+    def _cached_response(self, entry: CacheEntry) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry.status
+        response.reason = 'OK'
+        response.url = entry.url
+        response.headers = CaseInsensitiveDict(entry.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry.body
+        response.from_cache = True
+        return response
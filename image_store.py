@@ -0,0 +1,245 @@
+"""
+Content-addressed store for the cached Wikimedia images.
+
+Each cached image is stored once, named by the SHA-1 of its bytes:
+
+    images/wikimedia/objects/<first two hex digits>/<sha1>.<extension>
+
+so two items showing the same Commons file share one file, and renaming an
+item or merging datasets moves no bytes. The manifest in
+images/wikimedia/index.json maps every item to the Commons title, the
+rendition it shows ("960px") and the URL and upload checksum it was
+downloaded from, and every hash to its path:
+
+    {
+      "version": 1,
+      "objects": {"<sha1>": {"path": ..., "size": ..., "mime": ...}},
+      "items": {"aircraft": {"Concorde": {"title": "File:...", "variant": "960px",
+                                          "source_url": ..., "original_sha1": ...,
+                                          "original_size": ..., "sha1": ...,
+                                          "link": ...}}}
+    }
+
+Before downloading, scripts/sync_wikimedia_images.py asks the store
+whether any item already holds the rendition of the same upload; a deploy
+can compare hashes instead of file contents. The old per-item paths
+(images/wikimedia/<dataset>/<slug>.jpg) can still be created as symbolic
+links to the objects, for links from outside the site.
+"""
+
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from typing import Dict, Iterable, Optional
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IMAGES_DIR = 'images/wikimedia'
+OBJECTS_DIR = f'{IMAGES_DIR}/objects'
+# Downloads in progress, kept between runs so they can be resumed
+PARTIAL_DIR = f'{IMAGES_DIR}/partial'
+MANIFEST_FILE = f'{IMAGES_DIR}/index.json'
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 64 * 1024
+
+EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/gif': '.gif',
+    'image/svg+xml': '.svg',
+}
+
+
+def file_sha1(path: str) -> str:
+    """Return the hex SHA-1 of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def slug_path(dataset: str, name: str, mime: Optional[str]) -> str:
+    """Return the per-item path used before the store, e.g. images/wikimedia/aircraft/concorde.jpg."""
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    slug = re.sub(r'[^a-z0-9]+', '-', ascii_name.lower()).strip('-')
+    return f"{IMAGES_DIR}/{dataset}/{slug}{EXTENSIONS.get(mime or '', '.img')}"
+
+
+class ImageStore:
+    """Content-addressed image files and the manifest describing them."""
+
+    def __init__(self, root: str = ROOT, manifest_file: str = MANIFEST_FILE):
+        """
+        Parameters:
+        root (str): Repository root; all recorded paths are relative to it
+        manifest_file (str): Manifest path, relative to root
+        """
+        self.root = root
+        self.manifest_path = os.path.join(root, manifest_file)
+        manifest = {}
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        if manifest.get('version') != MANIFEST_VERSION:
+            # An older per-path index: its files are adopted again
+            manifest = {}
+        self.objects: Dict[str, dict] = manifest.get('objects', {})
+        self.items: Dict[str, Dict[str, dict]] = manifest.get('items', {})
+        self.verified = set()
+        self.downloaded = 0
+        self.reused = 0
+        self.skipped = 0
+        self.bytes_transferred = 0
+
+    def full_path(self, relative_path: str) -> str:
+        return os.path.join(self.root, relative_path)
+
+    def object_path(self, sha1: str, mime: Optional[str]) -> str:
+        """Return the path of the object with the given hash, relative to root."""
+        return f"{OBJECTS_DIR}/{sha1[:2]}/{sha1}{EXTENSIONS.get(mime or '', '.img')}"
+
+    def partial_path(self, url: str) -> str:
+        """Return the full path a download of url is written to until it completes."""
+        return os.path.join(self.root, PARTIAL_DIR, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.part')
+
+    def has_object(self, sha1: str) -> bool:
+        """Whether the object is on disk with the recorded size and hash; hashed once per run."""
+        if sha1 in self.verified:
+            return True
+        entry = self.objects.get(sha1)
+        if not entry:
+            return False
+        path = self.full_path(entry['path'])
+        if not os.path.isfile(path) or os.path.getsize(path) != entry['size'] or file_sha1(path) != sha1:
+            return False
+        self.verified.add(sha1)
+        return True
+
+    def find(self, source_url: str, original_sha1: Optional[str]) -> Optional[str]:
+        """
+        Find an object already downloaded from source_url for the same upload.
+
+        Parameters:
+        source_url (str): Rendition URL the image would be downloaded from
+        original_sha1 (str): SHA-1 Commons reports for the original upload
+
+        Returns:
+        str: Hash of a stored object, or None if it must be downloaded
+        """
+        if not original_sha1:
+            return None
+        for entries in self.items.values():
+            for entry in entries.values():
+                if (entry.get('source_url') == source_url and entry.get('original_sha1') == original_sha1
+                        and self.has_object(entry['sha1'])):
+                    return entry['sha1']
+        return None
+
+    def add(self, path: str, sha1: str, mime: Optional[str]) -> str:
+        """
+        Move a downloaded or adopted file into the store.
+
+        If an object with the same hash exists, the file is deleted instead.
+
+        Parameters:
+        path (str): Full path of the file
+        sha1 (str): Hash of its contents
+        mime (str): Content type, which picks the extension
+
+        Returns:
+        str: Path of the object, relative to root
+        """
+        if self.has_object(sha1):
+            os.remove(path)
+            return self.objects[sha1]['path']
+        relative_path = self.object_path(sha1, mime)
+        target = self.full_path(relative_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        size = os.path.getsize(path)
+        os.replace(path, target)
+        self.objects[sha1] = {'path': relative_path, 'size': size, 'mime': mime}
+        self.verified.add(sha1)
+        return relative_path
+
+    def assign(self, dataset: str, name: str, sha1: str, details: dict, link: bool = False) -> str:
+        """
+        Record that an item shows the stored object with the given hash.
+
+        Parameters:
+        dataset (str): Dataset key, e.g. 'aircraft'
+        name (str): Item name
+        sha1 (str): Hash of a stored object
+        details (dict): title, variant, source_url, original_sha1 and
+            original_size of the rendition
+        link (bool): Also create the item's slug path as a symbolic link to
+            the object; otherwise an existing link is removed
+
+        Returns:
+        str: Path of the object, relative to root
+        """
+        entry = self.objects[sha1]
+        previous = self.items.get(dataset, {}).get(name, {})
+        if previous.get('link'):
+            self._unlink(previous['link'])
+        record = dict(details, sha1=sha1)
+        if link:
+            record['link'] = slug_path(dataset, name, entry['mime'])
+            link_path = self.full_path(record['link'])
+            self._unlink(record['link'])
+            os.makedirs(os.path.dirname(link_path), exist_ok=True)
+            os.symlink(os.path.relpath(self.full_path(entry['path']), os.path.dirname(link_path)), link_path)
+        self.items.setdefault(dataset, {})[name] = record
+        return entry['path']
+
+    def _unlink(self, relative_path: str) -> None:
+        path = self.full_path(relative_path)
+        if os.path.islink(path):
+            os.remove(path)
+
+    def retain(self, dataset: str, names: Iterable[str]) -> None:
+        """Forget the items of a dataset that are not in names."""
+        names = set(names)
+        entries = self.items.get(dataset, {})
+        for name in [name for name in entries if name not in names]:
+            if entries[name].get('link'):
+                self._unlink(entries[name]['link'])
+            del entries[name]
+
+    def prune(self) -> int:
+        """
+        Delete the objects no item refers to.
+
+        Returns:
+        int: Number of objects deleted
+        """
+        referenced = {entry['sha1'] for entries in self.items.values() for entry in entries.values()}
+        removed = 0
+        for sha1 in [sha1 for sha1 in self.objects if sha1 not in referenced]:
+            path = self.full_path(self.objects.pop(sha1)['path'])
+            if os.path.isfile(path):
+                os.remove(path)
+                removed += 1
+        return removed
+
+    def save(self) -> None:
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'objects': dict(sorted(self.objects.items())),
+            'items': {dataset: dict(sorted(entries.items())) for dataset, entries in sorted(self.items.items())},
+        }
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        temp_file = self.manifest_path + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=True, indent=2)
+            f.write('\n')
+        os.replace(temp_file, self.manifest_path)
+
+    def report(self) -> str:
+        stored = sum(entry['size'] for entry in self.objects.values())
+        items = sum(len(entries) for entries in self.items.values())
+        return (f"Images: {self.downloaded} downloaded ({self.bytes_transferred / 1e6:.1f} MB), "
+                f"{self.reused} reused from another item, {self.skipped} unchanged; "
+                f"{items} items share {len(self.objects)} objects ({stored / 1e6:.1f} MB)")
@@ -0,0 +1,228 @@
+"""
+Resized WebP and AVIF renditions of the cached Wikimedia images.
+
+sync_wikimedia_images.py caches one rendition of up to 960 px per item in
+the image store (image_store.py), which the gallery and list pages then show
+a few hundred pixels wide. For every cached image this writes copies at
+each of WIDTHS narrower than the image, plus one at its own width if it is
+no wider than the largest of them, in each modern format Pillow can encode
+(e.g. images/wikimedia/variants/<sha1>-320w.webp). Named after the object
+they come from, they are shared by items showing the same image. Images are
+handled in parallel on a process pool, and variants newer than their source
+are left alone; variants of images no longer in the store are deleted.
+
+The widths, heights and paths are written to images/wikimedia/variants.json,
+keyed by the stored image's path. The derive stage copies them into the
+processed records as image_width, image_height and image_variants, which
+js/responsive-images.js turns into <picture> sources with srcset.
+
+Pillow is optional: without it, or without WebP/AVIF support in it, no
+variants are written and the pages keep using the cached image alone.
+
+Usage:
+    python image_variants.py          # write missing or stale variants
+"""
+
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from image_store import IMAGES_DIR, OBJECTS_DIR
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+# Stored images, relative to the repository root
+SOURCE_GLOBS = tuple(f'{OBJECTS_DIR}/*/*.{extension}' for extension in ('jpg', 'jpeg', 'png', 'gif', 'webp'))
+VARIANTS_DIR = f'{IMAGES_DIR}/variants'
+VARIANTS_FILE = f'{IMAGES_DIR}/variants.json'
+
+# Rendition widths in pixels; sources narrower than a width skip it. The
+# largest covers the details modal on high-density screens
+WIDTHS = (160, 320, 640)
+
+# Content type, file extension and encoder options of each output format, best first
+FORMATS = {
+    'avif': ('image/avif', '.avif', {'quality': 55, 'speed': 6}),
+    'webp': ('image/webp', '.webp', {'quality': 80, 'method': 4}),
+}
+
+
+def available_formats() -> List[str]:
+    """Return the output formats the installed Pillow can encode."""
+    if Image is None:
+        return []
+    return [name for name in FORMATS if features.check(name)]
+
+
+def source_images(root: str = '.') -> List[str]:
+    """List the cached images, relative to root and sorted."""
+    paths = set()
+    for pattern in SOURCE_GLOBS:
+        for full_path in glob.glob(os.path.join(root, pattern)):
+            paths.add(os.path.relpath(full_path, root).replace(os.sep, '/'))
+    return sorted(paths)
+
+
+def variant_path(source: str, width: int, image_format: str) -> str:
+    """Return the path of one rendition of a stored image."""
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f"{VARIANTS_DIR}/{stem}-{width}w{FORMATS[image_format][1]}"
+
+
+def planned_variants(source: str, size: Tuple[int, int], formats: List[str]) -> List[dict]:
+    """
+    Describe the renditions of an image of the given size.
+
+    Returns:
+    list: {'url', 'type', 'width', 'height'} for each rendition, best format
+        first and narrowest first within a format
+    """
+    width, height = size
+    widths = [w for w in WIDTHS if w < width]
+    if width <= WIDTHS[-1]:
+        widths.append(width)
+    return [
+        {
+            'url': variant_path(source, w, image_format),
+            'type': FORMATS[image_format][0],
+            'width': w,
+            'height': max(1, round(height * w / width)),
+        }
+        for image_format in formats
+        for w in widths
+    ]
+
+
+def generate_variants(source: str, formats: List[str], root: str = '.') -> dict:
+    """
+    Write the renditions of one image that are missing or older than it.
+
+    Parameters:
+    source (str): Cached image, relative to root
+    formats (list): Output formats from available_formats
+    root (str): Repository root
+
+    Returns:
+    dict: {'width', 'height', 'variants'} for the manifest, plus the number
+        of renditions 'written' and their total size in 'bytes'
+    """
+    source_path = os.path.join(root, source)
+    source_mtime = os.stat(source_path).st_mtime
+    with Image.open(source_path) as image:
+        # Reading the size only parses the header
+        size = image.size
+        if image.getexif().get(0x0112, 1) != 1:
+            size = ImageOps.exif_transpose(image).size
+        variants = planned_variants(source, size, formats)
+        stale = [
+            variant for variant in variants
+            if not os.path.exists(os.path.join(root, variant['url']))
+            or os.stat(os.path.join(root, variant['url'])).st_mtime < source_mtime
+        ]
+        written = 0
+        if stale:
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+            os.makedirs(os.path.join(root, os.path.dirname(variants[0]['url'])), exist_ok=True)
+            for variant in stale:
+                target = os.path.join(root, variant['url'])
+                resized = image if variant['width'] == size[0] else image.resize(
+                    (variant['width'], variant['height']), Image.LANCZOS)
+                image_format = next(name for name in formats if FORMATS[name][0] == variant['type'])
+                temp_file = target + '.tmp'
+                resized.save(temp_file, format=image_format.upper(), **FORMATS[image_format][2])
+                os.replace(temp_file, target)
+                written += os.path.getsize(target)
+    return {
+        'width': size[0],
+        'height': size[1],
+        'variants': variants,
+        'written': len(stale),
+        'bytes': written,
+    }
+
+
+def build_variants(root: str = '.', workers: int = None) -> Dict[str, dict]:
+    """
+    Bring the renditions of every cached image up to date and write the manifest.
+
+    Parameters:
+    root (str): Repository root
+    workers (int): Worker processes (default: one per core)
+
+    Returns:
+    dict: The manifest, {source: {'width', 'height', 'variants'}}
+    """
+    formats = available_formats()
+    sources = source_images(root)
+    manifest = {}
+    if not formats:
+        reason = "Pillow is not installed" if Image is None else "Pillow cannot encode WebP or AVIF"
+        print(f"{reason}; no image variants were written")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(generate_variants, source, formats, root) for source in sources]
+            results = [future.result() for future in futures]
+        written = sum(result.pop('written') for result in results)
+        written_bytes = sum(result.pop('bytes') for result in results)
+        manifest = dict(zip(sources, results))
+        print(f"Wrote {written} image variant(s) ({written_bytes / 1024:.0f} kB) for {len(sources)} image(s) "
+              f"in {', '.join(formats)}")
+        print(f"  {format_savings(manifest, root)}")
+
+    # Variants of images that are no longer stored
+    current = {variant['url'] for entry in manifest.values() for variant in entry['variants']}
+    stale = [path for path in glob.glob(os.path.join(root, VARIANTS_DIR, '*'))
+             if os.path.relpath(path, root).replace(os.sep, '/') not in current]
+    for path in stale:
+        os.remove(path)
+    if stale:
+        print(f"  Removed {len(stale)} variant(s) of images no longer stored")
+
+    temp_file = os.path.join(root, VARIANTS_FILE + '.tmp')
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(temp_file, os.path.join(root, VARIANTS_FILE))
+    return manifest
+
+
+def format_savings(manifest: Dict[str, dict], root: str = '.', width: int = 320) -> str:
+    """Compare the cached images with their best rendition of about the given width."""
+    original = best = 0
+    for source, entry in manifest.items():
+        candidates = [variant for variant in entry['variants'] if variant['width'] >= width] or entry['variants']
+        narrowest = min(variant['width'] for variant in candidates)
+        sizes = [os.path.getsize(os.path.join(root, variant['url']))
+                 for variant in candidates if variant['width'] == narrowest]
+        original += os.path.getsize(os.path.join(root, source))
+        best += min(sizes)
+    if not original:
+        return "no images"
+    return (f"{width} px thumbnails: {best / 1024:.0f} kB instead of {original / 1024:.0f} kB "
+            f"for the cached images ({100 * (1 - best / original):.0f}% smaller)")
+
+
+def load_variants(variants_file: str = VARIANTS_FILE) -> Dict[str, dict]:
+    """Load the manifest written by build_variants, empty if there is none."""
+    if not os.path.exists(variants_file):
+        return {}
+    with open(variants_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main() -> int:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    build_variants()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
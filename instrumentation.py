@@ -0,0 +1,340 @@
+"""
+Timers, counters, profiling and logging for the processing pipeline.
+
+Timing is off until enable() is called, and then records the calls, total
+and longest time of every stage and timed function:
+
+    with stage('derive'):               # a block of code
+        ...
+
+    @timed()                            # every call of a function
+    def derive_items(items, label, batch):
+        ...
+
+    count('records.rejected')           # a counter
+
+While disabled, stage() returns a shared no-op context manager and a timed
+function costs one flag check and an extra call, so the instrumented code
+can stay in place. Functions called once per record are not timed; the
+stage or function looping over the records is.
+report() prints the timers and counters; snapshot() returns them as a dict.
+
+profile() runs a block under cProfile and dumps the statistics for pstats or
+snakeviz. StackSampler samples the stacks of all threads every few
+milliseconds and writes them collapsed, one "frame;frame;frame count" line
+per stack, for flamegraph.pl or speedscope. session() combines all three for
+a command-line run.
+
+get_logger() returns loggers that write plain messages to the current
+standard output, which is what the tools printed before. Per-record
+messages are logged at DEBUG, so they cost a level check unless asked for
+with set_log_level('DEBUG'). A message logged with extra=SECTION starts a
+new section of the output and is preceded by a blank line:
+
+    log.info("Processing %s", input_file, extra=SECTION)
+
+Timers live in the process that records them; the worker processes of
+process_databases_parallel are not included.
+"""
+
+import cProfile
+import contextlib
+import functools
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, TextIO, Union
+
+# Parent of the loggers returned by get_logger
+LOGGER_NAME = 'aircraft_data'
+# extra= for a message that starts a section of the output
+SECTION = {'section': True}
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+# Functions listed after a profiled run
+PROFILE_TOP = 25
+
+_enabled = False
+_lock = threading.Lock()
+# name -> [calls, total seconds, longest call in seconds]
+_timers: Dict[str, List[float]] = {}
+_counters: Counter = Counter()
+
+
+def enable(on: bool = True) -> None:
+    """Start (or with on=False stop) recording timers and counters."""
+    global _enabled
+    _enabled = on
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def _record(name: str, seconds: float) -> None:
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            _timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            if seconds > timer[2]:
+                timer[2] = seconds
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> '_Stage':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _record(self.name, time.perf_counter() - self.start)
+
+
+_NOT_TIMED = contextlib.nullcontext()
+
+
+def stage(name: str) -> Union[_Stage, contextlib.nullcontext]:
+    """Context manager timing a block under name."""
+    return _Stage(name) if _enabled else _NOT_TIMED
+
+
+def timed(name: str = None) -> Callable[[Callable], Callable]:
+    """
+    Decorator timing every call of a function.
+
+    Parameters:
+    name (str): Timer name (default: the function's module and qualified name)
+    """
+    def decorate(function: Callable) -> Callable:
+        label = name or f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _record(label, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Add amount to the counter name."""
+    if _enabled:
+        with _lock:
+            _counters[name] += amount
+
+
+def snapshot() -> dict:
+    """
+    Current timers and counters.
+
+    Returns:
+    dict: {'timers': {name: {'calls', 'seconds', 'max_seconds'}},
+        'counters': {name: value}}
+    """
+    with _lock:
+        return {
+            'timers': {
+                name: {'calls': int(calls), 'seconds': total, 'max_seconds': longest}
+                for name, (calls, total, longest) in _timers.items()
+            },
+            'counters': dict(_counters),
+        }
+
+
+def report(stream: TextIO = None) -> None:
+    """Print the timers, longest total first, then the counters."""
+    stream = stream or sys.stdout
+    data = snapshot()
+    if data['timers']:
+        width = max(len(name) for name in data['timers'])
+        print(f"{'timer':<{width}} {'calls':>9} {'total ms':>11} {'per call ms':>12} {'max ms':>10}", file=stream)
+        for name, timer in sorted(data['timers'].items(), key=lambda entry: -entry[1]['seconds']):
+            print(f"{name:<{width}} {timer['calls']:>9} {timer['seconds'] * 1000:>11.1f} "
+                  f"{timer['seconds'] * 1000 / timer['calls']:>12.4f} {timer['max_seconds'] * 1000:>10.2f}",
+                  file=stream)
+    for name, value in sorted(data['counters'].items()):
+        print(f"{name}: {value}", file=stream)
+
+
+@contextlib.contextmanager
+def profile(output_file: str, top: int = PROFILE_TOP, stream: TextIO = None) -> Iterator[cProfile.Profile]:
+    """
+    Run a block under cProfile.
+
+    Parameters:
+    output_file (str): Where to dump the statistics (load with pstats.Stats)
+    top (int): Functions with the most cumulative time to print afterwards; 0 for none
+    stream (TextIO): Where to print them (default: standard output)
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output_file)
+        if top:
+            stats = pstats.Stats(profiler, stream=stream or sys.stdout)
+            stats.sort_stats('cumulative').print_stats(top)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Sample the stacks of all threads from a background thread.
+
+    Samples are taken every interval seconds, whenever the sampling thread
+    gets to run, so a long call that holds the GIL is sampled only when it
+    releases it; the proportions are close but not exact.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'StackSampler':
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    # Leave out the timed() wrappers between the real calls
+                    if frame.f_code.co_filename != __file__:
+                        labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def write(self, output_file: str) -> int:
+        """
+        Write the collapsed stacks, most frequent first.
+
+        Returns:
+        int: Number of samples
+        """
+        with open(output_file, 'w', encoding='utf-8') as f:
+            for stack, samples in self.stacks.most_common():
+                f.write(f"{stack} {samples}\n")
+        return sum(self.stacks.values())
+
+    def __enter__(self) -> 'StackSampler':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+@contextlib.contextmanager
+def session(timings: bool = False, profile_file: str = None, stacks_file: str = None,
+            stream: TextIO = None) -> Iterator[None]:
+    """
+    Instrument a whole run and report on it at the end.
+
+    Parameters:
+    timings (bool): Record the timers and counters and print them
+    profile_file (str): Run under cProfile and dump the statistics here
+    stacks_file (str): Sample the stacks and write them here, collapsed
+    stream (TextIO): Where to print (default: standard output)
+    """
+    stream = stream or sys.stdout
+    with contextlib.ExitStack() as stack:
+        if timings:
+            reset()
+            enable()
+            stack.callback(enable, False)
+        sampler = stack.enter_context(StackSampler()) if stacks_file else None
+        if profile_file:
+            stack.enter_context(profile(profile_file, stream=stream))
+        yield
+    if profile_file:
+        print(f"Profile written to {profile_file}", file=stream)
+    if sampler is not None:
+        samples = sampler.write(stacks_file)
+        print(f"{samples} stack samples written to {stacks_file}", file=stream)
+    if timings:
+        print(file=stream)
+        report(stream)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Stream handler that writes to whatever sys.stdout is at the time."""
+
+    @property
+    def stream(self) -> TextIO:
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value) -> None:
+        pass
+
+
+class _PlainFormatter(logging.Formatter):
+    """The message alone, after a blank line if it starts a section."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        return '\n' + message if getattr(record, 'section', False) else message
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Logger for a module of the pipeline.
+
+    Messages go to standard output without decoration, at INFO and above
+    unless set_log_level says otherwise, and are not passed to the root
+    logger.
+    """
+    parent = logging.getLogger(LOGGER_NAME)
+    if not parent.handlers:
+        handler = _StdoutHandler()
+        handler.setFormatter(_PlainFormatter('%(message)s'))
+        parent.addHandler(handler)
+        parent.setLevel(logging.INFO)
+        parent.propagate = False
+    return parent.getChild(name)
+
+
+def set_log_level(level: Union[int, str]) -> None:
+    """Set the level of every pipeline logger, e.g. 'DEBUG' or logging.WARNING."""
+    get_logger('instrumentation')
+    logging.getLogger(LOGGER_NAME).setLevel(level.upper() if isinstance(level, str) else level)
+
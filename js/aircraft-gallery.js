@@ -198,12 +198,21 @@ function createGalleryItem(aircraft) {
     item.className = 'gallery-item';
     item.dataset.id = aircraft.id;
     
-    // Create image
-    const img = document.createElement('img');
-    img.className = 'gallery-img';
-    img.src = aircraft.thumbnail_url || aircraft.image_url;
-    img.alt = aircraft.name;
-    img.loading = 'lazy';
+    // Create image, as a <picture> with resized renditions when available
+    let img;
+    if (typeof ResponsiveImages !== 'undefined') {
+        img = ResponsiveImages.createPicture(aircraft, {
+            className: 'gallery-img',
+            sizes: ResponsiveImages.GALLERY_SIZES,
+            loading: 'lazy'
+        }).element;
+    } else {
+        img = document.createElement('img');
+        img.className = 'gallery-img';
+        img.src = aircraft.thumbnail_url || aircraft.image_url;
+        img.alt = aircraft.name;
+        img.loading = 'lazy';
+    }
     
     // Create caption
     const caption = document.createElement('div');
@@ -240,10 +249,13 @@ function openAircraftDetails(aircraft) {
     const mtowKg = aircraft.mtow_N ? (aircraft.mtow_N / 9.81).toFixed(2) : 'N/A';
     
     // Create content - use thumbnail_url with fallback to image_url
+    const imageHtml = typeof ResponsiveImages !== 'undefined'
+        ? ResponsiveImages.pictureHtml(aircraft, { className: 'img-fluid rounded mb-3', sizes: ResponsiveImages.MODAL_SIZES })
+        : `<img src="${aircraft.thumbnail_url || aircraft.image_url}" class="img-fluid rounded mb-3" alt="${aircraft.name}">`;
     modalContent.innerHTML = `
         <div class="row">
             <div class="col-md-6">
-                <img src="${aircraft.thumbnail_url || aircraft.image_url}" class="img-fluid rounded mb-3" alt="${aircraft.name}">
+                ${imageHtml}
                 <p class="text-muted small">
                     <strong>Image Attribution:</strong> ${aircraft.image_attribution || 'Not available'}
                 </p>
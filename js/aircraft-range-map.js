@@ -49,8 +49,7 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Load aircraft data
     function loadAircraftData() {
-        fetch('data/processed/aircraft_processed.json')
-            .then(response => response.json())
+        ColumnarData.loadDataset('aircraft')
             .then(data => {
                 allAircraft = data.aircraft.filter(aircraft => aircraft.range_km);
                 populateAircraftList(allAircraft);
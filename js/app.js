@@ -235,31 +235,22 @@ async function loadAircraftData() {
     console.log('Loading aircraft and bird data...');
     
     try {
-        // Carregar aeronaves e aves
-        console.log('Trying to load aircraft_processed.json...');
-        const aircraftResponse = await fetch('data/processed/aircraft_processed.json');
-        console.log('Aircraft_processed.json response status:', aircraftResponse.status);
-        
-        if (!aircraftResponse.ok) {
-            throw new Error(`Failed to load aircraft data: ${aircraftResponse.status} - ${aircraftResponse.statusText}`);
-        }
-        
-        const aircraftData = await aircraftResponse.json();
+        // Carregar aeronaves e aves (colunar, ou o arquivo processado se indisponível)
+        const [aircraftData, birds] = await Promise.all([
+            ColumnarData.loadDataset('aircraft'),
+            ColumnarData.loadDataset('birds')
+                .then(birdsData => {
+                    const birds = birdsData.birds || [];
+                    console.log('Bird data loaded successfully:', birds.length, 'birds');
+                    return birds;
+                })
+                .catch(error => {
+                    console.warn('Failed to load bird data:', error.message);
+                    return [];
+                })
+        ]);
         console.log('Aircraft data loaded successfully:', aircraftData.aircraft.length, 'aircraft');
 
-        console.log('Trying to load birds_processed.json...');
-        const birdsResponse = await fetch('data/processed/birds_processed.json');
-        console.log('Birds_processed.json response status:', birdsResponse.status);
-
-        let birds = [];
-        if (birdsResponse.ok) {
-            const birdsData = await birdsResponse.json();
-            birds = birdsData.birds || [];
-            console.log('Bird data loaded successfully:', birds.length, 'birds');
-        } else {
-            console.warn('Failed to load bird data:', birdsResponse.status, birdsResponse.statusText);
-        }
-
         // Processar e combinar dados
         const processedAircraft = aircraftData.aircraft.map(categorizeAircraft);
         const processedBirds = birds.map(bird => categorizeAircraft({...bird, category_type: 'ave'}));
@@ -0,0 +1,85 @@
+// Loader for the columnar exports of the processed datasets.
+(function(root, factory) {
+    const api = factory();
+
+    if (typeof module === 'object' && module.exports) {
+        module.exports = api;
+    } else {
+        root.ColumnarData = api;
+    }
+}(typeof globalThis !== 'undefined' ? globalThis : this, function() {
+    const FORMAT = 'columnar-v1';
+
+    function decodeColumn(column) {
+        if (Array.isArray(column)) {
+            return column;
+        }
+        const { dictionary, codes } = column;
+        const values = new Array(codes.length);
+        for (let i = 0; i < codes.length; i++) {
+            values[i] = dictionary[codes[i]];
+        }
+        return values;
+    }
+
+    // Add the fields of a columns or text document to records, creating
+    // the records when none are given.
+    function decodeRecords(documentData, records) {
+        if (documentData.format !== FORMAT) {
+            throw new Error(`Unsupported columnar format: ${documentData.format}`);
+        }
+        const rows = records || Array.from({ length: documentData.count }, () => ({}));
+        for (const field of documentData.fields) {
+            const values = decodeColumn(documentData.columns[field]);
+            const missing = new Set(documentData.missing[field] || []);
+            for (let row = 0; row < values.length; row++) {
+                if (!missing.has(row)) {
+                    rows[row][field] = values[row];
+                }
+            }
+        }
+        return rows;
+    }
+
+    // Rebuild the processed dataset, e.g. { metadata, aircraft: [...] }.
+    function fromColumnar(columnsData, textData) {
+        const records = decodeRecords(columnsData);
+        if (textData) {
+            decodeRecords(textData, records);
+        }
+        return { metadata: columnsData.metadata, [columnsData.key]: records };
+    }
+
+    async function fetchJson(url) {
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`Failed to load ${url}: ${response.status} ${response.statusText}`);
+        }
+        return response.json();
+    }
+
+    // Load data/processed/<name>_columns.json, plus the text fields when
+    // options.text is set, and fall back to <name>_processed.json if the
+    // columnar files are not available. Resolves to the same object as the
+    // processed file.
+    async function loadDataset(name, options = {}) {
+        const base = options.baseUrl || 'data/processed';
+        try {
+            const [columnsData, textData] = await Promise.all([
+                fetchJson(`${base}/${name}_columns.json`),
+                options.text ? fetchJson(`${base}/${name}_text.json`) : null
+            ]);
+            return fromColumnar(columnsData, textData);
+        } catch (error) {
+            console.warn(`Columnar ${name} data unavailable, loading ${name}_processed.json:`, error.message);
+            return fetchJson(`${base}/${name}_processed.json`);
+        }
+    }
+
+    return {
+        decodeColumn,
+        decodeRecords,
+        fromColumnar,
+        loadDataset
+    };
+}));
@@ -248,22 +248,12 @@ async function loadAircraftData() {
     try {
         console.log('Loading aircraft data...');
         
-        // Load aircraft data
-        const aircraftResponse = await fetch('data/processed/aircraft_processed.json');
-        if (!aircraftResponse.ok) {
-            throw new Error(`Failed to load aircraft data: ${aircraftResponse.status}`);
-        }
-        
-        const aircraftJson = await aircraftResponse.json();
+        // Load aircraft and bird data
+        const [aircraftJson, birdJson] = await Promise.all([
+            ColumnarData.loadDataset('aircraft'),
+            ColumnarData.loadDataset('birds')
+        ]);
         const aircraft = aircraftJson.aircraft || [];
-
-        // Load bird data
-        const birdResponse = await fetch('data/processed/birds_processed.json');
-        if (!birdResponse.ok) {
-            throw new Error(`Failed to load bird data: ${birdResponse.status}`);
-        }
-        
-        const birdJson = await birdResponse.json();
         const birds = birdJson.birds || [];
         
         // Combine data
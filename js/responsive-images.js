@@ -0,0 +1,116 @@
+// Responsive <picture> markup for records with resized image renditions.
+//
+// image_variants.py writes WebP/AVIF copies of each cached image at several
+// widths and the derive stage records them on the processed records as
+// image_variants, image_width and image_height. These helpers turn them into
+// one <source> per format with a srcset, so the browser picks the smallest
+// file for the displayed size, and keep the cached image as the <img>
+// fallback. Records without variants get a plain <img>.
+(function(root, factory) {
+    const api = factory();
+
+    if (typeof module === 'object' && module.exports) {
+        module.exports = api;
+    } else {
+        root.ResponsiveImages = api;
+    }
+}(typeof globalThis !== 'undefined' ? globalThis : this, function() {
+    // Rendered widths of the gallery columns and the details modal image
+    const GALLERY_SIZES = '(min-width: 992px) 25vw, (min-width: 768px) 33vw, (min-width: 576px) 50vw, 100vw';
+    const MODAL_SIZES = '(min-width: 992px) 370px, (min-width: 768px) 235px, (min-width: 576px) 470px, 100vw';
+
+    // srcset of each content type, in the order the types first appear
+    function sources(variants) {
+        const byType = new Map();
+        for (const variant of variants || []) {
+            if (!byType.has(variant.type)) {
+                byType.set(variant.type, []);
+            }
+            byType.get(variant.type).push(variant);
+        }
+        return Array.from(byType, ([type, list]) => ({
+            type,
+            srcset: list
+                .slice()
+                .sort((a, b) => a.width - b.width)
+                .map(variant => `${variant.url} ${variant.width}w`)
+                .join(', ')
+        }));
+    }
+
+    function fallbackUrl(record) {
+        return record.thumbnail_url || record.image_url;
+    }
+
+    function escapeAttribute(value) {
+        return String(value)
+            .replace(/&/g, '&amp;')
+            .replace(/"/g, '&quot;')
+            .replace(/</g, '&lt;')
+            .replace(/>/g, '&gt;');
+    }
+
+    function imgAttributes(record, options) {
+        const attributes = [['src', options.src || fallbackUrl(record)], ['alt', options.alt || record.name || '']];
+        if (options.className) {
+            attributes.push(['class', options.className]);
+        }
+        // Intrinsic size lets the browser reserve space before the image loads;
+        // leave it out where CSS constrains both dimensions
+        if (options.dimensions !== false && record.image_width && record.image_height) {
+            attributes.push(['width', record.image_width], ['height', record.image_height]);
+        }
+        if (options.loading) {
+            attributes.push(['loading', options.loading]);
+        }
+        return attributes;
+    }
+
+    // HTML string of a <picture>, or of a plain <img> when the record has
+    // no variants.
+    function pictureHtml(record, options = {}) {
+        const img = '<img ' + imgAttributes(record, options)
+            .map(([name, value]) => `${name}="${escapeAttribute(value)}"`)
+            .join(' ') + '>';
+        const list = sources(record.image_variants);
+        if (!list.length) {
+            return img;
+        }
+        const sizes = options.sizes || '100vw';
+        const sourceTags = list.map(source =>
+            `<source type="${escapeAttribute(source.type)}" srcset="${escapeAttribute(source.srcset)}" sizes="${escapeAttribute(sizes)}">`
+        );
+        return `<picture>${sourceTags.join('')}${img}</picture>`;
+    }
+
+    // DOM version of pictureHtml. Returns the element to insert and the
+    // <img> inside it, which is the same element when there are no variants.
+    function createPicture(record, options = {}) {
+        const img = document.createElement('img');
+        for (const [name, value] of imgAttributes(record, options)) {
+            img.setAttribute(name, value);
+        }
+        const list = sources(record.image_variants);
+        if (!list.length) {
+            return { element: img, img };
+        }
+        const picture = document.createElement('picture');
+        for (const { type, srcset } of list) {
+            const source = document.createElement('source');
+            source.type = type;
+            source.srcset = srcset;
+            source.sizes = options.sizes || '100vw';
+            picture.appendChild(source);
+        }
+        picture.appendChild(img);
+        return { element: picture, img };
+    }
+
+    return {
+        GALLERY_SIZES,
+        MODAL_SIZES,
+        sources,
+        pictureHtml,
+        createPicture
+    };
+}));
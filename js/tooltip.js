@@ -1,5 +1,5 @@
 // Function to create and manage image tooltips
-function createImageTooltip(element, imageUrl) {
+function createImageTooltip(element, imageUrl, record) {
     if (!imageUrl) return;
 
     // Create a unique tooltip for this element
@@ -11,10 +11,15 @@ function createImageTooltip(element, imageUrl) {
     tooltip.className = 'tooltip-image';
     document.body.appendChild(tooltip);
 
-    // Create image element
-    const img = document.createElement('img');
-    img.src = imageUrl;
-    tooltip.appendChild(img);
+    // Create image element, choosing among the resized renditions when available
+    if (record && typeof ResponsiveImages !== 'undefined') {
+        const picture = ResponsiveImages.createPicture(record, { src: imageUrl, sizes: '200px', dimensions: false });
+        tooltip.appendChild(picture.element);
+    } else {
+        const img = document.createElement('img');
+        img.src = imageUrl;
+        tooltip.appendChild(img);
+    }
 
     // Show tooltip on mouseover
     element.addEventListener('mouseover', (e) => {
@@ -79,5 +84,5 @@ function updateTooltipPosition(event, tooltip) {
 function addAircraftTooltip(element, aircraft) {
     if (!aircraft || !aircraft.image_url) return;
     element.classList.add('aircraft-link');
-    createImageTooltip(element, aircraft.image_url);
+    createImageTooltip(element, aircraft.image_url, aircraft);
 } 
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+Streaming reader and writer for the top-level JSON objects used by the
+datasets, such as {"metadata": {...}, "aircraft": [...]}.
+
+iter_json_members reads the file in fixed-size chunks and hands the elements
+of selected arrays out one at a time, so the whole document is never held
+in memory. JsonStreamWriter writes an object member by member and produces
+exactly the same bytes as json.dump(data, f, indent=2).
+"""
+
+import json
+import re
+from typing import Any, Iterable, Iterator, TextIO, Tuple
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _JsonStreamReader:
+    """Incremental JSON tokenizer over a text file, one value at a time."""
+
+    def __init__(self, f: TextIO, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: int) -> bool:
+        """Append more text to the buffer; return False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill(self.chunk_size):
+                raise ValueError("unexpected end of JSON document")
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"expected {char!r} but found {found!r} in JSON document")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow the read size so values larger than a chunk stay linear
+            self._fill(size)
+            size *= 2
+
+    def array_items(self) -> Iterator[Any]:
+        """Yield the elements of the array starting at the current position."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"expected ',' or ']' but found {separator!r} in JSON array")
+
+
+def iter_json_members(file_path: str, stream_keys: Iterable[str] = (), chunk_size: int = 1 << 20) -> Iterator[Tuple[str, Any]]:
+    """
+    Iterate over the members of a file holding one top-level JSON object.
+
+    Members named in stream_keys whose value is an array are yielded as a
+    generator over the array elements; every other member is decoded
+    whole. Each generator must be consumed before advancing to the next
+    member, and any elements left unread are skipped.
+
+    Parameters:
+    file_path (str): Path to the JSON file
+    stream_keys (iterable): Names of the array members to stream
+    chunk_size (int): Number of characters read from the file at a time
+
+    Returns:
+    iterator: (key, value) pairs in file order
+    """
+    stream_keys = set(stream_keys)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        reader = _JsonStreamReader(f, chunk_size)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            key = reader.value()
+            if not isinstance(key, str):
+                raise ValueError("expected a string key in JSON object")
+            reader.expect(':')
+            if key in stream_keys and reader.peek() == '[':
+                items = reader.array_items()
+                yield key, items
+                for _ in items:
+                    pass
+            else:
+                yield key, reader.value()
+            separator = reader.peek()
+            reader.pos += 1
+            if separator == '}':
+                return
+            if separator != ',':
+                raise ValueError(f"expected ',' or '}}' but found {separator!r} in JSON object")
+
+
+def encode_array_item(item: Any) -> str:
+    """
+    Encode one element of a top-level array member the way JsonStreamWriter
+    writes it, so the work can be done ahead of time or in another process.
+    """
+    return json.dumps(item, indent=2).replace('\n', '\n    ')
+
+
+class JsonStreamWriter:
+    """
+    Write a top-level JSON object incrementally.
+
+    The output is byte-for-byte identical to json.dump(data, f, indent=2)
+    for the same object: members are written with write_member, and large
+    arrays element by element between begin_array and end_array.
+    """
+
+    def __init__(self, f: TextIO):
+        self.f = f
+        self.members = 0
+        self.items = None
+
+    def _begin_member(self, key: str) -> None:
+        if self.items is not None:
+            raise ValueError("end_array must be called before the next member")
+        self.f.write('{\n  ' if self.members == 0 else ',\n  ')
+        self.f.write(json.dumps(key) + ': ')
+        self.members += 1
+
+    def write_member(self, key: str, value: Any) -> None:
+        """Write one complete member of the object."""
+        self._begin_member(key)
+        self.f.write(json.dumps(value, indent=2).replace('\n', '\n  '))
+
+    def begin_array(self, key: str) -> None:
+        """Start an array member whose elements follow through write_item."""
+        self._begin_member(key)
+        self.items = 0
+
+    def write_item(self, item: Any) -> None:
+        """Append one element to the array opened by begin_array."""
+        self.write_encoded_item(encode_array_item(item))
+
+    def write_encoded_item(self, encoded: str) -> None:
+        """Append one element already encoded with encode_array_item."""
+        self.f.write('[\n    ' if self.items == 0 else ',\n    ')
+        self.f.write(encoded)
+        self.items += 1
+
+    def end_array(self) -> None:
+        """Close the array opened by begin_array."""
+        self.f.write('[]' if self.items == 0 else '\n  ]')
+        self.items = None
+
+    def close(self) -> None:
+        """Close the object. The underlying file is left open."""
+        self.f.write('{}' if self.members == 0 else '\n}')
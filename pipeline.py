@@ -0,0 +1,476 @@
+"""
+Headless build pipeline for the processed datasets.
+
+The build is split into named stages declared as a small dependency graph:
+
+    attribution  scrape image attribution from Wikimedia Commons
+    thumbnails   look up thumbnail URLs for every image
+    images       write resized WebP/AVIF renditions of the cached images
+    derive       process the raw datasets into data/processed
+    export       write additional formats of the processed datasets
+    compress     write gzip and brotli copies of the site assets
+
+A stage runs only when one of its outputs is missing or one of its inputs
+changed since the stage last ran. The size, modification time and digest of
+every input are recorded in the state file when a stage runs. An input whose
+size or modification time differs from the recorded ones is hashed and
+compared with the recorded digest, so touching a file without changing it
+does not trigger a rebuild (its new time is recorded). When nothing changed a
+run only stats the files involved and returns in milliseconds.
+
+attribution and thumbnails need network access and are only run when named
+on the command line. Their outputs are still inputs of derive, so refreshing
+them rebuilds the processed data on the next run.
+
+Usage:
+    python pipeline.py                    # images, derive, export and compress
+    python pipeline.py attribution derive # refresh attribution, then derive
+    python pipeline.py --force            # rerun even if up to date
+    python pipeline.py --list             # show stages and their status
+    python pipeline.py --workers 4        # derive the datasets on 4 processes
+    python pipeline.py derive --force --timings --profile derive.prof --stacks derive.folded
+
+--timings prints the time spent in every stage and instrumented function,
+--profile runs the build under cProfile and --stacks samples it for a
+flamegraph (see instrumentation.py). -v logs every record, -q only problems.
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+import instrumentation
+
+DATA_DIR = Path('data')
+PROCESSED_DIR = DATA_DIR / 'processed'
+ATTRIBUTION_DIR = Path('attribution_results')
+STATE_FILE = PROCESSED_DIR / 'pipeline_state.json'
+THUMBNAILS_FILE = ATTRIBUTION_DIR / 'thumbnail_urls.json'
+VARIANTS_FILE = Path('images/wikimedia/variants.json')
+
+# Raw dataset, processed output and attribution file for each dataset, in ID order
+DATASETS = (
+    ('aircraft', DATA_DIR / 'aircraft.json', PROCESSED_DIR / 'aircraft_processed.json', ATTRIBUTION_DIR / 'aircraft_attribution.json'),
+    ('birds', DATA_DIR / 'birds.json', PROCESSED_DIR / 'birds_processed.json', ATTRIBUTION_DIR / 'birds_attribution.json'),
+)
+RAW_FILES = tuple(raw for _, raw, _, _ in DATASETS)
+PROCESSED_FILES = tuple(processed for _, _, processed, _ in DATASETS)
+ATTRIBUTION_FILES = tuple(attribution for _, _, _, attribution in DATASETS)
+CODE_FILES = (Path('process_aircraft_data.py'), Path('atmosphere.py'), Path('json_stream.py'))
+
+
+class Exporter(NamedTuple):
+    """An additional output format written by the export stage."""
+    name: str
+    outputs: Tuple[Path, ...]
+    run: Callable[[], None]
+
+
+def run_columnar_export(name: str, key: str) -> None:
+    from columnar_export import export_columnar, format_savings
+
+    report = export_columnar(
+        str(PROCESSED_DIR / f'{name}_processed.json'),
+        str(PROCESSED_DIR / f'{name}_columns.json'),
+        str(PROCESSED_DIR / f'{name}_text.json'),
+        key
+    )
+    print(f"    {format_savings(report)}")
+
+
+# Exporters run by the export stage, in order
+EXPORTERS: List[Exporter] = [
+    Exporter(f'{name} columnar', (PROCESSED_DIR / f'{name}_columns.json', PROCESSED_DIR / f'{name}_text.json'),
+             functools.partial(run_columnar_export, name, name))
+    for name, _, _, _ in DATASETS
+]
+
+
+class Stage(NamedTuple):
+    """A pipeline stage: the files it reads and writes and how to build them."""
+    name: str
+    description: str
+    depends: Tuple[str, ...]
+    inputs: Callable[[], Tuple[Path, ...]]
+    outputs: Callable[[], Tuple[Path, ...]]
+    run: Callable[[], None]
+    network: bool = False
+
+
+def run_attribution() -> None:
+    from process_aircraft_data import run_wiki_image_scraper
+
+    for _, raw, _, _ in DATASETS:
+        if not run_wiki_image_scraper(str(raw), str(ATTRIBUTION_DIR)):
+            raise RuntimeError(f"attribution scraping failed for {raw}")
+
+
+def load_thumbnail_urls(thumbnails_file: Path = THUMBNAILS_FILE) -> Dict[str, dict]:
+    """
+    Load the thumbnail lookups written by the thumbnails stage.
+
+    Parameters:
+    thumbnails_file (Path): Path to the thumbnail URL file
+
+    Returns:
+    dict: {name: {'image_url': ..., 'thumbnail_url': ...}}, empty if the
+        file does not exist
+    """
+    if not thumbnails_file.exists():
+        return {}
+    with open(thumbnails_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_thumbnails() -> None:
+    from thumbnail_resolver import ThumbnailResolver
+
+    previous = load_thumbnail_urls()
+    images = {}
+    for _, raw, _, _ in DATASETS:
+        with open(raw, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for items in data.values():
+            if not isinstance(items, list):
+                continue
+            for item in items:
+                if item.get('name') and item.get('image_url'):
+                    images[item['name']] = item['image_url']
+
+    # Only look up images that are new or changed since the last run
+    changed = [url for name, url in images.items() if previous.get(name, {}).get('image_url') != url]
+    with ThumbnailResolver() as resolver:
+        resolved = resolver.resolve_many(changed)
+    thumbnails = {}
+    for name, image_url in images.items():
+        if image_url in resolved:
+            thumbnails[name] = {'image_url': image_url, 'thumbnail_url': resolved[image_url]}
+        else:
+            thumbnails[name] = previous[name]
+    with open(THUMBNAILS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(thumbnails, f, indent=2, sort_keys=True)
+
+
+def source_images() -> Tuple[Path, ...]:
+    from image_variants import source_images
+
+    return tuple(Path(path) for path in source_images())
+
+
+def variant_images() -> Tuple[Path, ...]:
+    from image_variants import load_variants
+
+    return tuple(
+        Path(variant['url'])
+        for entry in load_variants(str(VARIANTS_FILE)).values()
+        for variant in entry['variants']
+    )
+
+
+def run_images() -> None:
+    from image_variants import build_variants
+
+    build_variants()
+
+
+def run_derive(workers: int = None) -> None:
+    from image_variants import load_variants
+    from process_aircraft_data import process_database, process_databases_parallel
+
+    os.makedirs(PROCESSED_DIR, exist_ok=True)
+    thumbnail_urls = {
+        name: entry['thumbnail_url']
+        for name, entry in load_thumbnail_urls().items()
+        if entry.get('thumbnail_url')
+    }
+    image_variants = load_variants(str(VARIANTS_FILE)) or None
+    if workers:
+        # Same output as the serial batch path; the build manifest is
+        # neither used nor updated
+        process_databases_parallel(
+            [(str(raw), str(processed), str(attribution) if attribution.exists() else None)
+             for _, raw, processed, attribution in DATASETS],
+            workers=workers,
+            batch=True,
+            thumbnail_urls=thumbnail_urls or None,
+            image_variants=image_variants
+        )
+        return
+    next_id = 1
+    for _, raw, processed, attribution in DATASETS:
+        next_id = process_database(
+            str(raw),
+            str(processed),
+            start_id=next_id,
+            attribution_file=str(attribution) if attribution.exists() else None,
+            batch=True,
+            manifest_file=str(PROCESSED_DIR / 'manifest.json'),
+            thumbnail_urls=thumbnail_urls or None,
+            image_variants=image_variants
+        )
+
+
+def run_export() -> None:
+    for exporter in EXPORTERS:
+        print(f"  Exporting {exporter.name}")
+        exporter.run()
+
+
+def compressed_assets() -> Tuple[Path, ...]:
+    from precompress import site_assets
+
+    return tuple(Path(path) for path in site_assets())
+
+
+def run_compress() -> None:
+    from precompress import precompress_site
+
+    precompress_site()
+
+
+STAGES = (
+    Stage('attribution', 'Scrape image attribution from Wikimedia Commons', (),
+          lambda: RAW_FILES + (Path('wiki_image_scraper.py'),),
+          lambda: ATTRIBUTION_FILES,
+          run_attribution, network=True),
+    Stage('thumbnails', 'Look up thumbnail URLs on Wikimedia Commons', (),
+          lambda: RAW_FILES,
+          lambda: (THUMBNAILS_FILE,),
+          run_thumbnails, network=True),
+    Stage('images', 'Write resized WebP/AVIF renditions of the cached images', (),
+          lambda: source_images() + (Path('image_variants.py'),),
+          lambda: (VARIANTS_FILE,) + variant_images(),
+          run_images),
+    Stage('derive', 'Compute derived values into data/processed', ('attribution', 'thumbnails', 'images'),
+          lambda: RAW_FILES + ATTRIBUTION_FILES + (THUMBNAILS_FILE, VARIANTS_FILE) + CODE_FILES,
+          lambda: PROCESSED_FILES,
+          run_derive),
+    Stage('export', 'Write additional formats of the processed data', ('derive',),
+          lambda: PROCESSED_FILES + (Path('pipeline.py'), Path('columnar_export.py')),
+          lambda: tuple(output for exporter in EXPORTERS for output in exporter.outputs),
+          run_export),
+    Stage('compress', 'Write gzip and brotli copies of the site assets', ('export',),
+          lambda: compressed_assets() + (Path('precompress.py'),),
+          lambda: tuple(path.with_name(path.name + '.gz') for path in compressed_assets()),
+          run_compress),
+)
+STAGES_BY_NAME = {stage.name: stage for stage in STAGES}
+DEFAULT_TARGETS = ('derive', 'export', 'compress')
+
+
+def file_hash(path: Path) -> str:
+    """Return the blake2b digest of a file's contents."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_state(state_file: Path = STATE_FILE) -> dict:
+    """Load the inputs recorded after each stage last ran."""
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: dict, state_file: Path = STATE_FILE) -> None:
+    os.makedirs(state_file.parent, exist_ok=True)
+    temp_file = state_file.with_name(state_file.name + '.tmp')
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(temp_file, state_file)
+
+
+def out_of_date_reason(stage: Stage, state: dict) -> str:
+    """
+    Decide whether a stage needs to run.
+
+    Parameters:
+    stage (Stage): The stage to check
+    state (dict): Pipeline state from load_state
+
+    Inputs that were touched but not changed get their new size and time
+    recorded in state, for run_pipeline to save.
+
+    Returns:
+    str: Why the stage must run, or an empty string if it is up to date
+    """
+    outputs = stage.outputs()
+    if not outputs:
+        return ''
+    for output in outputs:
+        if not output.exists():
+            return f"{output} is missing"
+
+    recorded = state.get(stage.name, {})
+    for path in stage.inputs():
+        entry = recorded.get(str(path))
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            if entry is not None:
+                return f"{path} was removed"
+            continue
+        if entry is None:
+            return f"{path} changed"
+        # Older state files recorded only the digest
+        if isinstance(entry, str):
+            entry = {'digest': entry}
+        if entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+            continue
+        if file_hash(path) != entry['digest']:
+            return f"{path} changed"
+        # Same contents: remember the new time so that the file is not hashed again
+        recorded[str(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': entry['digest']}
+    return ''
+
+
+def input_state(stage: Stage) -> Dict[str, dict]:
+    """Size, modification time and digest of each input of a stage, None if it is missing."""
+    inputs = {}
+    for path in stage.inputs():
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            inputs[str(path)] = None
+            continue
+        inputs[str(path)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'digest': file_hash(path)}
+    return inputs
+
+
+def unknown_stages(targets: List[str]) -> List[str]:
+    return [name for name in targets if name not in STAGES_BY_NAME]
+
+
+def plan(targets: List[str], include_network: bool) -> List[Stage]:
+    """
+    Order the target stages and their dependencies so that every stage
+    comes after the stages it depends on. Network stages are left out unless
+    they are targets themselves or include_network is set.
+    """
+    ordered = []
+    seen = set()
+
+    def visit(name: str) -> None:
+        if name in seen:
+            return
+        seen.add(name)
+        stage = STAGES_BY_NAME[name]
+        for dependency in stage.depends:
+            visit(dependency)
+        if not stage.network or include_network or name in targets:
+            ordered.append(stage)
+
+    for target in targets:
+        visit(target)
+    return ordered
+
+
+def run_pipeline(targets: List[str] = DEFAULT_TARGETS, force: bool = False, include_network: bool = False, stage_options: Dict[str, dict] = None) -> List[Tuple[str, str, float]]:
+    """
+    Run the target stages and any out-of-date dependencies.
+
+    Parameters:
+    targets (list): Names of the stages to bring up to date
+    force (bool): Run the target stages even if they are up to date
+    include_network (bool): Also run network stages the targets depend on
+    stage_options (dict): Keyword arguments for the run function of a stage,
+        by stage name, e.g. {'derive': {'workers': 4}}
+
+    Returns:
+    list: (stage name, 'ran' or 'up to date', seconds) for each stage
+
+    Raises:
+    ValueError: If a target is not a known stage
+    """
+    unknown = unknown_stages(targets)
+    if unknown:
+        raise ValueError(f"unknown stage(s): {', '.join(unknown)}")
+
+    state = load_state()
+    recorded = json.dumps(state, sort_keys=True)
+    timings = []
+    for stage in plan(list(targets), include_network):
+        start = time.perf_counter()
+        reason = 'forced' if force and stage.name in targets else out_of_date_reason(stage, state)
+        if reason:
+            print(f"[{stage.name}] running: {reason}")
+            with instrumentation.stage(f"pipeline.{stage.name}"):
+                stage.run(**(stage_options or {}).get(stage.name, {}))
+            state[stage.name] = input_state(stage)
+            save_state(state)
+            recorded = json.dumps(state, sort_keys=True)
+            status = 'ran'
+        else:
+            status = 'up to date'
+        timings.append((stage.name, status, time.perf_counter() - start))
+    # Keep the new times of inputs that were touched but not changed
+    if json.dumps(state, sort_keys=True) != recorded:
+        save_state(state)
+    return timings
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Build the processed datasets without prompts.')
+    parser.add_argument('stages', nargs='*', help=f"Stages to run (default: {' '.join(DEFAULT_TARGETS)})")
+    parser.add_argument('--force', action='store_true', help='Run the named stages even if they are up to date')
+    parser.add_argument('--network', action='store_true', help='Also run the network stages the targets depend on')
+    parser.add_argument('--list', action='store_true', help='List the stages and whether they are up to date')
+    parser.add_argument('--workers', type=int, help='Derive the datasets on this many worker processes')
+    parser.add_argument('--timings', action='store_true', help='Print the time spent per stage and instrumented function')
+    parser.add_argument('--profile', metavar='FILE', help='Run under cProfile and write the statistics to FILE')
+    parser.add_argument('--stacks', metavar='FILE', help='Sample the stacks and write them to FILE, collapsed for flamegraphs')
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument('-v', '--verbose', action='store_true', help='Log every record')
+    verbosity.add_argument('-q', '--quiet', action='store_true', help='Log only warnings and errors')
+    args = parser.parse_args(argv)
+
+    # Paths are relative to the repository root
+    os.chdir(Path(__file__).resolve().parent)
+    if args.verbose or args.quiet:
+        instrumentation.set_log_level('DEBUG' if args.verbose else 'WARNING')
+
+    if args.list:
+        state = load_state()
+        for stage in STAGES:
+            reason = out_of_date_reason(stage, state)
+            network = ' (network)' if stage.network else ''
+            print(f"{stage.name:<12} {reason or 'up to date':<50} {stage.description}{network}")
+        return 0
+
+    targets = args.stages or list(DEFAULT_TARGETS)
+    unknown = unknown_stages(targets)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    try:
+        with instrumentation.session(args.timings, args.profile, args.stacks):
+            timings = run_pipeline(targets, args.force, args.network,
+                                   {'derive': {'workers': args.workers}} if args.workers else None)
+    except Exception as e:
+        # A failing stage is not a usage error: report it and leave the
+        # state of the stages that completed as it is
+        traceback.print_exc()
+        print(f"Build failed: {e}", file=sys.stderr)
+        return 1
+
+    total = 0.0
+    for name, status, seconds in timings:
+        print(f"{name:<12} {status:<11} {seconds * 1000:9.1f} ms")
+        total += seconds
+    print(f"{'total':<12} {'':<11} {total * 1000:9.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
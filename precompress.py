@@ -0,0 +1,145 @@
+"""
+Precompressed copies of the site's text assets.
+
+For every compressible file (HTML, JavaScript, CSS, JSON, ...) above a
+minimum size this writes a gzip sibling, and a brotli sibling when the
+optional brotli package is installed, e.g. js/app.js.gz and js/app.js.br.
+serve.py sends these to clients that accept the encoding instead of
+compressing on every request. Siblings that are newer than their source
+are left alone.
+
+Usage:
+    python precompress.py             # compress the site assets
+"""
+
+import glob
+import gzip
+import io
+import os
+import sys
+from typing import Dict, List
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.html', '.js', '.css', '.json', '.svg', '.txt', '.xml')
+
+# Files served by the site, relative to the repository root
+SITE_ASSET_GLOBS = ('*.html', '*.css', '*.txt', '*.xml', 'css/*.css', 'js/*.js', 'data/*.json', 'data/processed/*.json')
+
+# Local build state next to the processed data, never served
+EXCLUDED_ASSETS = ('data/processed/manifest.json', 'data/processed/pipeline_state.json')
+
+# Smaller files fit in a single packet either way
+MIN_SIZE = 1024
+
+# File extension of the sibling written for each content coding
+EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+
+
+def available_encodings() -> List[str]:
+    """Return the content codings that can be produced, best first."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """
+    Compress data with the given content coding at the highest level.
+
+    Parameters:
+    data (bytes): Data to compress
+    encoding (str): 'gzip', or 'br' if brotli is installed
+
+    Returns:
+    bytes: The compressed data
+    """
+    if encoding == 'gzip':
+        # A fixed mtime keeps the output identical for identical input
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9, mtime=0) as f:
+            f.write(data)
+        return buffer.getvalue()
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=11)
+    raise ValueError(f"unsupported content coding: {encoding}")
+
+
+def is_compressible(path: str) -> bool:
+    return path.endswith(COMPRESSIBLE_EXTENSIONS)
+
+
+def site_assets(root: str = '.') -> List[str]:
+    """
+    List the compressible site files that are worth precompressing.
+
+    Parameters:
+    root (str): Repository root
+
+    Returns:
+    list: Paths relative to root, sorted
+    """
+    assets = set()
+    for pattern in SITE_ASSET_GLOBS:
+        for full_path in glob.glob(os.path.join(root, pattern)):
+            path = os.path.relpath(full_path, root).replace(os.sep, '/')
+            if is_compressible(path) and path not in EXCLUDED_ASSETS and os.path.getsize(full_path) >= MIN_SIZE:
+                assets.add(path)
+    return sorted(assets)
+
+
+def precompress_file(path: str, encodings: List[str] = None) -> Dict[str, int]:
+    """
+    Write compressed siblings of a file unless they are already up to date.
+
+    Parameters:
+    path (str): File to compress
+    encodings (list): Content codings to write; all available by default
+
+    Returns:
+    dict: Size in bytes of each sibling that was written
+    """
+    source_mtime = os.stat(path).st_mtime
+    written = {}
+    data = None
+    for encoding in encodings or available_encodings():
+        target = path + EXTENSIONS[encoding]
+        if os.path.exists(target) and os.stat(target).st_mtime >= source_mtime:
+            continue
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        compressed = compress_bytes(data, encoding)
+        temp_file = target + '.tmp'
+        with open(temp_file, 'wb') as f:
+            f.write(compressed)
+        os.replace(temp_file, target)
+        written[encoding] = len(compressed)
+    return written
+
+
+def precompress_site(root: str = '.') -> None:
+    """Precompress every site asset and print the savings."""
+    count = 0
+    for path in site_assets(root):
+        full_path = os.path.join(root, path)
+        written = precompress_file(full_path)
+        if not written:
+            continue
+        count += 1
+        sizes = ', '.join(f"{encoding} {compressed / 1024:.1f} kB" for encoding, compressed in written.items())
+        print(f"  {path}: {os.path.getsize(full_path) / 1024:.1f} kB -> {sizes}")
+    print(f"Precompressed {count} changed file(s)")
+    if brotli is None:
+        print("brotli is not installed; only gzip copies were written")
+
+
+def main() -> int:
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    precompress_site()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,57 @@
+import argparse
+import hashlib
 import json
 import math
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import os
 import subprocess
 import sys
-from typing import Dict, List, Union
+from typing import Dict, Iterator, List, Tuple, Union
 from add_thumbnail_urls import get_thumbnail_url
-import requests
-from bs4 import BeautifulSoup
-import re
+import numpy as np
+import atmosphere
+import instrumentation
+from instrumentation import SECTION, count, stage, timed
+from json_stream import JsonStreamWriter, encode_array_item, iter_json_members
+from thumbnail_resolver import ThumbnailResolver, resolve_thumbnails
+from atmosphere import MAX_ALTITUDE_M, MIN_ALTITUDE_M, SEA_LEVEL_DENSITY, isa_density
+
+log = instrumentation.get_logger('process_aircraft_data')
+
+# Fields every record needs before derived values can be computed
+REQUIRED_FIELDS = [
+    'mtow_N',
+    'wing_area_m2',
+    'wingspan_m',
+    'cruise_speed_ms',
+    'cruise_altitude_m'
+]
+
+# Optional fields added with default values when a record lacks them
+OPTIONAL_FIELDS = {
+    'empty_weight_N': None,
+    'max_payload_N': None,
+    'length_m': None,
+    'height_m': None,
+    'max_power_kW': None,
+    'fuel_capacity_kg': None,
+    'notes': None
+}
+
+# Optional numeric inputs of the derived values, read as columns in batch mode
+BATCH_OPTIONAL_FIELDS = ['takeoff_speed_ms', 'landing_speed_ms', 'empty_weight_N',
+                         'max_payload_N', 'fuel_capacity_kg', 'max_thrust_kN']
+
+# Wake Turbulence Category limits on MTOW, in kg
+WTC_LIGHT_MAX_KG = 7000
+WTC_MEDIUM_MAX_KG = 136000
+
+# Singular labels used in log messages for each dataset key
+DATASET_LABELS = {
+    'aircraft': 'aircraft',
+    'birds': 'bird',
+}
 
 def compute_isa_density(altitude_m: float) -> float:
     """
@@ -20,28 +63,7 @@ def compute_isa_density(altitude_m: float) -> float:
     Returns:
     float: Air density in kg/m³
     """
-    # ISA model constants
-    T0 = 288.15  # Sea level temperature in K
-    P0 = 101325  # Sea level pressure in Pa
-    rho0 = 1.225  # Sea level density in kg/m³
-    g = 9.80665  # Gravitational acceleration in m/s²
-    R = 287.05   # Gas constant for air in J/(kg·K)
-    a = -0.0065  # Temperature lapse rate in K/m for troposphere
-    
-    if altitude_m <= 11000:  # Troposphere
-        # Temperature at given altitude
-        T = T0 + a * altitude_m
-        # Pressure at given altitude
-        P = P0 * (T / T0) ** (-g / (a * R))
-        # Density at given altitude using ideal gas law
-        rho = P / (R * T)
-    else:  # Simplified model for stratosphere (constant temperature)
-        T = T0 + a * 11000
-        P11 = P0 * (T / T0) ** (-g / (a * R))
-        P = P11 * math.exp(-g * (altitude_m - 11000) / (R * T))
-        rho = P / (R * T)
-    
-    return rho
+    return isa_density(altitude_m)
 
 def determine_wtc(mtow_N: float) -> str:
     """
@@ -56,9 +78,9 @@ def determine_wtc(mtow_N: float) -> str:
     # Convert Newtons to kg (divide by standard gravity)
     mtow_kg = mtow_N / 9.80665
     
-    if mtow_kg <= 7000:
+    if mtow_kg <= WTC_LIGHT_MAX_KG:
         return "Light"
-    elif mtow_kg < 136000:
+    elif mtow_kg < WTC_MEDIUM_MAX_KG:
         return "Medium"
     else:
         return "Heavy"
@@ -93,11 +115,13 @@ def determine_era(first_flight_year: int) -> str:
     else:
         return "Contemporary"
 
+@timed()
 def load_json_data(file_path: str) -> dict:
     """Load JSON data from a file."""
     with open(file_path, 'r') as f:
         return json.load(f)
 
+@timed()
 def save_json_data(data: dict, file_path: str) -> None:
     """Save JSON data to a file with proper formatting."""
     with open(file_path, 'w') as f:
@@ -139,40 +163,20 @@ def compute_derived_values(aircraft):
         # Copy all existing fields
         processed = aircraft.copy()
         
-        # Basic validations and conversions
-        required_fields = [
-            'mtow_N',
-            'wing_area_m2',
-            'wingspan_m',
-            'cruise_speed_ms',
-            'cruise_altitude_m'
-        ]
-        
-        # Optional fields with default values
-        optional_fields = {
-            'empty_weight_N': None,
-            'max_payload_N': None,
-            'length_m': None,
-            'height_m': None,
-            'max_power_kW': None,
-            'fuel_capacity_kg': None,
-            'notes': None
-        }
-        
         # Add missing optional fields with default values
-        for field, default_value in optional_fields.items():
+        for field, default_value in OPTIONAL_FIELDS.items():
             if field not in processed:
                 processed[field] = default_value
 
         # Validate required fields
-        for field in required_fields:
+        for field in REQUIRED_FIELDS:
             if field not in processed or processed[field] is None:
-                print(f"Warning: Missing required field {field} for aircraft {processed.get('name', 'Unknown')}")
+                log.warning("Missing required field %s for aircraft %s", field, processed.get('name', 'Unknown'))
                 return None
             try:
                 processed[field] = float(processed[field])
             except (ValueError, TypeError):
-                print(f"Warning: Invalid value for {field} in aircraft {processed.get('name', 'Unknown')}")
+                log.warning("Invalid value for %s in aircraft %s", field, processed.get('name', 'Unknown'))
                 return None
 
         # Add WTC (Wake Turbulence Category) field
@@ -190,7 +194,7 @@ def compute_derived_values(aircraft):
 
         # Compute air density at cruise altitude
         rho_cruise = compute_isa_density(processed['cruise_altitude_m'])
-        rho_sl = compute_isa_density(0)  # Sea level density
+        rho_sl = SEA_LEVEL_DENSITY
         
         # Compute wing loading
         processed['wing_loading_Nm2'] = processed['mtow_N'] / processed['wing_area_m2']
@@ -228,15 +232,191 @@ def compute_derived_values(aircraft):
             # Convert max_thrust from kN to N by multiplying by 1000
             total_thrust_N = processed['max_thrust_kN'] * 1000 
             processed['thrust_to_weight_ratio'] = total_thrust_N / processed['mtow_N']
-            print(f"Computing T/W ratio for {processed['name']}: {processed['thrust_to_weight_ratio']:.3f}")
+            log.debug("Computing T/W ratio for %s: %.3f", processed['name'], processed['thrust_to_weight_ratio'])
         else:
-            print(f"Warning: Cannot compute T/W ratio for {processed['name']}, missing thrust or engine count data")
+            log.debug("Cannot compute T/W ratio for %s, missing thrust or engine count data", processed['name'])
         
         return processed
     except Exception as e:
-        print(f"Error processing aircraft {aircraft.get('name', 'Unknown')}: {str(e)}")
+        log.error("Cannot process aircraft %s: %s", aircraft.get('name', 'Unknown'), e)
         return None
 
+def _float_values(records: List[dict], fields: List[str], invalid: List[Tuple[int, str]]) -> Iterator[float]:
+    """
+    Yield the fields of each record in turn as floats, NaN where missing.
+    
+    Values that cannot be converted to float are yielded as NaN and their
+    (row index, field) pairs appended to invalid.
+    """
+    for row, record in enumerate(records):
+        for field in fields:
+            value = record.get(field)
+            if type(value) is float:
+                yield value
+            elif value is None:
+                yield np.nan
+            else:
+                try:
+                    value = float(value)
+                except (ValueError, TypeError):
+                    invalid.append((row, field))
+                    value = np.nan
+                yield value
+
+def _numeric_columns(records: List[dict], fields: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Gather fields of every record into float columns.
+    
+    The records are read in a single pass, each record once, since reading
+    one field of every record at a time touches every record once per field.
+    
+    Parameters:
+    records (list): Records to read the fields from
+    fields (list): Names of the fields
+    
+    Returns:
+    tuple: Array of shape (fields, records) holding NaN where a value is
+    missing or invalid, and a boolean array of the same shape flagging the
+    values that could not be converted to float
+    """
+    count = len(records)
+    invalid_values = []
+    values = np.fromiter(_float_values(records, fields, invalid_values), dtype=float, count=count * len(fields))
+    values = np.ascontiguousarray(values.reshape(count, len(fields)).T)
+    invalid = np.zeros(values.shape, dtype=bool)
+    for row, field in invalid_values:
+        invalid[fields.index(field), row] = True
+    return values, invalid
+
+@timed()
+def compute_derived_values_batch(records: List[dict]) -> Tuple[List[Union[dict, None]], List[Tuple[int, str]]]:
+    """
+    Compute derived values for a whole list of aircraft or birds at once.
+    
+    The numeric fields are gathered into NumPy columns, with masks for
+    missing optional fields, so each derived value costs a few array
+    operations instead of one Python call per record. The results are written
+    back into the records in place, with one dict update per record and the
+    same fields and key order as compute_derived_values.
+    
+    Parameters:
+    records (list): Aircraft or bird records, updated in place
+    
+    Returns:
+    tuple: Processed records aligned with the input (None for rejected rows)
+    and a list of (row index, message) pairs for the rejected rows
+    """
+    count = len(records)
+    rejected = np.zeros(count, dtype=bool)
+    errors = []
+    
+    def reject(rows, message):
+        for i in np.flatnonzero(rows & ~rejected):
+            errors.append((int(i), message.format(name=records[i].get('name', 'Unknown'))))
+        np.logical_or(rejected, rows, out=rejected)
+    
+    fields = REQUIRED_FIELDS + BATCH_OPTIONAL_FIELDS + ['first_flight_year']
+    values, invalid = _numeric_columns(records, fields)
+    column = dict(zip(fields, values))
+    
+    # Validate required fields, reporting the first problem of each row
+    for j, field in enumerate(REQUIRED_FIELDS):
+        reject(np.isnan(values[j]) & ~invalid[j], f"Missing required field {field} for {{name}}")
+        reject(invalid[j], f"Invalid value for {field} in {{name}}")
+    for j, field in enumerate(BATCH_OPTIONAL_FIELDS, start=len(REQUIRED_FIELDS)):
+        reject(invalid[j], f"Invalid value for {field} in {{name}}")
+    
+    mtow = column['mtow_N']
+    wing_area = column['wing_area_m2']
+    wingspan = column['wingspan_m']
+    cruise_speed = column['cruise_speed_ms']
+    cruise_altitude = column['cruise_altitude_m']
+    reject((cruise_altitude < MIN_ALTITUDE_M) | (cruise_altitude > MAX_ALTITUDE_M),
+           "Cruise altitude outside the ISA model range for {name}")
+    
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        # Add WTC (Wake Turbulence Category) and era fields
+        mtow_kg = mtow / 9.80665
+        wtc = np.select(
+            [mtow_kg <= WTC_LIGHT_MAX_KG, mtow_kg < WTC_MEDIUM_MAX_KG],
+            ["Light", "Medium"],
+            "Heavy"
+        ).astype(object)
+        years = column['first_flight_year']
+        era = np.full(count, "Unknown", dtype=object)
+        known = ~np.isnan(years)
+        unique_years, inverse = np.unique(np.trunc(years[known]), return_inverse=True)
+        era[known] = np.array([determine_era(int(year)) for year in unique_years], dtype=object)[inverse]
+        
+        # Compute air density at cruise altitude
+        # Rejected rows may hold NaN or out-of-range values, so clamp them first
+        rho_cruise = isa_density(np.clip(np.nan_to_num(cruise_altitude), MIN_ALTITUDE_M, MAX_ALTITUDE_M))
+        rho_sl = SEA_LEVEL_DENSITY
+        
+        q_cruise = 0.5 * rho_cruise * (cruise_speed ** 2)
+        derived = {
+            'wing_loading_Nm2': mtow / wing_area,
+            'aspect_ratio': (wingspan ** 2) / wing_area,
+            'VE_cruise_ms': cruise_speed * np.sqrt(rho_cruise / rho_sl),
+            'CL_cruise': mtow / (q_cruise * wing_area),
+        }
+        
+        # Values below are left out wherever one of their inputs is missing;
+        # takeoff and landing lift coefficients also need a non-zero speed
+        takeoff = column['takeoff_speed_ms']
+        landing = column['landing_speed_ms']
+        empty_weight = column['empty_weight_N']
+        payload = column['max_payload_N']
+        fuel = column['fuel_capacity_kg']
+        thrust = column['max_thrust_kN']
+        optional_derived = {
+            'CL_takeoff': (mtow / ((0.5 * rho_sl * (takeoff ** 2)) * wing_area), np.isnan(takeoff) | (takeoff == 0)),
+            'CL_landing': (mtow / ((0.5 * rho_sl * (landing ** 2)) * wing_area), np.isnan(landing) | (landing == 0)),
+            'useful_load_N': (mtow - empty_weight, np.isnan(empty_weight)),
+            'max_fuel_load_N': (mtow - empty_weight - payload, np.isnan(empty_weight) | np.isnan(payload)),
+            'max_fuel_weight_N': (fuel * 9.81, np.isnan(fuel)),
+            'thrust_to_weight_ratio': ((thrust * 1000) / mtow, np.isnan(thrust)),
+        }
+    
+    # Divisions by zero abort the record in compute_derived_values as well
+    reject((wing_area == 0) | (q_cruise == 0) | (~np.isnan(thrust) & (mtow == 0)),
+           "Division by zero while processing {name}")
+    
+    # Each accepted record gets its missing optional fields and then a single
+    # update holding, in the order compute_derived_values adds them, WTC and
+    # era, the required fields as floats and the derived values it has.
+    # Records that get the same derived values are updated together, with
+    # the values taken from the columns a group at a time.
+    absent = np.array([absent for _, absent in optional_derived.values()], dtype=np.int64)
+    signature = (1 << np.arange(len(absent))) @ absent
+    float_fields = REQUIRED_FIELDS + list(derived)
+    float_columns = [column[field] for field in REQUIRED_FIELDS] + list(derived.values())
+    defaults = list(OPTIONAL_FIELDS.items())
+    
+    accepted_rows = np.flatnonzero(~rejected)
+    groups, group_of = np.unique(signature[accepted_rows], return_inverse=True)
+    grouped_rows = np.split(accepted_rows[np.argsort(group_of, kind='stable')],
+                            np.cumsum(np.bincount(group_of.ravel(), minlength=len(groups)))[:-1])
+    for group, rows in zip(groups.tolist(), grouped_rows):
+        rows = rows.tolist()
+        names = ['WTC', 'era'] + float_fields
+        columns = [wtc[rows].tolist(), era[rows].tolist()] + [results[rows].tolist() for results in float_columns]
+        for j, (field, (results, _)) in enumerate(optional_derived.items()):
+            if not group >> j & 1:
+                names.append(field)
+                columns.append(results[rows].tolist())
+        for i, row in zip(rows, zip(*columns)):
+            record = records[i]
+            for field, default_value in defaults:
+                if field not in record:
+                    record[field] = default_value
+            record.update(zip(names, row))
+    
+    processed_records = list(records)
+    for i in np.flatnonzero(rejected).tolist():
+        processed_records[i] = None
+    return processed_records, errors
+
 def validate_aircraft(aircraft):
     """
     Validate aircraft data and ensure all required fields are present.
@@ -270,7 +450,7 @@ def validate_aircraft(aircraft):
     # Check required fields
     for field in required_fields:
         if field not in aircraft or aircraft[field] is None:
-            print(f"Warning: Missing required field {field} for aircraft {aircraft.get('name', 'Unknown')}")
+            log.warning("Missing required field %s for aircraft %s", field, aircraft.get('name', 'Unknown'))
             return False
     
     # Validate numeric fields
@@ -279,11 +459,12 @@ def validate_aircraft(aircraft):
             try:
                 float(aircraft[field])
             except (ValueError, TypeError):
-                print(f"Warning: Invalid numeric value for {field} in aircraft {aircraft.get('name', 'Unknown')}")
+                log.warning("Invalid numeric value for %s in aircraft %s", field, aircraft.get('name', 'Unknown'))
                 return False
     
     return True
 
+@timed()
 def load_attribution_data(attribution_file):
     """
     Load attribution data from a JSON file.
@@ -296,7 +477,7 @@ def load_attribution_data(attribution_file):
     """
     try:
         if not os.path.exists(attribution_file):
-            print(f"Attribution file {attribution_file} not found.")
+            log.warning("Attribution file %s not found.", attribution_file)
             return {}
         
         with open(attribution_file, 'r') as f:
@@ -317,7 +498,7 @@ def load_attribution_data(attribution_file):
         
         return attribution_map
     except Exception as e:
-        print(f"Error loading attribution data: {str(e)}")
+        log.error("Cannot load attribution data: %s", e)
         return {}
 
 def run_wiki_image_scraper(input_file, output_dir="attribution_results"):
@@ -344,44 +525,132 @@ def run_wiki_image_scraper(input_file, output_dir="attribution_results"):
         ]
         
         # Run the command
-        print(f"Running: {' '.join(cmd)}")
+        log.info("Running: %s", ' '.join(cmd))
         result = subprocess.run(cmd, capture_output=True, text=True)
         
         if result.returncode == 0:
-            print("Successfully updated image attribution information.")
-            print(result.stdout)
+            log.info("Successfully updated image attribution information.")
+            log.info("%s", result.stdout)
             return True
         else:
-            print(f"Error running wiki_image_scraper.py: {result.stderr}")
+            log.error("wiki_image_scraper.py failed: %s", result.stderr)
             return False
     except Exception as e:
-        print(f"Error running wiki_image_scraper.py: {str(e)}")
+        log.error("Cannot run wiki_image_scraper.py: %s", e)
         return False
 
-def clean_wikimedia_url(url):
-    """Clean Wikimedia URL to get base filename."""
-    if not url:
+def processing_code_version() -> str:
+    """
+    Hash the source of the modules that shape processed records, so cached
+    derived values are discarded whenever the processing code changes.
+    """
+    digest = hashlib.sha256()
+    for module_file in (__file__, atmosphere.__file__):
+        with open(module_file, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def file_digest(file_path: str) -> Union[str, None]:
+    """Return a content hash of a file, or None if it does not exist."""
+    if not file_path or not os.path.exists(file_path):
         return None
-        
-    # First remove any query parameters (after ?)
-    url = url.split('?')[0]
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def record_hash(record: dict) -> str:
+    """Hash the canonical JSON form of a record."""
+    canonical = json.dumps(record, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+@timed()
+def load_manifest(manifest_file: str) -> dict:
+    """
+    Load the build manifest used for incremental processing.
     
-    # Get the filename
-    filename = url.split('/')[-1]
+    The manifest records, for each output file, the hash of every input
+    record and the position of its processed version in the output. It is
+    reset when missing, unreadable or written by a different code version.
     
-    # If it's a thumb URL, get the original filename
-    if '/thumb/' in url:
-        # Remove resolution prefix (e.g., '1599px-')
-        if 'px-' in filename:
-            filename = filename.split('px-')[-1]
-        # Remove the thumbnail resolution version completely
-        parts = url.split('/thumb/')
-        if len(parts) > 1:
-            filename = parts[1].split('/')[-2]
+    Parameters:
+    manifest_file (str): Path to the manifest JSON file
     
-    return filename
+    Returns:
+    dict: The manifest
+    """
+    code_version = processing_code_version()
+    manifest = None
+    if os.path.exists(manifest_file):
+        try:
+            manifest = load_json_data(manifest_file)
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable manifest %s: %s", manifest_file, e)
+    if not manifest or manifest.get('code_version') != code_version:
+        return {'code_version': code_version, 'outputs': {}}
+    return manifest
+
+def prepare_record(item: dict, item_id: int, attribution_map: dict, label: str, verbose: bool = True, thumbnail_urls: dict = None, image_variants: dict = None) -> dict:
+    """
+    Assign an ID and attribution information to a raw record and rename its
+    fields, ready for compute_derived_values.
+    
+    Parameters:
+    item (dict): Raw aircraft or bird record, updated in place
+    item_id (int): ID to assign
+    attribution_map (dict): Attribution information by item name
+    label (str): Singular dataset label used in log messages
+    verbose (bool): Log a line for the record at DEBUG level
+    thumbnail_urls (dict): Previously fetched thumbnail URLs by item name
+    image_variants (dict): Resized renditions by cached image path, from
+        image_variants.load_variants
+    
+    Returns:
+    dict: The prepared record
+    """
+    # Assign new ID
+    item['id'] = item_id
+    if verbose:
+        log.debug("Processing %s %s with ID %s", label, item.get('name', 'Unknown'), item_id)
+    
+    # Add attribution information if available
+    if item.get('name') in attribution_map:
+        attribution = attribution_map[item['name']]
+        item['image_attribution'] = attribution.get('formatted_attribution')
+        item['image_license'] = attribution.get('license')
+        item['image_author'] = attribution.get('author')
+        if verbose:
+            log.debug("  Added attribution information for %s", item['name'])
+    
+    if thumbnail_urls and item.get('name') in thumbnail_urls:
+        item['thumbnail_url'] = thumbnail_urls[item['name']]
+    
+    if image_variants and item.get('image_url') in image_variants:
+        variants = image_variants[item['image_url']]
+        item['image_width'] = variants['width']
+        item['image_height'] = variants['height']
+        item['image_variants'] = variants['variants']
+    # Rename fields with units
+    return rename_fields_with_units(item)
+
+@timed()
+def derive_items(items: List[dict], label: str, batch: bool) -> List[Union[dict, None]]:
+    """
+    Compute derived values for prepared records, in one batch or one by one.
+    
+    Returns:
+    list: Processed records aligned with the input, None for rejected ones
+    """
+    if not batch:
+        return [compute_derived_values(item) for item in items]
+    results, errors = compute_derived_values_batch(items)
+    for row, message in errors:
+        log.warning("%s (%s)", message, label)
+    return results
 
-def process_database(input_file: str, output_file: str, start_id: int = 1, attribution_file: str = None, update_thumbnails: bool = False) -> int:
+@timed()
+def process_database(input_file: str, output_file: str, start_id: int = 1, attribution_file: str = None, update_thumbnails: bool = False, batch: bool = False, manifest_file: str = None, stream: bool = False, thumbnail_urls: dict = None, image_variants: dict = None) -> int:
     """
     Process the aircraft database and save the results.
     Returns the next available ID after processing.
@@ -392,15 +661,55 @@ def process_database(input_file: str, output_file: str, start_id: int = 1, attri
         start_id (int): Starting ID for items
         attribution_file (str): Path to attribution JSON file
         update_thumbnails (bool): Whether to update thumbnail URLs from Wikimedia
+        batch (bool): Compute derived values for the whole dataset at once with
+            compute_derived_values_batch instead of record by record
+        manifest_file (str): Path to a build manifest; when given, records whose
+            hash is unchanged since the last run reuse their processed values
+            from the existing output file instead of being recomputed
+        stream (bool): Stream records from the input to the output with
+            process_database_stream instead of loading the whole file
+        thumbnail_urls (dict): Thumbnail URLs fetched earlier, by item name,
+            applied without any network access
+        image_variants (dict): Resized renditions of the cached images, by
+            image path, recorded as image_width, image_height and image_variants
     """
-    print(f"\nProcessing {input_file}")
-    print(f"Starting with ID: {start_id}")
+    if stream:
+        return process_database_stream(input_file, output_file, start_id, attribution_file, update_thumbnails, batch, thumbnail_urls=thumbnail_urls, image_variants=image_variants)
+    
+    log.info("Processing %s", input_file, extra=SECTION)
+    log.info("Starting with ID: %s", start_id)
     
     # Check if input file exists
     if not os.path.exists(input_file):
-        print(f"Warning: Input file {input_file} does not exist")
+        log.warning("Input file %s does not exist", input_file)
         return start_id
     
+    # Skip the whole run when neither the inputs nor the output changed
+    manifest = None
+    cached_records = {}
+    previous_data = {}
+    if manifest_file:
+        manifest = load_manifest(manifest_file)
+        run_key = record_hash([file_digest(input_file), file_digest(attribution_file), start_id, batch, thumbnail_urls, image_variants])
+        cached_entry = manifest['outputs'].get(output_file, {})
+        if cached_entry and cached_entry.get('output_digest') == file_digest(output_file):
+            if cached_entry.get('run_key') == run_key and not update_thumbnails:
+                hits = sum(len(records) for records in cached_entry['records'].values())
+                log.info("%s is up to date", output_file)
+                log.info("Cache: %d hit, 0 missed, 0 evicted", hits)
+                log.info("Next available ID: %s", cached_entry['next_id'])
+                return cached_entry['next_id']
+            cached_records = cached_entry['records']
+            previous_data = load_json_data(output_file)
+        # Fetched thumbnails are not part of the record hash, so a thumbnail
+        # refresh recomputes everything and leaves nothing cached behind.
+        # Batch and per-record values differ in the last bits, so switching
+        # between them recomputes everything too.
+        if update_thumbnails or cached_entry.get('batch', batch) != batch:
+            cached_records = {}
+    hits = misses = evicted = 0
+    manifest_records = {}
+    
     # Load data
     data = load_json_data(input_file)
     current_id = start_id
@@ -409,139 +718,277 @@ def process_database(input_file: str, output_file: str, start_id: int = 1, attri
     attribution_map = {}
     if attribution_file and os.path.exists(attribution_file):
         attribution_map = load_attribution_data(attribution_file)
-        print(f"Loaded attribution data for {len(attribution_map)} items")
-    
-    # Process each aircraft
-    if 'aircraft' in data:
-        processed_aircraft = []
-        print(f"Found {len(data['aircraft'])} aircraft to process")
-        for aircraft in data['aircraft']:
-            # Assign new ID
-            aircraft['id'] = current_id
-            print(f"Processing aircraft {aircraft.get('name', 'Unknown')} with ID {current_id}")
-            current_id += 1
-            
-            # Add attribution information if available
-            if aircraft.get('name') in attribution_map:
-                attribution = attribution_map[aircraft['name']]
-                aircraft['image_attribution'] = attribution.get('formatted_attribution')
-                aircraft['image_license'] = attribution.get('license')
-                aircraft['image_author'] = attribution.get('author')
-                print(f"  Added attribution information for {aircraft['name']}")
-            
-            # Rename fields with units
-            aircraft = rename_fields_with_units(aircraft)
-            # Compute derived values
-            aircraft = compute_derived_values(aircraft)
-            if aircraft:  # Only add if processing was successful
-                processed_aircraft.append(aircraft)
-            
-            # Add thumbnail URL if requested and image_url exists
-            if update_thumbnails and aircraft.get('image_url'):
-                # Clean up the image URL to get proper filename
-                filename = clean_wikimedia_url(aircraft['image_url'])
-                if filename:
-                    description_url = f"https://commons.wikimedia.org/wiki/File:{filename}"
-                    
-                    print(f"  Getting thumbnail URL for {aircraft['name']}")
-                    print(f"  Description URL: {description_url}")
-                    
-                    try:
-                        response = requests.get(description_url)
-                        if response.status_code == 200:
-                            soup = BeautifulSoup(response.text, 'html.parser')
-                            
-                            # Find the "Other resolutions" section
-                            resolution_text = soup.find(string=re.compile("Other resolutions:"))
-                            if resolution_text:
-                                # Find the first link after "Other resolutions:" text
-                                first_thumbnail = resolution_text.find_next('a', class_='mw-thumbnail-link')
-                                if first_thumbnail:
-                                    thumbnail_url = first_thumbnail['href']
-                                    aircraft['thumbnail_url'] = thumbnail_url
-                                    print(f"    Found thumbnail: {thumbnail_url}")
-                                else:
-                                    print(f"    No thumbnail link found")
-                            else:
-                                print(f"    No 'Other resolutions' section found")
-                        else:
-                            print(f"    Failed to get description page: {response.status_code}")
-                    except Exception as e:
-                        print(f"    Error getting thumbnail: {str(e)}")
-
-        # Update the data with processed aircraft
-        data['aircraft'] = processed_aircraft
-        print(f"Successfully processed {len(processed_aircraft)} aircraft")
-    
-    if 'birds' in data:
-        processed_birds = []
-        print(f"Found {len(data['birds'])} birds to process")
-        for bird in data['birds']:
-            # Assign new ID
-            bird['id'] = current_id
-            print(f"Processing bird {bird.get('name', 'Unknown')} with ID {current_id}")
+        log.info("Loaded attribution data for %d items", len(attribution_map))
+    
+    # Process each aircraft or bird
+    for key, label in DATASET_LABELS.items():
+        if key not in data:
+            continue
+        
+        prepared = []
+        log.info("Found %d %s to process", len(data[key]), key)
+        for item in data[key]:
+            prepared.append(prepare_record(item, current_id, attribution_map, label, verbose=not batch, thumbnail_urls=thumbnail_urls, image_variants=image_variants))
             current_id += 1
+        
+        # Compute derived values, keeping only successfully processed items
+        if manifest is None:
+            results = derive_items(prepared, label, batch)
+        else:
+            # Reuse the previous output for records whose hash is unchanged.
+            # The ID is left out of the hash, since inserting or deleting a
+            # record shifts the IDs of every record after it, and is
+            # reassigned on the reused output.
+            with stage('process_aircraft_data.record_hash'):
+                hashes = [record_hash({field: value for field, value in item.items() if field != 'id'})
+                          for item in prepared]
+            cached = cached_records.get(key, {})
+            previous_items = previous_data.get(key, [])
+            results = [None] * len(prepared)
+            missed = []
+            for i, digest in enumerate(hashes):
+                if digest in cached:
+                    index = cached[digest]
+                    if index is not None:
+                        results[i] = dict(previous_items[index], id=prepared[i]['id'])
+                else:
+                    missed.append(i)
+            for i, item in zip(missed, derive_items([prepared[i] for i in missed], label, batch)):
+                results[i] = item
+            stale = len(cached.keys() - set(hashes))
+            hits += len(prepared) - len(missed)
+            misses += len(missed)
+            evicted += stale
+            count('process_aircraft_data.cache_hits', len(prepared) - len(missed))
+            count('process_aircraft_data.cache_misses', len(missed))
+            count('process_aircraft_data.cache_evicted', stale)
             
-            # Add attribution information if available
-            if bird.get('name') in attribution_map:
-                attribution = attribution_map[bird['name']]
-                bird['image_attribution'] = attribution.get('formatted_attribution')
-                bird['image_license'] = attribution.get('license')
-                bird['image_author'] = attribution.get('author')
-                print(f"  Added attribution information for {bird['name']}")
-            
-            # Rename fields with units
-            bird = rename_fields_with_units(bird)
-            # Compute derived values
-            bird = compute_derived_values(bird)
-            if bird:  # Only add if processing was successful
-                processed_birds.append(bird)
-            
-            # Add thumbnail URL if requested and image_url exists
-            if update_thumbnails and bird.get('image_url'):
-                # Clean up the image URL to get proper filename
-                filename = clean_wikimedia_url(bird['image_url'])
-                if filename:
-                    description_url = f"https://commons.wikimedia.org/wiki/File:{filename}"
-                    
-                    print(f"  Getting thumbnail URL for {bird['name']}")
-                    print(f"  Description URL: {description_url}")
-                    
-                    try:
-                        response = requests.get(description_url)
-                        if response.status_code == 200:
-                            soup = BeautifulSoup(response.text, 'html.parser')
-                            
-                            # Find the "Other resolutions" section
-                            resolution_text = soup.find(string=re.compile("Other resolutions:"))
-                            if resolution_text:
-                                # Find the first link after "Other resolutions:" text
-                                first_thumbnail = resolution_text.find_next('a', class_='mw-thumbnail-link')
-                                if first_thumbnail:
-                                    thumbnail_url = first_thumbnail['href']
-                                    bird['thumbnail_url'] = thumbnail_url
-                                    print(f"    Found thumbnail: {thumbnail_url}")
-                                else:
-                                    print(f"    No thumbnail link found")
-                            else:
-                                print(f"    No 'Other resolutions' section found")
-                        else:
-                            print(f"    Failed to get description page: {response.status_code}")
-                    except Exception as e:
-                        print(f"    Error getting thumbnail: {str(e)}")
-
-        # Update the data with processed birds
-        data['birds'] = processed_birds
-        print(f"Successfully processed {len(processed_birds)} birds")
+            # Remember where each record ends up in the new output
+            positions = {}
+            position = 0
+            for digest, item in zip(hashes, results):
+                if item:
+                    positions[digest] = position
+                    position += 1
+                else:
+                    positions[digest] = None
+            manifest_records[key] = positions
+        processed_items = [item for item in results if item]
+        count('process_aircraft_data.records', len(results))
+        count('process_aircraft_data.rejected', len(results) - len(processed_items))
+        
+        # Look up thumbnail URLs concurrently if requested
+        if update_thumbnails:
+            with stage('process_aircraft_data.resolve_thumbnails'):
+                resolve_thumbnails(processed_items)
+        
+        # Update the data with processed items
+        data[key] = processed_items
+        log.info("Successfully processed %d %s", len(processed_items), key)
     
     # Save processed data
     save_json_data(data, output_file)
-    print(f"Saved processed data to {output_file}")
-    print(f"Next available ID: {current_id}\n")
+    log.info("Saved processed data to %s", output_file)
+    
+    if manifest is not None:
+        evicted += sum(len(records) for key, records in cached_records.items() if key not in manifest_records)
+        if update_thumbnails:
+            manifest['outputs'].pop(output_file, None)
+        else:
+            manifest['outputs'][output_file] = {
+                'input': input_file,
+                'run_key': run_key,
+                'batch': batch,
+                'next_id': current_id,
+                'output_digest': file_digest(output_file),
+                'records': manifest_records,
+            }
+        save_json_data(manifest, manifest_file)
+        log.info("Cache: %d hit, %d missed, %d evicted", hits, misses, evicted)
+    log.info("Next available ID: %s", current_id)
+    
+    return current_id
+
+@timed()
+def process_database_stream(input_file: str, output_file: str, start_id: int = 1, attribution_file: str = None, update_thumbnails: bool = False, batch: bool = False, chunk_size: int = 10000, thumbnail_urls: dict = None, image_variants: dict = None) -> int:
+    """
+    Process a dataset file record by record without loading it into memory.
+    Returns the next available ID after processing.
+    
+    Records are read from the aircraft/birds arrays as a stream and written
+    to the output as soon as they are processed, so memory use does not grow
+    with the dataset. The output is byte-for-byte identical to the one
+    process_database writes. The build manifest is not used in this mode.
+    
+    Args:
+        input_file (str): Path to input JSON file
+        output_file (str): Path to output JSON file
+        start_id (int): Starting ID for items
+        attribution_file (str): Path to attribution JSON file
+        update_thumbnails (bool): Whether to update thumbnail URLs from Wikimedia
+        batch (bool): Compute derived values for chunks of records at once
+            with compute_derived_values_batch
+        chunk_size (int): Number of records per chunk in batch mode
+        thumbnail_urls (dict): Thumbnail URLs fetched earlier, by item name
+        image_variants (dict): Resized renditions of the cached images, by image path
+    """
+    log.info("Streaming %s", input_file, extra=SECTION)
+    log.info("Starting with ID: %s", start_id)
+    
+    # Check if input file exists
+    if not os.path.exists(input_file):
+        log.warning("Input file %s does not exist", input_file)
+        return start_id
+    
+    # Load attribution data if available
+    attribution_map = {}
+    if attribution_file and os.path.exists(attribution_file):
+        attribution_map = load_attribution_data(attribution_file)
+        log.info("Loaded attribution data for %d items", len(attribution_map))
+    
+    # Thumbnails are looked up a chunk at a time, so chunk even without batch
+    resolver = ThumbnailResolver() if update_thumbnails else None
+    records_per_chunk = chunk_size if batch or update_thumbnails else 1
+    current_id = start_id
+    with open(output_file, 'w') as f:
+        writer = JsonStreamWriter(f)
+        for key, value in iter_json_members(input_file, DATASET_LABELS):
+            if key not in DATASET_LABELS or not isinstance(value, Iterator):
+                writer.write_member(key, value)
+                continue
+            
+            label = DATASET_LABELS[key]
+            found = processed = 0
+            writer.begin_array(key)
+            chunk = []
+            for item in value:
+                chunk.append(prepare_record(item, current_id, attribution_map, label, verbose=not batch, thumbnail_urls=thumbnail_urls, image_variants=image_variants))
+                current_id += 1
+                if len(chunk) < records_per_chunk:
+                    continue
+                processed += _write_processed_chunk(writer, chunk, label, batch, resolver)
+                found += len(chunk)
+                chunk = []
+            if chunk:
+                processed += _write_processed_chunk(writer, chunk, label, batch, resolver)
+                found += len(chunk)
+            writer.end_array()
+            count('process_aircraft_data.records', found)
+            count('process_aircraft_data.rejected', found - processed)
+            log.info("Successfully processed %d of %d %s", processed, found, key)
+        writer.close()
+    if resolver is not None:
+        resolver.close()
     
+    log.info("Saved processed data to %s", output_file)
+    log.info("Next available ID: %s", current_id)
     return current_id
 
-def main():
+@timed()
+def _write_processed_chunk(writer: JsonStreamWriter, chunk: List[dict], label: str, batch: bool, resolver: ThumbnailResolver = None) -> int:
+    """Derive one chunk of prepared records, add thumbnails if a resolver is given, and append it to the output."""
+    items = [item for item in derive_items(chunk, label, batch) if item]
+    if resolver is not None:
+        with stage('process_aircraft_data.resolve_thumbnails'):
+            resolve_thumbnails(items, resolver)
+    for item in items:
+        writer.write_item(item)
+    return len(items)
+
+def _process_chunk(records: List[dict], start_id: int, attribution_map: dict, label: str, batch: bool, thumbnail_urls: dict = None, image_variants: dict = None) -> List[str]:
+    """
+    Prepare and derive a chunk of consecutive records in a worker process.
+    
+    Returns:
+    list: The processed records, already encoded for the output file
+    """
+    prepared = [
+        prepare_record(item, start_id + offset, attribution_map, label, verbose=False, thumbnail_urls=thumbnail_urls, image_variants=image_variants)
+        for offset, item in enumerate(records)
+    ]
+    results = derive_items(prepared, label, batch)
+    return [encode_array_item(item) for item in results if item]
+
+@timed()
+def process_databases_parallel(datasets: List[Tuple[str, str, Union[str, None]]], start_id: int = 1, workers: int = None, chunk_size: int = 5000, batch: bool = False, thumbnail_urls: dict = None, image_variants: dict = None) -> int:
+    """
+    Process several dataset files at once on a pool of worker processes.
+    Returns the next available ID after processing.
+    
+    IDs are handed out in dataset order, exactly as consecutive
+    process_database calls would, but the ranges are allocated up front from
+    the record counts so that every dataset and every chunk of records can
+    be processed, and encoded for output, in parallel. The chunks are then
+    written back in their original order, producing the same files as
+    process_database with the same batch setting. The batch and per-record
+    paths differ in the last bits of some floating-point values, so do not
+    mix them when comparing outputs. Thumbnail updates and the build
+    manifest are not supported.
+    
+    Args:
+        datasets (list): (input_file, output_file, attribution_file) tuples,
+            in ID order; attribution_file may be None
+        start_id (int): Starting ID for the first dataset
+        workers (int): Number of worker processes (default: one per core)
+        chunk_size (int): Number of records sent to a worker at a time
+        batch (bool): Use compute_derived_values_batch in the workers
+        thumbnail_urls (dict): Thumbnail URLs fetched earlier, by item name
+        image_variants (dict): Resized renditions of the cached images, by image path
+    """
+    current_id = start_id
+    jobs = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Allocate ID ranges and submit every chunk before waiting on any
+        for input_file, output_file, attribution_file in datasets:
+            if not os.path.exists(input_file):
+                log.warning("Input file %s does not exist", input_file)
+                continue
+            data = load_json_data(input_file)
+            attribution_map = {}
+            if attribution_file and os.path.exists(attribution_file):
+                attribution_map = load_attribution_data(attribution_file)
+            
+            futures = {}
+            for key, label in DATASET_LABELS.items():
+                if key not in data:
+                    continue
+                records = data[key]
+                log.info("Found %d %s in %s, IDs %d to %d", len(records), key, input_file, current_id, current_id + len(records) - 1)
+                futures[key] = [
+                    executor.submit(_process_chunk, records[i:i + chunk_size], current_id + i, attribution_map, label, batch, thumbnail_urls, image_variants)
+                    for i in range(0, len(records), chunk_size)
+                ]
+                current_id += len(records)
+            jobs.append((data, output_file, futures))
+        
+        # Merge the chunks in order
+        for data, output_file, futures in jobs:
+            with open(output_file, 'w') as f:
+                writer = JsonStreamWriter(f)
+                for key, value in data.items():
+                    if key not in futures:
+                        writer.write_member(key, value)
+                        continue
+                    writer.begin_array(key)
+                    processed = 0
+                    for future in futures[key]:
+                        encoded = future.result()
+                        for item in encoded:
+                            writer.write_encoded_item(item)
+                        processed += len(encoded)
+                    writer.end_array()
+                    log.info("Successfully processed %d %s", processed, key)
+                writer.close()
+            log.info("Saved processed data to %s", output_file)
+    
+    log.info("Next available ID: %s", current_id)
+    return current_id
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Process the raw datasets into data/processed.')
+    parser.add_argument('--workers', type=int, help='Process the datasets on this many worker processes with process_databases_parallel instead of one after the other')
+    args = parser.parse_args(argv)
+    
     # Define input and output paths
     data_dir = Path('data')
     processed_dir = data_dir / 'processed'
@@ -549,9 +996,9 @@ def main():
     
     # Create processed directory if it doesn't exist
     os.makedirs(processed_dir, exist_ok=True)
-    print("\nStarting data processing...")
-    print(f"Input directory: {data_dir}")
-    print(f"Output directory: {processed_dir}")
+    log.info("Starting data processing...", extra=SECTION)
+    log.info("Input directory: %s", data_dir)
+    log.info("Output directory: %s", processed_dir)
     
     # Ask if user wants to update image attribution information
     update_attribution = input("Do you want to update image attribution information? (y/n): ").lower().strip() == 'y'
@@ -562,7 +1009,7 @@ def main():
         update_thumbnails = input("Do you want to also fetch thumbnail URLs? (y/n): ").lower().strip() == 'y'
     
     if update_attribution:
-        print("\nUpdating image attribution information...")
+        log.info("Updating image attribution information...", extra=SECTION)
         # Create attribution directory if it doesn't exist
         os.makedirs(attribution_dir, exist_ok=True)
         
@@ -574,33 +1021,49 @@ def main():
         birds_input = str(data_dir / 'birds.json')
         run_wiki_image_scraper(birds_input, str(attribution_dir))
     
-    # Define attribution file paths
+    # Define attribution file paths and the incremental build manifest
+    manifest_file = str(processed_dir / 'manifest.json')
     aircraft_attribution = str(attribution_dir / 'aircraft_attribution.json')
     birds_attribution = str(attribution_dir / 'birds_attribution.json')
     
-    # Process aircraft data first, starting with ID 1
     aircraft_input = str(data_dir / 'aircraft.json')
     aircraft_output = str(processed_dir / 'aircraft_processed.json')
-    next_id = process_database(
-        aircraft_input,
-        aircraft_output,
-        start_id=1,
-        attribution_file=aircraft_attribution if os.path.exists(aircraft_attribution) else None,
-        update_thumbnails=update_thumbnails
-    )
-    
-    # Process birds data, starting with ID after the last aircraft
     birds_input = str(data_dir / 'birds.json')
     birds_output = str(processed_dir / 'birds_processed.json')
-    process_database(
-        birds_input,
-        birds_output,
-        start_id=next_id,
-        attribution_file=birds_attribution if os.path.exists(birds_attribution) else None,
-        update_thumbnails=update_thumbnails
-    )
-    
-    print("Data processing completed!")
+    aircraft_attribution = aircraft_attribution if os.path.exists(aircraft_attribution) else None
+    birds_attribution = birds_attribution if os.path.exists(birds_attribution) else None
+    
+    if args.workers and update_thumbnails:
+        log.info("Thumbnail updates are not supported by the parallel runner; processing serially")
+    if args.workers and not update_thumbnails:
+        # Both datasets at once, with IDs allocated as in the serial order
+        process_databases_parallel(
+            [(aircraft_input, aircraft_output, aircraft_attribution), (birds_input, birds_output, birds_attribution)],
+            start_id=1,
+            workers=args.workers
+        )
+    else:
+        # Process aircraft data first, starting with ID 1
+        next_id = process_database(
+            aircraft_input,
+            aircraft_output,
+            start_id=1,
+            attribution_file=aircraft_attribution,
+            update_thumbnails=update_thumbnails,
+            manifest_file=manifest_file
+        )
+        
+        # Process birds data, starting with ID after the last aircraft
+        process_database(
+            birds_input,
+            birds_output,
+            start_id=next_id,
+            attribution_file=birds_attribution,
+            update_thumbnails=update_thumbnails,
+            manifest_file=manifest_file
+        )
+    
+    log.info("Data processing completed!", extra=SECTION)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""
+Indexed in-memory store for querying the processed datasets.
+
+QueryStore loads the aircraft and bird records once and builds an index for
+every field: equality indexes (value -> set of rows) for string and boolean
+fields, sorted value/row arrays for numeric fields, and a dense rank per row
+for every field so results can be sorted without comparing the records
+themselves. Every sortable field also keeps its rows in ascending and
+descending order. A query intersects the candidate rows from the indexes,
+starting with the smallest set, then sorts, pages and projects only the
+rows it returns; a sort on one field walks that field's order up to the
+end of the page instead of sorting the candidates.
+
+serve.py exposes the store under /api; see QueryStore.query for the
+supported parameters.
+"""
+
+import json
+import math
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import Dict, List, Tuple
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# String fields with at most this many distinct values are listed by /api/fields
+MAX_LISTED_VALUES = 50
+
+# Filter results holding less than 1/WALK_FRACTION of the records are sorted
+# by rank rather than found by walking a field's whole order
+WALK_FRACTION = 8
+
+
+class QueryError(ValueError):
+    """Raised for a query that names an unknown field or has a malformed value."""
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class QueryStore:
+    """Records of several datasets with per-field indexes."""
+
+    def __init__(self, datasets: Dict[str, List[dict]]):
+        """
+        Build the indexes.
+
+        Parameters:
+        datasets (dict): Records by dataset name, e.g. {'aircraft': [...]};
+            every record gets a 'dataset' field with its dataset name
+        """
+        self.records = [
+            dict(record, dataset=name)
+            for name, records in datasets.items()
+            for record in records
+        ]
+        self.by_id = {record['id']: row for row, record in enumerate(self.records) if 'id' in record}
+        self.fields = list(dict.fromkeys(field for record in self.records for field in record))
+
+        # field -> value -> set of rows, for string and boolean fields
+        self.equality = {}
+        # field -> (sorted values, rows in the same order), for numeric fields
+        self.numeric = {}
+        # field -> rank of each row's value, len(records) where missing
+        self.ranks = {}
+        # field -> rows by ascending and by descending value, missing last
+        # in either, rows with the same value in row order
+        self.ascending = {}
+        self.descending = {}
+
+        for field in self.fields:
+            present = [(row, record[field]) for row, record in enumerate(self.records)
+                       if record.get(field) is not None]
+            if present and all(_is_number(value) for _, value in present):
+                present.sort(key=lambda item: item[1])
+                self.numeric[field] = ([value for _, value in present], [row for row, _ in present])
+            elif all(isinstance(value, (str, bool)) for _, value in present):
+                index = {}
+                for row, value in present:
+                    index.setdefault(value, set()).add(row)
+                self.equality[field] = index
+                present.sort(key=lambda item: (type(item[1]).__name__, item[1]))
+            else:
+                # Lists and objects can be returned but not filtered or sorted on
+                continue
+            ranks = [len(self.records)] * len(self.records)
+            rank, previous = -1, object()
+            for row, value in present:
+                if value != previous:
+                    rank, previous = rank + 1, value
+                ranks[row] = rank
+            self.ranks[field] = ranks
+            ordered = [row for row, _ in present]
+            missing = [row for row, rank in enumerate(ranks) if rank == len(self.records)]
+            self.ascending[field] = ordered + missing
+            self.descending[field] = sorted(ordered, key=lambda row: -ranks[row]) + missing
+
+    @classmethod
+    def from_files(cls, files: Dict[str, str]) -> 'QueryStore':
+        """
+        Load the store from processed JSON files.
+
+        Parameters:
+        files (dict): Path of the processed file by dataset name; the records
+            are the file's member of the same name
+
+        Returns:
+        QueryStore: The loaded store
+        """
+        datasets = {}
+        for name, path in files.items():
+            with open(path, 'r', encoding='utf-8') as f:
+                datasets[name] = json.load(f).get(name, [])
+        return cls(datasets)
+
+    def describe_fields(self) -> Dict[str, dict]:
+        """Return the type, range or values and count of every queryable field."""
+        description = {}
+        for field, (values, _) in self.numeric.items():
+            description[field] = {'type': 'number', 'min': values[0], 'max': values[-1], 'count': len(values)}
+        for field, index in self.equality.items():
+            entry = {'type': 'string', 'count': sum(len(rows) for rows in index.values())}
+            if len(index) <= MAX_LISTED_VALUES:
+                entry['values'] = sorted(index, key=lambda value: (type(value).__name__, value))
+            description[field] = entry
+        return description
+
+    def _range_rows(self, spec: str) -> set:
+        """Rows matching 'field:min:max', where either bound may be empty."""
+        try:
+            field, low, high = spec.split(':')
+            low = float(low) if low else None
+            high = float(high) if high else None
+        except ValueError:
+            raise QueryError(f"range must look like field:min:max, got {spec!r}")
+        if any(bound is not None and not math.isfinite(bound) for bound in (low, high)):
+            raise QueryError(f"range bounds must be finite numbers, got {spec!r}")
+        if field not in self.numeric:
+            raise QueryError(f"{field!r} is not a numeric field")
+        values, rows = self.numeric[field]
+        start = bisect_left(values, low) if low is not None else 0
+        end = bisect_right(values, high) if high is not None else len(values)
+        return set(rows[start:end])
+
+    def _sort_fields(self, spec: str) -> List[Tuple[str, bool]]:
+        """(field, descending) pairs of a 'f,-g' sort parameter."""
+        fields = []
+        for part in spec.split(','):
+            part = part.strip()
+            field = part.lstrip('-+')
+            if field not in self.ranks:
+                raise QueryError(f"cannot sort on {field!r}")
+            fields.append((field, part.startswith('-')))
+        return fields
+
+    def _sort_key(self, sort_fields: List[Tuple[str, bool]]):
+        keys = [(self.ranks[field], descending) for field, descending in sort_fields]
+        missing = len(self.records)
+
+        def key(row: int) -> Tuple[int, ...]:
+            # Missing values sort last in either direction
+            return tuple(
+                (-ranks[row] if ranks[row] != missing else missing) if descending else ranks[row]
+                for ranks, descending in keys
+            ) + (row,)
+        return key
+
+    def query(self, params: Dict[str, List[str]]) -> dict:
+        """
+        Answer a query given as parsed query-string parameters.
+
+        Parameters:
+        params (dict): Parameter values by name, as from urllib.parse.parse_qs.
+            Supported parameters:
+              <field>=a,b      rows whose string field equals a or b
+              range=f:min:max  rows with min <= f <= max; repeatable, open
+                               ended if a bound is empty
+              sort=f,-g        sort by f ascending then g descending
+                               (default: id order)
+              fields=f,g       return only these fields
+              limit, offset    page through the results
+
+        Returns:
+        dict: {'total', 'offset', 'limit', 'items'}
+
+        Raises:
+        QueryError: If a parameter is unknown or malformed
+        """
+        candidates = []
+        for name, values in params.items():
+            if name in ('sort', 'fields', 'limit', 'offset'):
+                continue
+            if name == 'range':
+                candidates.extend(self._range_rows(spec) for spec in values)
+            elif name in self.equality:
+                index = self.equality[name]
+                wanted = set()
+                for value in values:
+                    for option in value.split(','):
+                        wanted.update(index.get(option, ()))
+                        if option in ('true', 'false'):
+                            wanted.update(index.get(option == 'true', ()))
+                candidates.append(wanted)
+            else:
+                raise QueryError(f"cannot filter on {name!r}")
+
+        if candidates:
+            candidates.sort(key=len)
+            rows = candidates[0].intersection(*candidates[1:])
+        else:
+            rows = range(len(self.records))
+
+        try:
+            limit = min(int(params.get('limit', [DEFAULT_LIMIT])[-1]), MAX_LIMIT)
+            offset = int(params.get('offset', [0])[-1])
+        except ValueError:
+            raise QueryError("limit and offset must be integers")
+        if limit < 0 or offset < 0:
+            raise QueryError("limit and offset must not be negative")
+
+        sort_fields = self._sort_fields(params['sort'][-1]) if 'sort' in params else []
+        if len(sort_fields) == 1 and len(rows) * WALK_FRACTION >= len(self.records):
+            field, descending = sort_fields[0]
+            order = (self.descending if descending else self.ascending)[field]
+            matching = (row for row in order if row in rows) if candidates else iter(order)
+            page = list(islice(matching, offset, offset + limit))
+        elif sort_fields:
+            page = sorted(rows, key=self._sort_key(sort_fields))[offset:offset + limit]
+        else:
+            page = sorted(rows)[offset:offset + limit]
+
+        if 'fields' in params:
+            fields = [field for value in params['fields'] for field in value.split(',') if field]
+            unknown = [field for field in fields if field not in self.fields]
+            if unknown:
+                raise QueryError(f"unknown field(s): {', '.join(unknown)}")
+            items = [{field: self.records[row][field] for field in fields if field in self.records[row]}
+                     for row in page]
+        else:
+            items = [self.records[row] for row in page]
+        return {'total': len(rows), 'offset': offset, 'limit': limit, 'items': items}
+
+    def get(self, record_id: int) -> dict:
+        """Return the record with the given id, or None."""
+        row = self.by_id.get(record_id)
+        return self.records[row] if row is not None else None
+
+
+class ReloadingQueryStore:
+    """
+    A QueryStore that is rebuilt when one of its processed files changes,
+    checked with a stat of each file per access.
+    """
+
+    def __init__(self, files: Dict[str, str]):
+        self.files = files
+        self.version = None
+        self.store = None
+        self._lock = threading.Lock()
+
+    def current(self) -> QueryStore:
+        """Return the store, reloading it first if a file changed."""
+        stats = [os.stat(path) for path in self.files.values()]
+        version = tuple((stat.st_mtime_ns, stat.st_size) for stat in stats)
+        if version != self.version:
+            with self._lock:
+                # Another request may have reloaded the store while this one
+                # waited; otherwise build the new store before publishing it,
+                # so concurrent requests keep using the old one meanwhile
+                if version != self.version:
+                    store = QueryStore.from_files(self.files)
+                    self.store, self.version = store, version
+        return self.store
@@ -0,0 +1,243 @@
+"""
+Thread-safe rate limiting for polite access to remote hosts.
+
+TokenBucket spaces calls out to an average rate while allowing short bursts,
+and can be told to back off entirely (e.g. after a 429 with Retry-After).
+HostLimiter keeps one bucket and one concurrency limit per host, so worker
+pools can share it without any single host seeing more than the configured
+load.
+AIMDController instead finds the concurrency a host tolerates, raising it
+while responses are healthy and halving it on throttling or rising latency.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """Token bucket refilled at a constant rate, shared between threads."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Parameters:
+        rate (float): Tokens added per second, i.e. the sustained call rate
+        capacity (float): Largest burst allowed (default: one second's worth,
+            at least one token)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.resume_at = 0.0
+        self.lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Take tokens, possibly going into debt; return how long to wait."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.resume_at - now)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Block until the tokens are available and take them.
+
+        Returns:
+        float: Seconds spent waiting
+        """
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def defer(self, seconds: float) -> None:
+        """Hold back every caller for the given time, e.g. to honor Retry-After."""
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+            self.tokens = min(self.tokens, 0.0)
+
+
+class HostLimiter:
+    """Per-host request rate and concurrency limits."""
+
+    def __init__(self, requests_per_second: float, max_concurrent: int):
+        """
+        Parameters:
+        requests_per_second (float): Sustained request rate allowed per host
+        max_concurrent (int): Requests allowed in flight per host
+        """
+        self.requests_per_second = requests_per_second
+        self.max_concurrent = max_concurrent
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.slots: Dict[str, threading.Semaphore] = {}
+        self.lock = threading.Lock()
+
+    def _host_state(self, host: str):
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.requests_per_second)
+                self.slots[host] = threading.BoundedSemaphore(self.max_concurrent)
+            return self.buckets[host], self.slots[host]
+
+    @contextmanager
+    def limit(self, url: str) -> Iterator[None]:
+        """Wait for a free slot and a token for the URL's host, holding the slot inside the block."""
+        bucket, slot = self._host_state(urlsplit(url).netloc.lower())
+        with slot:
+            bucket.acquire()
+            yield
+
+    def defer(self, url: str, seconds: float) -> None:
+        """Pause all requests to the URL's host."""
+        self._host_state(urlsplit(url).netloc.lower())[0].defer(seconds)
+
+
+class Ticket:
+    """One request admitted by an AIMDController; report its outcome on it."""
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.started = time.monotonic()
+        self.latency = None
+        self.outcome = 'ok'
+        self.retry_after = None
+
+    def responded(self) -> None:
+        """Note that the response headers arrived; the latency is measured up to here."""
+        self.latency = time.monotonic() - self.started
+
+    def throttle(self, retry_after: float = None) -> None:
+        """The server asked to slow down (429 or 503)."""
+        self.outcome = 'throttled'
+        self.retry_after = retry_after
+
+    def fail(self) -> None:
+        """The request failed for a reason that says nothing about server load."""
+        self.outcome = 'error'
+
+
+class AIMDController:
+    """
+    Concurrency limit that adapts to the server like TCP congestion control.
+
+    Every healthy response raises the limit by increase/limit, i.e. by about
+    `increase` per round of requests (additive increase). A 429 or 503, or a
+    smoothed response latency above latency_factor times the lowest seen so
+    far, multiplies it by decrease (multiplicative decrease). Requests that
+    were already in flight when the limit was cut do not cut it again, and
+    Retry-After pauses every caller. Shared by all the threads of a pool.
+    """
+
+    def __init__(self, initial: float = 1, minimum: float = 1, maximum: float = 8,
+                 increase: float = 1.0, decrease: float = 0.5, latency_factor: float = 3.0):
+        """
+        Parameters:
+        initial (float): Starting concurrency limit
+        minimum (float): Limit never cut below this
+        maximum (float): Limit never raised above this
+        increase (float): Limit added per round of healthy responses
+        decrease (float): Factor applied to the limit on a throttle or a slow response
+        latency_factor (float): Smoothed latency, relative to the lowest seen,
+            at which responses count as slow
+        """
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError("expected 1 <= minimum <= initial <= maximum")
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.generation = 0
+        self.in_flight = 0
+        self.resume_at = 0.0
+        self.latency = None
+        self.fastest = None
+        self.started = time.monotonic()
+        self.peak = int(self.limit)
+        self.completed = 0
+        self.throttled = 0
+        self.slowdowns = 0
+        self.errors = 0
+        self.condition = threading.Condition()
+
+    @property
+    def concurrency(self) -> int:
+        """Requests currently allowed in flight."""
+        return max(1, int(self.limit))
+
+    def throughput(self) -> float:
+        """Completed requests per second since the controller was created."""
+        return self.completed / max(time.monotonic() - self.started, 1e-9)
+
+    def acquire(self) -> Ticket:
+        """Block until a request may start, and admit it."""
+        with self.condition:
+            while True:
+                wait = self.resume_at - time.monotonic()
+                if wait <= 0 and self.in_flight < self.concurrency:
+                    break
+                self.condition.wait(wait if wait > 0 else None)
+            self.in_flight += 1
+            return Ticket(self.generation)
+
+    def release(self, ticket: Ticket) -> None:
+        """Free the ticket's slot and adapt the limit to its outcome."""
+        with self.condition:
+            self.in_flight -= 1
+            if ticket.outcome == 'throttled':
+                self.throttled += 1
+                if ticket.retry_after:
+                    self.resume_at = max(self.resume_at, time.monotonic() + ticket.retry_after)
+                self._cut(ticket)
+            elif ticket.outcome == 'error':
+                self.errors += 1
+            else:
+                self.completed += 1
+                latency = ticket.latency if ticket.latency is not None else time.monotonic() - ticket.started
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+                # Baseline is the lowest smoothed latency, so one lucky response does not set it
+                self.fastest = self.latency if self.fastest is None else min(self.fastest, self.latency)
+                if self.latency > self.latency_factor * max(self.fastest, 0.01):
+                    if self._cut(ticket):
+                        self.slowdowns += 1
+                        # Judge the new limit on fresh samples
+                        self.latency = None
+                else:
+                    self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+                    self.peak = max(self.peak, self.concurrency)
+            self.condition.notify_all()
+
+    def _cut(self, ticket: Ticket) -> bool:
+        """Decrease the limit once per generation of requests; call with the lock held."""
+        if ticket.generation != self.generation:
+            return False
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        self.generation += 1
+        return True
+
+    @contextmanager
+    def slot(self) -> Iterator[Ticket]:
+        """Hold a request slot inside the block; report throttles or failures on the ticket."""
+        ticket = self.acquire()
+        try:
+            yield ticket
+        except BaseException:
+            if ticket.outcome == 'ok':
+                ticket.fail()
+            raise
+        finally:
+            self.release(ticket)
+
+    def report(self) -> str:
+        return (f"concurrency {self.concurrency} (peak {self.peak}), {self.completed} requests "
+                f"at {self.throughput():.1f}/s, {self.throttled} throttled, "
+                f"{self.slowdowns} slowdowns, {self.errors} errors")
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""Compare the attribution extractors on Commons description pages.
+
+Runs the BeautifulSoup extractor the scraper used before, kept here as the
+reference, and the single-pass ``attribution_extractor`` over the same
+pages, fails if any page gives different fields, and reports the parse time
+per page of each.
+
+Pages come from ``--pages DIR`` (``*.html`` files, e.g. description pages
+saved from Commons) or, by default, are generated: Commons-like pages that
+mix the information template, credit lines, structured data, license
+templates, labelled spans, scripts, comments, entities and stray markup so
+that every extraction method gets exercised. Each page is also checked
+without a URL, which lets the fallback methods that only run when nothing
+else was found take part.
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import random
+import re
+import statistics
+import sys
+import time
+from typing import Callable
+
+from bs4 import BeautifulSoup
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from attribution_extractor import extract_fields  # noqa: E402
+
+PAGE_URL = "https://commons.wikimedia.org/wiki/File:Example.jpg"
+AUTHORS = ("Jane Doe", "Ken Fielding", "Airbus &amp; Partners", "U.S. Air Force photo", "<a href='/wiki/User:X'>X</a>")
+LICENSES = (
+    "Creative Commons Attribution-Share Alike 4.0",
+    "CC BY 2.0",
+    "This file is in the public domain",
+    "GNU Free Documentation License, Version 1.2",
+    "PD-old",
+    "CC0",
+)
+HEADERS = ("Author", "Photographer", "Creator", "License", "Copyright", "Description", "Date", "Source", "Camera")
+
+
+def synthetic_page(rng: random.Random) -> str:
+    """A Commons-like description page with a random selection of the usual sections."""
+    parts = ["<!DOCTYPE html><html><head><title>File:Example.jpg</title>",
+             "<script>var wgTitle = 'creator'; if (a < b) {}</script>",
+             "<style>.licensetpl{display:none}</style></head><body>"]
+    parts.append('<div id="mw-imagepage-content"><div class="mw-parser-output">')
+    if rng.random() < 0.7:
+        table_class = rng.choice(("fileinfotpl-type-information", "fileinfotpl-type-artwork toccolours",
+                                  "toccolours fileinfotpl-type-information"))
+        parts.append(f'<table class="{table_class}"><tbody>')
+        for header in rng.sample(HEADERS, rng.randint(2, len(HEADERS))):
+            header_id = ' id="fileinfotpl_aut"' if header == "Author" and rng.random() < 0.5 else ""
+            cell = rng.choice(AUTHORS) if header in ("Author", "Photographer", "Creator") else rng.choice(LICENSES)
+            if rng.random() < 0.3:
+                cell = f"<span>{cell}</span>\n<!-- {header} comment -->  <br>"
+            if rng.random() < 0.2:
+                header = f"<span>{header}</span>"
+            parts.append(f"<tr>\n  <td{header_id} class=\"fileinfo-paramfield\">{header}</td><th>{header}</th>\n"
+                         f"  <td>{cell}</td></tr>")
+        parts.append("</tbody></table>")
+    if rng.random() < 0.4:
+        parts.append(f'<div class="commons-file-information-credit">  {rng.choice(AUTHORS)} &copy 2012 &#150; &nosuch;</div>')
+    if rng.random() < 0.5:
+        parts.append("<p>Photo by the author, &#x27;public domain&#39; in the <b>US</b>.<p>Unclosed paragraph</div>")
+    if rng.random() < 0.4:
+        parts.append(f'<span>Author:</span> {rng.choice(AUTHORS)}<span>creator</span><!---->')
+    if rng.random() < 0.4:
+        parts.append('<div class="licensetpl"><span class="licensetpl_short">'
+                     f'{rng.choice(LICENSES)}</span></div><div class="licensetpl"> </div>')
+    if rng.random() < 0.3:
+        parts.append("<pre>   </pre><textarea>\n</textarea><template><p>Public domain</p></template>")
+    parts.append("</div></div>")
+    if rng.random() < 0.5:
+        parts.append("<h2><span>Structured data</span></h2><div><h3>Items portrayed in this file</h3>"
+                     f"<span>copyright license</span><a href='#'>{rng.choice(LICENSES)}</a>"
+                     f"<span>Creator</span><div><span></span><a>{rng.choice(AUTHORS)}</a></div></div>")
+    if rng.random() < 0.3:
+        parts.append("<table><tr><th>Photographer</th></tr><tr><td>Someone Else</td></tr></table>")
+    if rng.random() < 0.3:
+        parts.append('<input type="text" id="stockphoto_attribution" value="Jane Doe, CC BY-SA 4.0, via Wikimedia Commons">')
+    parts.append("</p></span><br/></body></html>")
+    # Pad with the navigation and footer boilerplate real pages carry
+    parts.extend(f'<li id="n-{i}"><a href="/wiki/Page_{i}" title="Page {i}">Page {i}</a></li>\n' for i in range(300))
+    return "".join(parts)
+
+
+def extract_fields_soup(html: str, description_url: str | None) -> dict:
+    """
+    Extract the raw attribution fields with a BeautifulSoup search per field.
+
+    This is the extractor wiki_image_scraper used before attribution_extractor;
+    extract_fields must return exactly what it returns.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Initialize author info
+    author_info = {
+        "author": None,
+        "license": None,
+        "description": None,
+        "date": None,
+        "source": None,
+        "url": description_url,
+        "formatted_attribution": None  # New field for the ready-made attribution
+    }
+
+    # Look for the ready-made attribution text
+    attribution_input = soup.find('input', id='stockphoto_attribution')
+    if attribution_input and attribution_input.get('value'):
+        author_info["formatted_attribution"] = attribution_input.get('value')
+
+    # Method 1: Find the information section table
+    info_section = soup.find('table', class_='fileinfotpl-type-information')
+    if info_section:
+        # Extract author - look for the specific td with id="fileinfotpl_aut"
+        author_td = soup.find('td', id='fileinfotpl_aut')
+        if author_td and author_td.find_next('td'):
+            author_info["author"] = author_td.find_next('td').get_text(strip=True)
+        else:
+            # Try the old method
+            author_header = info_section.find('th', string=re.compile(r'Author|Creator|Photographer', re.IGNORECASE))
+            if author_header:
+                author_cell = author_header.find_next('td')
+                if author_cell:
+                    author_info["author"] = author_cell.get_text(strip=True)
+
+        # Extract license
+        license_header = info_section.find('th', string=re.compile(r'License|Copyright', re.IGNORECASE))
+        if license_header:
+            license_cell = license_header.find_next('td')
+            if license_cell:
+                author_info["license"] = license_cell.get_text(strip=True)
+
+        # Extract description
+        desc_header = info_section.find('th', string=re.compile(r'Description', re.IGNORECASE))
+        if desc_header:
+            desc_cell = desc_header.find_next('td')
+            if desc_cell:
+                author_info["description"] = desc_cell.get_text(strip=True)
+
+        # Extract date
+        date_header = info_section.find('th', string=re.compile(r'Date', re.IGNORECASE))
+        if date_header:
+            date_cell = date_header.find_next('td')
+            if date_cell:
+                author_info["date"] = date_cell.get_text(strip=True)
+
+        # Extract source
+        source_header = info_section.find('th', string=re.compile(r'Source', re.IGNORECASE))
+        if source_header:
+            source_cell = source_header.find_next('td')
+            if source_cell:
+                author_info["source"] = source_cell.get_text(strip=True)
+
+    # Method 2: Look for credit line
+    if not author_info["author"]:
+        credit_div = soup.find('div', class_='commons-file-information-credit')
+        if credit_div:
+            author_info["author"] = credit_div.get_text(strip=True)
+
+    # Method 3: Look for structured data
+    structured_data_section = soup.find('h2', string=lambda s: s and 'Structured data' in s)
+    if structured_data_section:
+        # Look for license information in structured data
+        license_section = soup.find(string=lambda s: s and 'copyright license' in s.lower())
+        if license_section:
+            # Find the next element which might contain the license info
+            license_elem = license_section.find_next(['a', 'div', 'span'])
+            if license_elem:
+                license_text = license_elem.get_text(strip=True)
+                if license_text and not author_info["license"]:
+                    author_info["license"] = license_text
+
+        # Look for author information in structured data
+        author_section = soup.find(string=lambda s: s and 'creator' in s.lower())
+        if author_section:
+            # Find the next element which might contain the author info
+            author_elem = author_section.find_next(['a', 'div', 'span'])
+            if author_elem:
+                author_text = author_elem.get_text(strip=True)
+                if author_text and not author_info["author"]:
+                    author_info["author"] = author_text
+
+    # Method 4: Look for license templates
+    if not author_info["license"]:
+        # Look for Public Domain markers
+        pd_markers = [
+            'This file is in the public domain',
+            'This work is in the public domain',
+            'Public domain',
+            'PD-old',
+            'Creative Commons Public Domain Mark',
+            'CC0',
+            'CC-Zero'
+        ]
+
+        for marker in pd_markers:
+            pd_match = soup.find(string=lambda s: s and marker in s)
+            if pd_match:
+                author_info["license"] = "Public Domain"
+                break
+
+        # Look for GNU Free Documentation License
+        if not author_info["license"]:
+            gfdl_match = soup.find(string=lambda s: s and 'GNU Free Documentation License' in s)
+            if gfdl_match:
+                # Try to find the version
+                version_match = re.search(r'Version (\d+\.\d+)', gfdl_match)
+                if version_match:
+                    author_info["license"] = f"GNU Free Documentation License, version {version_match.group(1)}"
+                else:
+                    author_info["license"] = "GNU Free Documentation License"
+
+        # Look for other license templates
+        if not author_info["license"]:
+            license_templates = soup.find_all('div', class_='licensetpl')
+            if license_templates:
+                for template in license_templates:
+                    template_text = template.get_text(strip=True)
+                    if template_text:
+                        author_info["license"] = template_text
+                        break
+
+    # Method 5: Look for the file information section
+    if not any(author_info.values()):
+        file_info = soup.find('div', class_='mw-parser-output')
+        if file_info:
+            # Look for paragraphs that might contain author info
+            paragraphs = file_info.find_all('p')
+            for p in paragraphs:
+                p_text = p.get_text(strip=True)
+                if 'author' in p_text.lower() or 'creator' in p_text.lower() or 'photographer' in p_text.lower():
+                    author_info["author"] = p_text
+                    break
+
+            # Look for public domain mentions in paragraphs
+            if not author_info["license"]:
+                for p in paragraphs:
+                    p_text = p.get_text(strip=True).lower()
+                    if 'public domain' in p_text or 'pd-old' in p_text or 'cc0' in p_text:
+                        author_info["license"] = "Public Domain"
+                        break
+
+    # Method 6: Look for the information section with different class names
+    if not any(author_info.values()):
+        all_tables = soup.find_all('table')
+        for table in all_tables:
+            if 'fileinfotpl' in str(table.get('class', '')):
+                rows = table.find_all('tr')
+                for row in rows:
+                    header = row.find('th')
+                    if header:
+                        header_text = header.get_text(strip=True).lower()
+                        value = row.find('td')
+                        if value:
+                            value_text = value.get_text(strip=True)
+                            if 'author' in header_text or 'creator' in header_text or 'photographer' in header_text:
+                                author_info["author"] = value_text
+                            elif 'license' in header_text or 'copyright' in header_text:
+                                author_info["license"] = value_text
+                            elif 'description' in header_text:
+                                author_info["description"] = value_text
+                            elif 'date' in header_text:
+                                author_info["date"] = value_text
+                            elif 'source' in header_text:
+                                author_info["source"] = value_text
+
+    # Method 7: Look for the metadata section
+    metadata_section = soup.find('div', id='mw-imagepage-content')
+    if metadata_section and not any(author_info.values()):
+        # Look for spans with labels
+        spans = metadata_section.find_all('span')
+        for span in spans:
+            span_text = span.get_text(strip=True).lower()
+            if 'author' in span_text or 'creator' in span_text:
+                next_sibling = span.next_sibling
+                if next_sibling:
+                    author_info["author"] = next_sibling.get_text(strip=True) if hasattr(next_sibling, 'get_text') else str(next_sibling).strip()
+
+    # Method 8: Direct search for specific elements
+    if not author_info["author"]:
+        # Look for the specific td with id="fileinfotpl_aut"
+        author_td = soup.find('td', id='fileinfotpl_aut')
+        if author_td and author_td.find_next('td'):
+            author_info["author"] = author_td.find_next('td').get_text(strip=True)
+
+        # Look for photographer field in the summary table
+        photographer_row = soup.find('th', string='Photographer')
+        if photographer_row:
+            photographer_cell = photographer_row.find_next('td')
+            if photographer_cell:
+                author_info["author"] = photographer_cell.get_text(strip=True)
+
+    return author_info
+
+
+def load_pages(args: argparse.Namespace) -> list[tuple[str, str]]:
+    if args.pages:
+        return [(path.name, path.read_text(encoding="utf-8", errors="replace"))
+                for path in sorted(Path(args.pages).glob("*.html"))]
+    rng = random.Random(args.seed)
+    return [(f"synthetic-{i}", synthetic_page(rng)) for i in range(args.count)]
+
+
+def time_per_page(extract: Callable[[str, str], dict], pages: list[tuple[str, str]], repeat: int) -> list[float]:
+    """Best-of-repeat seconds to extract each page."""
+    timings = []
+    for _, html in pages:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            extract(html, PAGE_URL)
+            best = min(best, time.perf_counter() - start)
+        timings.append(best)
+    return timings
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", help="directory of saved description pages (*.html)")
+    parser.add_argument("--count", type=int, default=200, help="synthetic pages to generate (default: 200)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for synthetic pages")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per page, best is kept (default: 3)")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    pages = load_pages(args)
+    if not pages:
+        print("no pages to compare")
+        return 1
+
+    mismatches = 0
+    for name, html in pages:
+        for url in (PAGE_URL, None):
+            expected = extract_fields_soup(html, url)
+            actual = extract_fields(html, url)
+            if actual != expected:
+                mismatches += 1
+                print(f"MISMATCH {name} (url={url!r})")
+                for key in expected:
+                    if actual.get(key) != expected[key]:
+                        print(f"  {key}: soup={expected[key]!r} single-pass={actual.get(key)!r}")
+    print(f"{len(pages)} pages, {mismatches} mismatching extractions")
+
+    size = statistics.mean(len(html) for _, html in pages) / 1024
+    print(f"\n{'extractor':<12} {'mean ms':>9} {'p50 ms':>8} {'max ms':>8}   (mean page {size:.0f} KiB)")
+    for label, extract in (("soup", extract_fields_soup), ("single-pass", extract_fields)):
+        timings = sorted(time_per_page(extract, pages, args.repeat))
+        print(f"{label:<12} {statistics.mean(timings) * 1000:>9.2f} {statistics.median(timings) * 1000:>8.2f} "
+              f"{timings[-1] * 1000:>8.2f}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Measure the throughput of the network stages against a local Commons stand-in.
+
+Starts ``commons_standin.py`` in-process with the requested latency, 429
+injection and bandwidth limits, points the tools at it through
+``COMMONS_BASE_URL``, and runs each stage over the images in the image
+store, with the on-disk HTTP cache off:
+
+- ``attribution``: description pages scraped by ``wiki_image_scraper``
+- ``thumbnails``: "Other resolutions" links found by ``ThumbnailResolver``
+- ``resolve``: batched imageinfo API queries of the image sync
+- ``download``: renditions downloaded by the image sync into a scratch store
+
+Reports items per second, requests, 429 answers and bytes for each stage,
+and fails if any item failed or a download does not match its fixture, so
+the same run serves as a regression test.  Fixtures come from ``--fixtures``
+(recorded with ``commons_standin.py record``) or are synthesized from the
+image store into a temporary directory.
+"""
+
+from __future__ import annotations
+
+import argparse
+from contextlib import redirect_stdout
+import io
+import os
+from pathlib import Path
+import sys
+import tempfile
+import time
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from commons_standin import Conditions, Fixtures, request_key, start_server, synthesize_fixtures  # noqa: E402
+from image_store import ImageStore  # noqa: E402
+
+STAGES = ("attribution", "thumbnails", "resolve", "download")
+
+
+def load_items(limit: int | None) -> list[tuple[str, str, str]]:
+    """``(dataset, name, Commons URL)`` of every item in the image store."""
+    store = ImageStore(str(ROOT))
+    items = [
+        (dataset, name, entry["source_url"])
+        for dataset, entries in sorted(store.items.items())
+        for name, entry in sorted(entries.items())
+        if entry.get("source_url")
+    ]
+    return items[:limit] if limit else items
+
+
+def run_attribution(items: list[tuple[str, str, str]], args: argparse.Namespace, state: dict) -> int:
+    from wiki_image_scraper import scrape_items
+
+    results = scrape_items(
+        [{"url": url, "name": name} for _, name, url in items],
+        workers=args.workers, requests_per_second=args.rps, use_cache=False,
+    )
+    return sum(1 for result in results if not result.get("error") and (result["author"] or result["license"]))
+
+
+def run_thumbnails(items: list[tuple[str, str, str]], args: argparse.Namespace, state: dict) -> int:
+    from thumbnail_resolver import ThumbnailResolver
+
+    with ThumbnailResolver(workers=args.workers, requests_per_second=args.rps, use_cache=False) as resolver:
+        thumbnails = resolver.resolve_many(url for _, _, url in items)
+    return sum(1 for url in thumbnails.values() if url)
+
+
+def run_resolve(items: list[tuple[str, str, str]], args: argparse.Namespace, state: dict) -> int:
+    from rate_limit import AIMDController
+    from sync_wikimedia_images import resolve_images
+
+    results = resolve_images(
+        [url for _, _, url in items], args.width, controller=AIMDController(initial=1, maximum=2)
+    )
+    state["resolved"] = results
+    return sum(1 for result in results if not isinstance(result, Exception))
+
+
+def run_download(items: list[tuple[str, str, str]], args: argparse.Namespace, state: dict) -> int:
+    from rate_limit import AIMDController
+    from sync_wikimedia_images import cache_images
+
+    if "resolved" not in state:
+        run_resolve(items, args, state)
+    resolved = state["resolved"]
+    fixtures: Fixtures = state["fixtures"]
+    controller = AIMDController(initial=2, maximum=args.max_concurrency)
+    matching = 0
+    with tempfile.TemporaryDirectory() as scratch:
+        store = ImageStore(scratch)
+        for dataset in sorted({dataset for dataset, _, _ in items}):
+            group = [(name, result) for (item_dataset, name, _), result in zip(items, resolved)
+                     if item_dataset == dataset and not isinstance(result, Exception)]
+            cache_images(dataset, group, store, args.width, controller=controller)
+            for name, result in group:
+                entry = store.items.get(dataset, {}).get(name)
+                fixture = fixtures.responses.get(request_key(urlsplit(result["image_url"]).path))
+                if entry and fixture and entry["sha1"] == fixture["body"]:
+                    matching += 1
+    state["controller"] = controller.report()
+    return matching
+
+
+RUNNERS: dict[str, Callable[[list[tuple[str, str, str]], argparse.Namespace, dict], int]] = {
+    "attribution": run_attribution,
+    "thumbnails": run_thumbnails,
+    "resolve": run_resolve,
+    "download": run_download,
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="recorded fixtures (default: synthesized from the image store)")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated stages (default: all of {','.join(STAGES)})")
+    parser.add_argument("--limit", type=int, help="only the first N images")
+    parser.add_argument("--latency", type=float, default=100.0, help="milliseconds per response (default: 100)")
+    parser.add_argument("--jitter", type=float, default=50.0, help="up to this many further milliseconds (default: 50)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds of each 429 (default: 1)")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="requests served at once; more get 429")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="kB/s per connection (default: no limit)")
+    parser.add_argument("--link-bandwidth", type=float, default=0.0, help="kB/s in total (default: no limit)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for jitter and throttling (default: 1)")
+    parser.add_argument("--workers", type=int, default=8, help="scraper and thumbnail threads (default: 8)")
+    parser.add_argument("--rps", type=float, default=20.0, help="scraper and thumbnail requests per second (default: 20)")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="most parallel downloads (default: 8)")
+    parser.add_argument("--width", type=int, default=960, help="rendition width for the image sync (default: 960)")
+    parser.add_argument("--verbose", action="store_true", help="show the output of each stage")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in RUNNERS]
+    if unknown:
+        print(f"unknown stage(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    with tempfile.TemporaryDirectory() as synthesized:
+        fixtures = Fixtures(args.fixtures or synthesized)
+        if not args.fixtures:
+            synthesize_fixtures(fixtures, str(ROOT))
+        items = load_items(args.limit)
+        conditions = Conditions(args.latency / 1000, args.jitter / 1000, args.throttle_rate, args.retry_after,
+                                args.max_concurrent, args.bandwidth * 1000, args.link_bandwidth * 1000, args.seed)
+        server = start_server(fixtures, conditions)
+        # The tools read it when first imported, which the stages do
+        os.environ["COMMONS_BASE_URL"] = server.base_url
+        print(f"{len(items)} images from {args.fixtures or 'synthesized fixtures'} at {server.base_url}")
+        print(f"Conditions: {conditions.describe()}\n")
+
+        state: dict[str, Any] = {"fixtures": fixtures}
+        failed = False
+        print(f"{'stage':<12} {'ok':>7} {'seconds':>8} {'items/s':>8} {'requests':>9} {'429s':>5} {'MB':>6}")
+        try:
+            for stage in stages:
+                before = server.stats.snapshot()
+                output = io.StringIO()
+                start = time.perf_counter()
+                with redirect_stdout(sys.stdout if args.verbose else output):
+                    ok = RUNNERS[stage](items, args, state)
+                elapsed = time.perf_counter() - start
+                after = server.stats.snapshot()
+                failed = failed or ok < len(items)
+                print(f"{stage:<12} {f'{ok}/{len(items)}':>7} {elapsed:>8.2f} {len(items) / elapsed:>8.1f} "
+                      f"{after['requests'] - before['requests']:>9} {after['throttled'] - before['throttled']:>5} "
+                      f"{(after['bytes_sent'] - before['bytes_sent']) / 1e6:>6.1f}")
+        finally:
+            server.shutdown()
+            server.server_close()
+        if "controller" in state:
+            print(f"\nDownloads: {state['controller']}")
+        print(f"Stand-in: {server.stats.report()}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
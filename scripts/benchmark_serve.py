@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Load-test the local development server.
+
+Starts ``serve.py`` and, for comparison, the previous single-threaded
+HTTP/1.0 ``SimpleHTTPRequestHandler`` server in subprocesses. Each is hit
+by a pool of client threads that load the assets of the comparative page
+the way a browser does: with ``Accept-Encoding: gzip``, keeping the
+connection open when the server allows it, and revalidating with
+``If-None-Match`` after the first visit. Reports requests per second and
+the median and 99th percentile latency for each server.
+
+Pass ``--slow-clients`` to add connections that trickle their request one
+byte at a time, which is what stalls a single-threaded server.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+from pathlib import Path
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+
+ROOT = Path(__file__).resolve().parents[1]
+PATHS = (
+    "/comparative.html",
+    "/styles.css",
+    "/js/utils.js",
+    "/js/tooltip.js",
+    "/js/classifications.js",
+    "/js/columnar-data.js",
+    "/js/comparative.js",
+    "/data/chart_parameters.json",
+    "/data/classifications.json",
+    "/data/processed/aircraft_columns.json",
+    "/data/processed/birds_columns.json",
+)
+BASELINE_SERVER = """
+import http.server, socketserver, sys
+with socketserver.TCPServer(("127.0.0.1", int(sys.argv[1])), http.server.SimpleHTTPRequestHandler) as httpd:
+    httpd.serve_forever()
+"""
+SERVERS = {
+    "baseline": [sys.executable, "-c", BASELINE_SERVER],
+    "serve.py": [sys.executable, str(ROOT / "serve.py"), "--bind", "127.0.0.1", "--port"],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def client(port: int, stop: threading.Event, latencies: list[float], errors: list[str]) -> None:
+    """Request the page assets in a loop, revalidating after the first pass."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    etags: dict[str, str] = {}
+    while not stop.is_set():
+        for path in PATHS:
+            if stop.is_set():
+                break
+            headers = {"Accept-Encoding": "gzip"}
+            if path in etags:
+                headers["If-None-Match"] = etags[path]
+            start = time.perf_counter()
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.will_close:
+                    connection.close()
+            except (OSError, http.client.HTTPException) as exc:
+                errors.append(f"{path}: {exc}")
+                connection.close()
+                continue
+            latencies.append(time.perf_counter() - start)
+            if response.status not in (200, 304):
+                errors.append(f"{path}: HTTP {response.status}")
+            elif response.getheader("ETag"):
+                etags[path] = response.getheader("ETag")
+    connection.close()
+
+
+def slow_client(port: int, stop: threading.Event) -> None:
+    """Send requests one byte every 50 ms, holding a connection open."""
+    request = b"GET /index.html HTTP/1.0\r\nHost: localhost\r\n\r\n"
+    while not stop.is_set():
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=30) as sock:
+                for i in range(len(request)):
+                    if stop.is_set():
+                        return
+                    sock.sendall(request[i:i + 1])
+                    time.sleep(0.05)
+                while sock.recv(65536):
+                    pass
+        except OSError:
+            time.sleep(0.05)
+
+
+def run_load(port: int, concurrency: int, duration: float, slow_clients: int) -> dict[str, float]:
+    stop = threading.Event()
+    latencies: list[float] = []
+    errors: list[str] = []
+    threads = [threading.Thread(target=slow_client, args=(port, stop), daemon=True) for _ in range(slow_clients)]
+    threads += [
+        threading.Thread(target=client, args=(port, stop, latencies, errors), daemon=True)
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=35)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float("nan"),
+        "errors": len(errors),
+    }
+
+
+def benchmark(name: str, args: argparse.Namespace) -> dict[str, float]:
+    port = free_port()
+    process = subprocess.Popen(
+        SERVERS[name] + [str(port)],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port)
+        return run_load(port, args.concurrency, args.duration, args.slow_clients)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads (default: 8)")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per server (default: 5)")
+    parser.add_argument("--slow-clients", type=int, default=0, help="connections that trickle their requests")
+    parser.add_argument("--server", choices=sorted(SERVERS), action="append", help="only benchmark these servers")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    print(f"{'server':<10} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name in args.server or list(SERVERS):
+        result = benchmark(name, args)
+        print(
+            f"{name:<10} {result['requests']:>9} {result['rps']:>9.0f} "
+            f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['errors']:>7}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,32 +6,52 @@ Commons file is renamed, hard-coded upload and thumbnail URLs become stale even
 though the file page redirects correctly.  This script resolves every image
 through the official MediaWiki API and records the current canonical URLs and
 license metadata.  In write mode it also caches the approved rendition locally,
-so visitors are not exposed to Wikimedia hotlink rate limits.
+so visitors are not exposed to Wikimedia hotlink rate limits.  Cached images
+live in the content-addressed store of ``image_store.py``.
 
 Run without arguments for a read-only audit, or pass ``--write`` to update the
-raw data, processed data, and attribution files together.
+raw data, processed data, and attribution files together.  A write run
+journals each item's outcome to ``.cache/sync_journal.jsonl`` as it goes, so
+a rerun after a failure only retries the failed and pending items; the data
+files are rewritten once, when every item has succeeded.  ``--adopt`` moves
+images cached under per-item paths into the store without network access.
 """
 
 from __future__ import annotations
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from datetime import date
+import hashlib
 import html
 from html.parser import HTMLParser
 import json
+import mimetypes
+import os
 from pathlib import Path
 import re
 import sys
 import time
-from typing import Any
-import unicodedata
+from typing import Any, Callable, ContextManager
 from urllib.error import HTTPError, URLError
 from urllib.parse import unquote, urlencode, urlsplit
 from urllib.request import Request, urlopen
 
 
 ROOT = Path(__file__).resolve().parents[1]
-API_URL = "https://commons.wikimedia.org/w/api.php"
+sys.path.insert(0, str(ROOT))
+
+from http_cache import COMMONS_URL, HTTPCache  # noqa: E402
+from image_store import CHUNK_SIZE, OBJECTS_DIR, ImageStore, file_sha1  # noqa: E402
+from rate_limit import AIMDController, Ticket  # noqa: E402
+
+API_URL = f"{COMMONS_URL}/w/api.php"
+# Most titles a single prop=imageinfo query accepts
+BATCH_SIZE = 50
+JOURNAL_FILE = ROOT / ".cache" / "sync_journal.jsonl"
+# Statuses with which Commons asks clients to slow down
+THROTTLE_STATUSES = (429, 503)
 USER_AGENT = (
     "aircraft-databank-image-audit/1.0 "
     "(https://github.com/flavioluiz/FlightDataBank)"
@@ -104,31 +124,104 @@ def strip_tracking(url: str | None) -> str | None:
     return url.split("?", 1)[0] if url else None
 
 
-def resolve_image(image_url: str, width: int) -> dict[str, Any]:
-    filename = commons_filename(image_url)
-    params = urlencode(
-        {
-            "action": "query",
-            "format": "json",
-            "formatversion": 2,
-            "redirects": 1,
-            "prop": "imageinfo",
-            "iiprop": "url|mime|thumbmime|extmetadata",
-            "iiurlwidth": width,
-            "titles": f"File:{filename}",
-        }
-    )
-    request = Request(
-        f"{API_URL}?{params}",
-        headers={"User-Agent": USER_AGENT, "Accept": "application/json"},
-    )
-    with urlopen(request, timeout=30) as response:
-        payload = json.load(response)
-    pages = payload.get("query", {}).get("pages", [])
-    if len(pages) != 1 or pages[0].get("missing"):
+def request_slot(controller: AIMDController | None) -> ContextManager[Ticket | None]:
+    """A request slot from the controller, or no limit at all without one."""
+    return controller.slot() if controller is not None else nullcontext()
+
+
+def retry_after_seconds(exc: HTTPError) -> int | None:
+    retry_after = exc.headers.get("Retry-After") if exc.headers else None
+    return int(retry_after) if retry_after and retry_after.isdigit() else None
+
+
+def api_query(
+    params: dict[str, Any],
+    cache: HTTPCache | None = None,
+    controller: AIMDController | None = None,
+) -> dict[str, Any]:
+    """Run one MediaWiki API request, through the HTTP cache if given.
+
+    Requests that need the network wait for a slot from the controller, and
+    429/503 answers are reported to it and retried once it lets them.
+    """
+    url = f"{API_URL}?{urlencode(params)}"
+    headers = {"User-Agent": USER_AGENT, "Accept": "application/json"}
+    if cache is not None and cache.is_fresh(url):
+        return json.loads(cache.fetch(url, headers, timeout=30).body)
+    for attempt in range(6):
+        with request_slot(controller) as ticket:
+            try:
+                if cache is not None:
+                    body = cache.fetch(url, headers, timeout=30).body
+                else:
+                    with urlopen(Request(url, headers=headers), timeout=30) as response:
+                        body = response.read()
+            except HTTPError as exc:
+                if exc.code not in THROTTLE_STATUSES or ticket is None or attempt == 5:
+                    raise
+                ticket.throttle(retry_after_seconds(exc))
+                continue
+        return json.loads(body)
+    raise RuntimeError(f"Commons API kept throttling: {url}")
+
+
+def query_image_pages(
+    titles: list[str],
+    width: int,
+    cache: HTTPCache | None = None,
+    controller: AIMDController | None = None,
+) -> tuple[dict[str, dict[str, Any]], dict[str, str]]:
+    """Fetch ``imageinfo`` for up to ``BATCH_SIZE`` titles in one query.
+
+    Returns the pages by canonical title and a map from every title the API
+    normalized or followed a redirect for to the title it became.  Follows
+    ``continue`` tokens until every page has its image information.
+    """
+    params: dict[str, Any] = {
+        "action": "query",
+        "format": "json",
+        "formatversion": 2,
+        "redirects": 1,
+        "prop": "imageinfo",
+        "iiprop": "url|mime|thumbmime|sha1|size|extmetadata",
+        "iiurlwidth": width,
+        "titles": "|".join(titles),
+    }
+    pages: dict[str, dict[str, Any]] = {}
+    renamed: dict[str, str] = {}
+    continuation: dict[str, Any] = {}
+    while True:
+        payload = api_query({**params, **continuation}, cache, controller)
+        if "error" in payload:
+            raise ValueError(f"Commons API error: {payload['error'].get('info', payload['error'])}")
+        query = payload.get("query", {})
+        for mapping in query.get("normalized", []) + query.get("redirects", []):
+            renamed[mapping["from"]] = mapping["to"]
+        for page in query.get("pages", []):
+            # A continued response repeats pages; merge their image information
+            merged = pages.setdefault(page["title"], {**page, "imageinfo": []})
+            merged["imageinfo"].extend(page.get("imageinfo", []))
+        if "continue" not in payload:
+            return pages, renamed
+        continuation = payload["continue"]
+
+
+def canonical_title(title: str, renamed: dict[str, str]) -> str:
+    """Follow normalization and redirect mappings from a requested title."""
+    seen = {title}
+    while title in renamed:
+        title = renamed[title]
+        if title in seen:
+            break
+        seen.add(title)
+    return title
+
+
+def image_metadata(page: dict[str, Any], filename: str) -> dict[str, Any]:
+    """Build the per-item image record from an API page with ``imageinfo``."""
+    if page.get("missing") or page.get("invalid"):
         raise ValueError(f"Commons file not found: {filename}")
 
-    page = pages[0]
     imageinfo = page.get("imageinfo", [])
     if not imageinfo:
         raise ValueError(f"Commons returned no image information: {filename}")
@@ -168,59 +261,319 @@ def resolve_image(image_url: str, width: int) -> dict[str, Any]:
         "date": plain_text(metadata_value("DateTimeOriginal")),
         "source": plain_text(metadata_value("Credit")),
         "mime": info.get("thumbmime") or info.get("mime"),
+        # Checksum and size of the original upload, not of the rendition
+        "sha1": info.get("sha1"),
+        "size": info.get("size"),
     }
 
 
-def image_cache_path(dataset_key: str, item_name: str, mime: str | None) -> Path:
-    ascii_name = unicodedata.normalize("NFKD", item_name).encode("ascii", "ignore").decode()
-    slug = re.sub(r"[^a-z0-9]+", "-", ascii_name.lower()).strip("-")
-    extensions = {
-        "image/jpeg": ".jpg",
-        "image/png": ".png",
-        "image/webp": ".webp",
-        "image/gif": ".gif",
-        "image/svg+xml": ".svg",
+def resolve_images(
+    image_urls: list[str],
+    width: int,
+    cache: HTTPCache | None = None,
+    controller: AIMDController | None = None,
+) -> list[dict[str, Any] | Exception]:
+    """Resolve many images with one API query per ``BATCH_SIZE`` distinct titles.
+
+    Returns, in input order, the same record ``resolve_image`` returns for
+    each URL, or the exception that resolving it raised.  A failed query
+    fails every image in its batch.
+    """
+    titles: list[str | Exception] = []
+    for image_url in image_urls:
+        try:
+            titles.append(f"File:{commons_filename(image_url)}")
+        except ValueError as exc:
+            titles.append(exc)
+
+    unique = list(dict.fromkeys(title for title in titles if isinstance(title, str)))
+    resolved: dict[str, dict[str, Any] | Exception] = {}
+    for start in range(0, len(unique), BATCH_SIZE):
+        batch = unique[start:start + BATCH_SIZE]
+        try:
+            pages, renamed = query_image_pages(batch, width, cache, controller)
+        except (HTTPError, URLError, TimeoutError, ValueError, KeyError) as exc:
+            resolved.update((title, exc) for title in batch)
+            continue
+        for title in batch:
+            filename = title.removeprefix("File:")
+            page = pages.get(canonical_title(title, renamed))
+            try:
+                if page is None:
+                    raise ValueError(f"Commons file not found: {filename}")
+                resolved[title] = image_metadata(page, filename)
+            except (ValueError, KeyError) as exc:
+                resolved[title] = exc
+    return [title if isinstance(title, Exception) else resolved[title] for title in titles]
+
+
+def resolve_image(image_url: str, width: int) -> dict[str, Any]:
+    result = resolve_images([image_url], width)[0]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def rendition_details(resolved: dict[str, Any], width: int) -> dict[str, Any]:
+    """What the image store records about the rendition an item shows."""
+    return {
+        "title": f"File:{resolved['canonical_title']}",
+        "variant": f"{width}px",
+        "source_url": resolved["image_url"],
+        "original_sha1": resolved.get("sha1"),
+        "original_size": resolved.get("size"),
     }
-    extension = extensions.get(mime or "", ".img")
-    return ROOT / "images" / "wikimedia" / dataset_key / f"{slug}{extension}"
-
-
-def download_image(
-    resolved: dict[str, Any], dataset_key: str, item_name: str
-) -> str:
-    """Cache an API-approved rendition locally, with polite 429 retries."""
-    destination = image_cache_path(dataset_key, item_name, resolved.get("mime"))
-    destination.parent.mkdir(parents=True, exist_ok=True)
-    request = Request(
-        resolved["image_url"],
-        headers={"User-Agent": USER_AGENT, "Accept": "image/*"},
-    )
+
+
+def stored_image(
+    resolved: dict[str, Any],
+    dataset_key: str,
+    item_name: str,
+    store: ImageStore,
+    width: int,
+    link: bool = False,
+) -> str | None:
+    """Point an item at a stored copy of its rendition, if there is one.
+
+    That is the item's own object when it is still the rendition of the same
+    upload, or an object another item already holds for it.  Returns the
+    object's path, or None if the rendition must be downloaded.
+    """
+    url = resolved["image_url"]
+    details = rendition_details(resolved, width)
+    current = store.items.get(dataset_key, {}).get(item_name)
+    if (
+        current
+        and resolved.get("sha1")
+        and current.get("source_url") == url
+        and current.get("original_sha1") == resolved["sha1"]
+        and store.has_object(current["sha1"])
+    ):
+        store.skipped += 1
+        return store.assign(dataset_key, item_name, current["sha1"], details, link)
+    existing = store.find(url, resolved.get("sha1"))
+    if existing:
+        store.reused += 1
+        return store.assign(dataset_key, item_name, existing, details, link)
+    return None
+
+
+def fetch_image(
+    resolved: dict[str, Any],
+    temporary: Path,
+    item_name: str,
+    controller: AIMDController | None = None,
+) -> tuple[str, int]:
+    """Download an API-approved rendition to ``temporary``; safe to run in a thread.
+
+    The rendition is streamed in ``CHUNK_SIZE`` pieces and hashed on the way.
+    A partial file left by an interrupted attempt or run is resumed with a
+    Range request; ``If-Range`` makes the server send the whole file instead
+    if it changed meanwhile.  Each attempt holds a slot from the controller,
+    which learns from the response latency and from 429/503 answers how many
+    downloads Commons accepts at once.  Returns the SHA-1 of the file and the
+    number of bytes transferred.
+    """
+    url = resolved["image_url"]
+    temporary.parent.mkdir(parents=True, exist_ok=True)
+    # Validators of the response that started the partial file, for resuming it
+    partial_state = temporary.with_suffix(".json")
+    received = 0
 
     for attempt in range(6):
+        digest = hashlib.sha1()
+        headers = {"User-Agent": USER_AGENT, "Accept": "image/*"}
+        offset = 0
+        expected_size = None
+        state = json.loads(partial_state.read_text(encoding="utf-8")) if partial_state.is_file() else {}
+        validator = state.get("etag") or state.get("last_modified")
+        if temporary.is_file() and state.get("url") == url and validator:
+            offset = temporary.stat().st_size
+            with temporary.open("rb") as file:
+                while chunk := file.read(CHUNK_SIZE):
+                    digest.update(chunk)
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+
         try:
-            with urlopen(request, timeout=60) as response:
-                content_type = response.headers.get_content_type()
-                if response.status != 200 or not content_type.startswith("image/"):
-                    raise ValueError(
-                        f"invalid image response: HTTP {response.status}, {content_type}"
-                    )
-                image_data = response.read()
-            temporary = destination.with_suffix(destination.suffix + ".tmp")
-            temporary.write_bytes(image_data)
-            temporary.replace(destination)
-            time.sleep(1)
-            return destination.relative_to(ROOT).as_posix()
+            with request_slot(controller) as ticket:
+                try:
+                    with urlopen(Request(url, headers=headers), timeout=60) as response:
+                        if ticket is not None:
+                            ticket.responded()
+                        content_type = response.headers.get_content_type()
+                        content_range = response.headers.get("Content-Range", "")
+                        if response.status == 206 and offset and content_range.startswith(f"bytes {offset}-"):
+                            mode = "ab"
+                        elif response.status == 200 and content_type.startswith("image/"):
+                            mode, offset, digest = "wb", 0, hashlib.sha1()
+                            save_json(partial_state, {
+                                "url": url,
+                                "etag": response.headers.get("ETag"),
+                                "last_modified": response.headers.get("Last-Modified"),
+                            })
+                        else:
+                            raise ValueError(
+                                f"invalid image response: HTTP {response.status}, {content_type}"
+                            )
+                        length = response.headers.get("Content-Length")
+                        expected_size = offset + int(length) if length and length.isdigit() else None
+                        with temporary.open(mode) as file:
+                            while chunk := response.read(CHUNK_SIZE):
+                                file.write(chunk)
+                                digest.update(chunk)
+                                received += len(chunk)
+                except HTTPError as exc:
+                    if exc.code in THROTTLE_STATUSES and ticket is not None:
+                        ticket.throttle(retry_after_seconds(exc))
+                    raise
         except HTTPError as exc:
-            if exc.code != 429 or attempt == 5:
+            if exc.code == 416:
+                # The partial file is no prefix of the current rendition
+                temporary.unlink(missing_ok=True)
+                partial_state.unlink(missing_ok=True)
+                continue
+            if exc.code not in THROTTLE_STATUSES or attempt == 5:
                 raise
-            retry_after = exc.headers.get("Retry-After")
-            delay = int(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
-            print(f"  RATE LIMIT {item_name}: retrying in {delay}s")
-            time.sleep(delay)
+            if controller is None:
+                delay = retry_after_seconds(exc) or 2 ** attempt
+                print(f"  RATE LIMIT {item_name}: retrying in {delay}s")
+                time.sleep(delay)
+            else:
+                # The controller has cut concurrency and holds back for Retry-After
+                print(f"  RATE LIMIT {item_name}: concurrency now {controller.concurrency}")
+            continue
+        except (URLError, OSError) as exc:
+            # Keep what arrived; the next attempt (or run) resumes from it
+            if attempt == 5:
+                raise
+            print(f"  INTERRUPTED {item_name}: {exc}; resuming")
+            time.sleep(2 ** attempt)
+            continue
+
+        size = temporary.stat().st_size
+        sha1 = digest.hexdigest()
+        if expected_size is not None and size < expected_size and attempt < 5:
+            # The connection closed early; resume from what arrived
+            print(f"  INTERRUPTED {item_name}: {size} of {expected_size} bytes; resuming")
+            continue
+        if expected_size is not None and size != expected_size:
+            temporary.unlink(missing_ok=True)
+            partial_state.unlink(missing_ok=True)
+            raise ValueError(f"incomplete image: {size} of {expected_size} bytes")
+        if url == resolved.get("image_original_url") and resolved.get("sha1") and sha1 != resolved["sha1"]:
+            # The original itself was downloaded, so Commons' checksum applies
+            temporary.unlink(missing_ok=True)
+            partial_state.unlink(missing_ok=True)
+            raise ValueError(f"checksum mismatch: got {sha1}, Commons lists {resolved['sha1']}")
+        partial_state.unlink(missing_ok=True)
+        return sha1, received
 
     raise RuntimeError(f"could not download {item_name}")
 
 
+def cache_images(
+    dataset_key: str,
+    items: list[tuple[str, dict[str, Any]]],
+    store: ImageStore,
+    width: int,
+    link: bool = False,
+    controller: AIMDController | None = None,
+    on_result: Callable[[str, str | Exception], None] | None = None,
+) -> dict[str, str | Exception]:
+    """Cache the renditions of ``(item name, resolved)`` pairs in the image store.
+
+    Items the store can already serve are assigned right away.  The other
+    renditions are downloaded once per URL, as many at a time as the
+    controller allows, while the store and ``on_result`` are only touched from
+    the calling thread.  Returns each item's object path or the exception
+    that downloading it raised.
+    """
+    results: dict[str, str | Exception] = {}
+    pending: dict[str, list[tuple[str, dict[str, Any]]]] = {}
+    for name, resolved in items:
+        path = stored_image(resolved, dataset_key, name, store, width, link)
+        if path is None:
+            pending.setdefault(resolved["image_url"], []).append((name, resolved))
+        else:
+            results[name] = path
+            if on_result:
+                on_result(name, path)
+
+    workers = int(controller.maximum) if controller is not None else 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                fetch_image, group[0][1], Path(store.partial_path(url)), group[0][0], controller
+            ): (url, group)
+            for url, group in pending.items()
+        }
+        for future in as_completed(futures):
+            url, group = futures[future]
+            try:
+                sha1, received = future.result()
+                store.bytes_transferred += received
+                store.add(store.partial_path(url), sha1, group[0][1].get("mime"))
+                store.downloaded += 1
+                outcomes = [
+                    store.assign(dataset_key, name, sha1, rendition_details(resolved, width), link)
+                    for name, resolved in group
+                ]
+            except (HTTPError, URLError, TimeoutError, ValueError, OSError, RuntimeError) as exc:
+                outcomes = [exc] * len(group)
+            for (name, _), outcome in zip(group, outcomes):
+                results[name] = outcome
+                if on_result:
+                    on_result(name, outcome)
+    return results
+
+
+def adopt_local_images(config: dict[str, Any], store: ImageStore, link: bool = False) -> int:
+    """Move images cached under per-item paths into the store, without network access.
+
+    Items keep their Commons details, but the upload checksum is unknown until
+    the next ``--write`` run, which therefore fetches each rendition once more
+    and finds the bytes already stored.  Returns the number of items moved.
+    """
+    raw_data = json.loads(config["raw"].read_text(encoding="utf-8"))
+    processed_data = json.loads(config["processed"].read_text(encoding="utf-8"))
+    key = config["key"]
+    processed_by_name = {item["name"]: item for item in processed_data[key]}
+    adopted = 0
+    for item in raw_data[key]:
+        old_url = item.get("image_url")
+        if not old_url or urlsplit(old_url).scheme or old_url.startswith(f"{OBJECTS_DIR}/"):
+            continue
+        path = ROOT / old_url
+        if not path.is_file() or path.is_symlink():
+            print(f"SKIPPED  {item['name']}: {old_url} is not a cached file")
+            continue
+        remote_url = item.get("image_remote_url")
+        source_page = item.get("image_source_url") or item.get("image_original_url")
+        width = re.search(r"/(\d+)px-[^/]*$", remote_url or "")
+        details = {
+            "title": f"File:{commons_filename(source_page)}" if source_page else None,
+            "variant": f"{width.group(1)}px" if width else "original",
+            "source_url": remote_url,
+            "original_sha1": None,
+            "original_size": None,
+        }
+        sha1 = file_sha1(path)
+        store.add(str(path), sha1, mimetypes.guess_type(path.name)[0])
+        new_url = store.assign(key, item["name"], sha1, details, link)
+        for record in (item, processed_by_name.get(item["name"])):
+            if record is None:
+                continue
+            for field in ("image_url", "thumbnail_url"):
+                if record.get(field) == old_url:
+                    record[field] = new_url
+        adopted += 1
+        print(f"ADOPTED  {item['name']}: {old_url} -> {new_url}")
+    save_json(config["raw"], raw_data)
+    save_json(config["processed"], processed_data)
+    return adopted
+
+
 def apply_image_metadata(
     item: dict[str, Any], resolved: dict[str, Any], display_url: str | None = None
 ) -> None:
@@ -274,11 +627,93 @@ def save_json(path: Path, data: dict[str, Any]) -> None:
     )
 
 
+class SyncJournal:
+    """Per-item outcomes of ``--write`` runs, appended to a JSONL file.
+
+    Each line records one item: the URL it was resolved from, the display
+    width, and either the resolved metadata and cached image path (``ok``)
+    or the error (``failed``).  The last line for an item wins.  A rerun
+    reuses the ``ok`` outcomes whose source URL and width still match, so
+    only failed and pending items reach the API and the network again.  Lines
+    are flushed to disk as they are written; a line torn by a crash is ignored.
+    """
+
+    def __init__(self, path: Path = JOURNAL_FILE) -> None:
+        self.path = path
+        self.entries: dict[tuple[str, str], dict[str, Any]] = {}
+        if path.is_file():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.entries[(entry["dataset"], entry["name"])] = entry
+        self.resumed = 0
+
+    def completed(self, dataset: str, name: str, source_url: str, width: int) -> dict[str, Any] | None:
+        """The journaled ``ok`` outcome of an item, if it still applies."""
+        entry = self.entries.get((dataset, name))
+        if not entry or entry["status"] != "ok" or entry["source_url"] != source_url or entry["width"] != width:
+            return None
+        # The cached image must still be there to be reused
+        display_url = entry["display_url"]
+        if not urlsplit(display_url).scheme and not (ROOT / display_url).is_file():
+            return None
+        return entry
+
+    def record(self, dataset: str, name: str, source_url: str, width: int, **outcome: Any) -> None:
+        entry = {"dataset": dataset, "name": name, "source_url": source_url, "width": width, **outcome}
+        self.entries[(dataset, name)] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as file:
+            file.write(json.dumps(entry, ensure_ascii=True) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def clear(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self.entries = {}
+
+
+def commit_files(files: dict[Path, dict[str, Any]]) -> None:
+    """Write several JSON files so that none is replaced before all are written.
+
+    Every file is first written next to its target and only then moved into
+    place.  If the run dies while moving, the journal is still there and the
+    next run writes the same files again.
+    """
+    temporaries = []
+    try:
+        for path, data in files.items():
+            temporary = path.with_name(path.name + ".tmp")
+            save_json(temporary, data)
+            temporaries.append((temporary, path))
+    except BaseException:
+        for temporary, _ in temporaries:
+            temporary.unlink(missing_ok=True)
+        raise
+    for temporary, path in temporaries:
+        temporary.replace(path)
+
+
 def audit_dataset(
     config: dict[str, Any],
     width: int,
     write: bool,
-) -> tuple[int, int, list[str]]:
+    cache: HTTPCache | None = None,
+    store: ImageStore | None = None,
+    link: bool = False,
+    journal: SyncJournal | None = None,
+    api_controller: AIMDController | None = None,
+    download_controller: AIMDController | None = None,
+) -> tuple[int, int, list[str], dict[Path, dict[str, Any]]]:
+    """Resolve, and in write mode cache, the image of every item of a dataset.
+
+    Returns the item count, the number of changed image URLs, the failures,
+    and the refreshed raw, processed and attribution data by path, which the
+    caller writes with ``commit_files`` once every dataset has succeeded.
+    Items with a journaled outcome are neither resolved nor downloaded again.
+    """
     raw_data = json.loads(config["raw"].read_text(encoding="utf-8"))
     processed_data = json.loads(config["processed"].read_text(encoding="utf-8"))
     key = config["key"]
@@ -288,7 +723,46 @@ def audit_dataset(
     failures: list[str] = []
     changes = 0
 
-    for item in raw_items:
+    source_urls = [
+        (item.get("image_source_url") or item.get("image_original_url") or item["image_url"])
+        if item.get("image_url") else None
+        for item in raw_items
+    ]
+    journaled = [
+        journal.completed(key, item["name"], source_url, width) if journal and source_url else None
+        for item, source_url in zip(raw_items, source_urls)
+    ]
+    # Resolve every other image up front, BATCH_SIZE titles per API request
+    pending = [url for url, entry in zip(source_urls, journaled) if url and entry is None]
+    batch_results = iter(resolve_images(pending, width, cache, api_controller))
+    resolutions = [
+        next(batch_results) if source_url and entry is None else None
+        for source_url, entry in zip(source_urls, journaled)
+    ]
+
+    downloads: dict[str, str | Exception] = {}
+    if write:
+        source_by_name = {item["name"]: source_url for item, source_url in zip(raw_items, source_urls)}
+        resolved_by_name = {}
+
+        def journal_download(name: str, outcome: str | Exception) -> None:
+            if journal is None:
+                return
+            if isinstance(outcome, Exception):
+                journal.record(key, name, source_by_name[name], width, status="failed",
+                               error=f"image download failed: {outcome}")
+            else:
+                journal.record(key, name, source_by_name[name], width, status="ok",
+                               resolved=resolved_by_name[name], display_url=outcome)
+
+        for item, resolved in zip(raw_items, resolutions):
+            if isinstance(resolved, dict):
+                resolved_by_name[item["name"]] = resolved
+        downloads = cache_images(
+            key, list(resolved_by_name.items()), store, width, link, download_controller, journal_download
+        )
+
+    for item, source_url, entry, resolved in zip(raw_items, source_urls, journaled, resolutions):
         name = item["name"]
         old_url = item.get("image_url")
         if not old_url:
@@ -296,38 +770,37 @@ def audit_dataset(
             print(f"MISSING  {name}: no image_url")
             continue
 
-        try:
-            source_url = (
-                item.get("image_source_url")
-                or item.get("image_original_url")
-                or old_url
-            )
-            resolved = resolve_image(source_url, width)
-        except (HTTPError, URLError, TimeoutError, ValueError, KeyError) as exc:
-            failures.append(f"{name}: {exc}")
-            print(f"BROKEN   {name}: {exc}")
-            continue
-
-        display_url = resolved["image_url"]
-        if write:
-            try:
-                display_url = download_image(resolved, key, name)
-            except (HTTPError, URLError, TimeoutError, ValueError, OSError, RuntimeError) as exc:
-                failures.append(f"{name}: image download failed: {exc}")
-                print(f"BROKEN   {name}: image download failed: {exc}")
-                continue
-        elif not urlsplit(old_url).scheme:
-            cached_image = ROOT / old_url
-            if not cached_image.is_file() or cached_image.stat().st_size == 0:
-                failures.append(f"{name}: local image missing or empty: {old_url}")
-                print(f"BROKEN   {name}: local image missing or empty: {old_url}")
+        if entry is not None:
+            resolved, display_url = entry["resolved"], entry["display_url"]
+            journal.resumed += 1
+        else:
+            if isinstance(resolved, Exception):
+                failures.append(f"{name}: {resolved}")
+                print(f"BROKEN   {name}: {resolved}")
+                if journal:
+                    journal.record(key, name, source_url, width, status="failed", error=str(resolved))
                 continue
-            display_url = old_url
+
+            display_url = resolved["image_url"]
+            if write:
+                display_url = downloads[name]
+                if isinstance(display_url, Exception):
+                    failures.append(f"{name}: image download failed: {display_url}")
+                    print(f"BROKEN   {name}: image download failed: {display_url}")
+                    continue
+            elif not urlsplit(old_url).scheme:
+                cached_image = ROOT / old_url
+                if not cached_image.is_file() or cached_image.stat().st_size == 0:
+                    failures.append(f"{name}: local image missing or empty: {old_url}")
+                    print(f"BROKEN   {name}: local image missing or empty: {old_url}")
+                    continue
+                display_url = old_url
 
         changed = old_url != display_url
         changes += int(changed)
         state = "REFRESH" if changed else "OK"
-        print(f"{state:<8} {name}: {resolved['canonical_title']}")
+        resumed = " (journaled)" if entry is not None else ""
+        print(f"{state:<8} {name}: {resolved['canonical_title']}{resumed}")
 
         apply_image_metadata(item, resolved, display_url)
         processed_item = processed_by_name.get(name)
@@ -337,16 +810,19 @@ def audit_dataset(
             apply_image_metadata(processed_item, resolved, display_url)
         attributions.append(attribution_entry(name, resolved))
 
+    files: dict[Path, dict[str, Any]] = {}
     if write and not failures:
         update_date = date.today().isoformat()
         for data in (raw_data, processed_data):
             data.setdefault("metadata", {})["count"] = len(data[key])
             data["metadata"]["images_updated_at"] = update_date
-        save_json(config["raw"], raw_data)
-        save_json(config["processed"], processed_data)
-        save_json(config["attribution"], {"attributions": attributions})
+        files = {
+            config["raw"]: raw_data,
+            config["processed"]: processed_data,
+            config["attribution"]: {"attributions": attributions},
+        }
 
-    return len(raw_items), changes, failures
+    return len(raw_items), changes, failures, files
 
 
 def parse_args() -> argparse.Namespace:
@@ -356,12 +832,38 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="cache images locally and write refreshed metadata to the repository",
     )
+    parser.add_argument(
+        "--adopt",
+        action="store_true",
+        help="move images cached under per-item paths into the image store (no network access)",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="discard the journal of an unfinished --write run instead of resuming it",
+    )
+    parser.add_argument(
+        "--link-slugs",
+        action="store_true",
+        help="also keep each item's old images/wikimedia/<dataset>/<slug> path as a symbolic link",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=8,
+        help="most image downloads in flight; the actual number adapts to Commons (default: 8)",
+    )
     parser.add_argument(
         "--width",
         type=int,
         default=960,
         help="maximum display-image width in pixels (default: 960)",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="query the API directly instead of through the on-disk HTTP cache",
+    )
     return parser.parse_args()
 
 
@@ -371,17 +873,61 @@ def main() -> int:
         print("--width must be at least 480", file=sys.stderr)
         return 2
 
+    if args.adopt:
+        store = ImageStore(str(ROOT))
+        try:
+            adopted = sum(adopt_local_images(config, store, args.link_slugs) for config in DATASETS)
+        finally:
+            store.save()
+        print(f"\nAdopted {adopted} images\n{store.report()}")
+        return 0
+
     total = 0
     changes = 0
     failures: list[str] = []
+    files: dict[Path, dict[str, Any]] = {}
+    cache = None if args.no_cache else HTTPCache()
+    store = ImageStore(str(ROOT)) if args.write else None
+    journal = SyncJournal() if args.write else None
+    # API queries are few and sequential; downloads fan out as far as Commons allows
+    api_controller = AIMDController(initial=1, maximum=2)
+    download_controller = AIMDController(initial=2, maximum=max(2, args.max_concurrency))
+    if journal is not None and args.restart:
+        journal.clear()
     for config in DATASETS:
         print(f"\nAuditing {config['raw'].relative_to(ROOT)}")
-        dataset_total, dataset_changes, dataset_failures = audit_dataset(
-            config, args.width, args.write
-        )
+        try:
+            dataset_total, dataset_changes, dataset_failures, dataset_files = audit_dataset(
+                config, args.width, args.write, cache, store, args.link_slugs, journal,
+                api_controller, download_controller,
+            )
+        finally:
+            # The manifest describes the files on disk, which change even if a later item fails
+            if store is not None:
+                store.save()
         total += dataset_total
         changes += dataset_changes
         failures.extend(dataset_failures)
+        files.update(dataset_files)
+    if store is not None:
+        if journal.resumed:
+            print(f"\nResumed {journal.resumed} item(s) from {JOURNAL_FILE.relative_to(ROOT)}")
+        if not failures:
+            commit_files(files)
+            journal.clear()
+            for config in DATASETS:
+                store.retain(config["key"], (item["name"] for item in files[config["raw"]][config["key"]]))
+            # Objects of renamed or removed items that no item shows any more
+            pruned = store.prune()
+            store.save()
+            if pruned:
+                print(f"\nRemoved {pruned} unreferenced image(s)")
+        print(f"\n{store.report()}")
+        print(f"Downloads: {download_controller.report()}")
+    print(f"Commons API: {api_controller.report()}")
+    if cache is not None:
+        print(f"\n{cache.stats.report()}")
+        cache.close()
 
     action = "updated" if args.write and not failures else "would refresh"
     print(f"\n{total - len(failures)}/{total} images valid; {action} {changes} URLs")
@@ -389,6 +935,8 @@ def main() -> int:
         print(f"{len(failures)} failure(s); no files were written:")
         for failure in failures:
             print(f"- {failure}")
+        if journal is not None:
+            print("Completed items are journaled; rerun with --write to retry only the rest.")
         return 1
     return 0
 
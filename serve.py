@@ -1,8 +1,152 @@
+import argparse
+import datetime
+import email.utils
+import hashlib
 import http.server
+import json
 import socketserver
+import io
 import os
 import sys
+import threading
 import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+from precompress import EXTENSIONS, MIN_SIZE, available_encodings, compress_bytes, is_compressible
+from query_store import QueryError, ReloadingQueryStore
+from serve_metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, SNAPSHOT_INTERVAL, ServerMetrics, SnapshotWriter
+
+# Datasets served by the query API, loaded on first use and reloaded when changed
+query_store = ReloadingQueryStore({
+    'aircraft': os.path.join('data', 'processed', 'aircraft_processed.json'),
+    'birds': os.path.join('data', 'processed', 'birds_processed.json'),
+})
+CHART_PARAMETERS_FILE = os.path.join('data', 'chart_parameters.json')
+
+# Hot files kept in memory: at most 64 MB in total and 16 MB per file
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAX_ENTRY_BYTES = 16 * 1024 * 1024
+
+
+class FileCache:
+    """
+    Thread-safe LRU cache of file contents bounded by total bytes.
+
+    Entries are keyed by (path, encoding) and remember the mtime and size of
+    the file they were read or compressed from, so a changed file is read
+    again on the next lookup instead of being served stale.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, max_entry_bytes=CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, stat):
+        """Return the cached bytes for key if they match the file's stat, else None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def put(self, key, stat, data):
+        """Store data for key, evicting the least recently used entries to fit."""
+        if len(data) > self.max_entry_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[2])
+            self.entries[key] = (stat.st_mtime_ns, stat.st_size, data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted[2])
+
+    def load(self, key, stat, produce):
+        """
+        Return the cached bytes for key, calling produce() to create and
+        cache them on a miss. Returns None without calling produce() if the
+        file is too large to cache.
+        """
+        data = self.get(key, stat)
+        if data is None:
+            if stat.st_size > self.max_entry_bytes:
+                return None
+            data = produce()
+            self.put(key, stat, data)
+        return data
+
+
+file_cache = FileCache()
+
+
+def file_cache_metrics():
+    """Metric families describing file_cache, for ServerMetrics."""
+    with file_cache.lock:
+        hits, misses = file_cache.hits, file_cache.misses
+        size, entries = file_cache.size, len(file_cache.entries)
+    lookups = hits + misses
+    return [
+        ('site_file_cache_hits_total', 'counter', 'File cache lookups answered from memory.', [({}, hits)]),
+        ('site_file_cache_misses_total', 'counter', 'File cache lookups that read or compressed the file.',
+         [({}, misses)]),
+        ('site_file_cache_hit_ratio', 'gauge', 'Share of file cache lookups that were hits.',
+         [({}, round(hits / lookups, 4) if lookups else 0)]),
+        ('site_file_cache_bytes', 'gauge', 'Bytes held by the file cache.', [({}, size)]),
+        ('site_file_cache_entries', 'gauge', 'Files held by the file cache.', [({}, entries)]),
+    ]
+
+
+# Served at /metrics
+metrics = ServerMetrics(collectors=[file_cache_metrics])
+
+
+class CountingWriter:
+    """Wrap a connection's write file and count the bytes written through it."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.count = 0
+
+    def write(self, data):
+        written = self.raw.write(data)
+        self.count += len(data)
+        return written
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def make_etag(stat, encoding=None):
+    """Strong ETag for a version of a file, distinct for each content coding."""
+    tag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    if encoding:
+        tag += f"-{encoding}"
+    return f'"{tag}"'
+
+
+def etag_matches(header, etag):
+    """Check an If-None-Match header against an ETag using weak comparison."""
+    if header.strip() == '*':
+        return True
+    candidates = [candidate.strip() for candidate in header.split(',')]
+    return any(candidate.removeprefix('W/') == etag for candidate in candidates)
+
 
 def find_available_port(start_port, max_attempts=10):
     for port in range(start_port, start_port + max_attempts):
@@ -14,32 +158,336 @@ def find_available_port(start_port, max_attempts=10):
             continue
     return None
 
-# Configurar o servidor
-initial_port = 8000
-PORT = find_available_port(initial_port)
 
-if PORT is None:
-    print(f"Não foi possível encontrar uma porta disponível entre {initial_port} e {initial_port + 9}")
-    sys.exit(1)
+def parse_accept_encoding(header):
+    """
+    Parse an Accept-Encoding header into {coding: quality}.
+
+    Codings with a quality of zero are kept so that callers can tell an
+    explicit refusal from a coding that was not mentioned.
+    """
+    codings = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        codings[coding] = quality
+    return codings
+
+
+def choose_encoding(header, encodings):
+    """
+    Pick the best of the offered content codings for an Accept-Encoding header.
+
+    Parameters:
+    header (str): The Accept-Encoding request header, or None
+    encodings (list): Codings that can be sent, in order of preference
+
+    Returns:
+    str: The chosen coding, or None to send the file unencoded
+    """
+    codings = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = codings.get(encoding, codings.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class SiteRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Static file handler for HTTP/1.1 keep-alive connections.
 
-# Não precisa mais mudar para o diretório docs
-# os.chdir('docs')
+    Text assets are sent compressed when the client accepts it: a
+    precompressed .br or .gz sibling written by precompress.py if one is up
+    to date, otherwise a copy compressed on the fly. File contents and
+    compressed copies are served from file_cache. Every file gets a strong
+    ETag and Last-Modified, and conditional requests that still match get
+    a 304 without a body.
 
-Handler = http.server.SimpleHTTPRequestHandler
+    Paths under /api/ are answered from query_store instead:
+
+        /api/records, /api/aircraft, /api/birds   query the records, see
+                                                  QueryStore.query
+        /api/records/<id>                         one record
+        /api/fields                               queryable fields
+        /api/parameters                           data/chart_parameters.json
+
+    /metrics returns the request, latency, byte, connection, cache and
+    compression metrics of serve_metrics.ServerMetrics, which every request
+    updates when it ends.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this, Nagle's
+    # algorithm and delayed ACKs stall keep-alive responses by ~40 ms
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)
+        metrics.connection_opened()
+
+    def finish(self):
+        try:
+            super().finish()
+        finally:
+            metrics.connection_closed()
+
+    def parse_request(self):
+        self.request_start = time.perf_counter()
+        self.request_bytes_start = self.wfile.count
+        self.response_status = None
+        self.response_encoding = None
+        self.path = ''
+        metrics.request_started()
+        return super().parse_request()
+
+    def handle_one_request(self):
+        self.request_start = None
+        try:
+            super().handle_one_request()
+        finally:
+            if self.request_start is not None:
+                encoding, identity_bytes, encoded_bytes = self.response_encoding or (None, 0, 0)
+                if self.command == 'HEAD':
+                    encoding = None
+                metrics.request_finished(
+                    self.path, self.response_status or 0, time.perf_counter() - self.request_start,
+                    self.wfile.count - self.request_bytes_start, encoding, identity_bytes, encoded_bytes)
+
+    def send_response(self, code, message=None):
+        self.response_status = code
+        super().send_response(code, message)
+
+    def do_GET(self):
+        if self.path.startswith('/api/') or self.path.split('?', 1)[0] == '/metrics':
+            body = self.send_api() if self.path.startswith('/api/') else self.send_metrics()
+            if body:
+                self.wfile.write(body)
+            return
+        super().do_GET()
+
+    def do_HEAD(self):
+        if self.path.startswith('/api/'):
+            self.send_api()
+            return
+        if self.path.split('?', 1)[0] == '/metrics':
+            self.send_metrics()
+            return
+        super().do_HEAD()
+
+    def send_metrics(self):
+        """Send the headers of the /metrics response and return its body."""
+        body = metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-type", METRICS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        return body
+
+    def send_api(self):
+        """Send the headers of an API response and return its body."""
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part][1:]
+        params = parse_qs(url.query)
+        try:
+            store = query_store.current()
+        except (OSError, ValueError) as e:
+            # A processed file is missing, or is being rewritten by the pipeline
+            return self.send_json(503, {'error': f"the processed data cannot be loaded: {e}"})
+        try:
+            if parts == ['parameters']:
+                with open(CHART_PARAMETERS_FILE, 'r', encoding='utf-8') as f:
+                    payload = json.load(f)
+            elif parts == ['fields']:
+                payload = store.describe_fields()
+            elif len(parts) == 2 and parts[0] == 'records':
+                payload = store.get(int(parts[1])) if parts[1].isdigit() else None
+                if payload is None:
+                    return self.send_json(404, {'error': f"no record with id {parts[1]}"})
+            elif len(parts) == 1 and parts[0] in ('records', 'aircraft', 'birds'):
+                if parts[0] != 'records':
+                    params['dataset'] = [parts[0]]
+                payload = store.query(params)
+            else:
+                return self.send_json(404, {'error': f"unknown endpoint {url.path}"})
+        except QueryError as e:
+            return self.send_json(400, {'error': str(e)})
+        return self.send_json(200, payload)
+
+    def send_json(self, status, payload):
+        """Send the headers of a JSON response, compressed if accepted, and return its body."""
+        body = json.dumps(payload).encode('utf-8')
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.vary_accept_encoding = True
+        if status == 200 and etag_matches(self.headers.get('If-None-Match', ''), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return b''
+        encoding = None
+        if len(body) >= MIN_SIZE:
+            encoding = choose_encoding(self.headers.get('Accept-Encoding'), available_encodings())
+        if encoding:
+            identity_bytes = len(body)
+            body = compress_bytes(body, encoding)
+            self.response_encoding = (encoding, identity_bytes, len(body))
+        self.send_response(status)
+        self.send_header("Content-type", "application/json")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        if status == 200:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        return body
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split('?', 1)[0].split('#', 1)[0].endswith('/'):
+            for index in ('index.html', 'index.htm'):
+                if os.path.isfile(os.path.join(path, index)):
+                    path = os.path.join(path, index)
+                    break
+        if not os.path.isfile(path) or path.endswith('/'):
+            # Directory redirects, listings and 404s
+            return super().send_head()
+
+        stat = os.stat(path)
+        encoding = None
+        if is_compressible(path):
+            # Caches must key these responses on Accept-Encoding even when
+            # they are sent unencoded
+            self.vary_accept_encoding = True
+            if stat.st_size >= MIN_SIZE:
+                encoding = choose_encoding(self.headers.get('Accept-Encoding'), available_encodings())
+        etag = make_etag(stat, encoding)
+
+        if self.not_modified(stat, etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", self.date_time_string(stat.st_mtime))
+            self.end_headers()
+            return None
+
+        body = self.file_body(path, stat, encoding)
+        if body is None:
+            f = open(path, 'rb')
+            length = stat.st_size
+        else:
+            f = io.BytesIO(body)
+            length = len(body)
+            if encoding:
+                self.response_encoding = (encoding, stat.st_size, length)
+
+        self.send_response(200)
+        self.send_header("Content-type", self.guess_type(path))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.date_time_string(stat.st_mtime))
+        self.end_headers()
+        return f
+
+    def file_body(self, path, stat, encoding):
+        """Return the response body from the cache, or None to stream the file from disk."""
+        if encoding is None:
+            return file_cache.load((path, None), stat, lambda: read_file(path))
+        sibling = path + EXTENSIONS[encoding]
+        try:
+            sibling_stat = os.stat(sibling)
+        except FileNotFoundError:
+            sibling_stat = None
+        if sibling_stat is not None and sibling_stat.st_mtime >= stat.st_mtime:
+            body = file_cache.load((sibling, None), sibling_stat, lambda: read_file(sibling))
+            if body is not None:
+                return body
+            return read_file(sibling)
+        body = file_cache.load((path, encoding), stat, lambda: compress_bytes(read_file(path), encoding))
+        if body is None:
+            body = compress_bytes(read_file(path), encoding)
+        return body
+
+    def not_modified(self, stat, etag):
+        """Evaluate If-None-Match, or If-Modified-Since when it is absent."""
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag_matches(if_none_match, etag)
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is None:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        return int(stat.st_mtime) <= since.timestamp()
+
+    def end_headers(self):
+        if getattr(self, 'vary_accept_encoding', False):
+            self.send_header("Vary", "Accept-Encoding")
+            self.vary_accept_encoding = False
+        super().end_headers()
+
+
+Handler = SiteRequestHandler
 Handler.extensions_map.update({
     '.js': 'application/javascript',
     '.json': 'application/json',
 })
 
-print(f"Serving at http://localhost:{PORT}")
-print("Pressione Ctrl+C para parar o servidor")
-
-with socketserver.TCPServer(("", PORT), Handler) as httpd:
-    try:
-        httpd.serve_forever()
-    except KeyboardInterrupt:
-        print("\nServidor encerrado")
-        httpd.server_close()
-    except Exception as e:
-        print(f"\nErro: {e}")
-        httpd.server_close() 
\ No newline at end of file
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the site locally.')
+    parser.add_argument('--port', type=int, help='Port to listen on (default: first free port from 8000)')
+    parser.add_argument('--bind', default='', help='Address to bind to (default: all interfaces)')
+    parser.add_argument('--metrics-file', help='Also write the /metrics numbers to this file periodically: '
+                                               'rewritten if it ends in .prom, else a JSON line appended each time')
+    parser.add_argument('--metrics-interval', type=float, default=SNAPSHOT_INTERVAL,
+                        help=f'Seconds between metrics snapshots (default: {SNAPSHOT_INTERVAL:g})')
+    args = parser.parse_args()
+
+    # Configurar o servidor
+    initial_port = 8000
+    port = args.port or find_available_port(initial_port)
+
+    if port is None:
+        print(f"Não foi possível encontrar uma porta disponível entre {initial_port} e {initial_port + 9}")
+        sys.exit(1)
+
+    print(f"Serving at http://localhost:{port}")
+    print("Pressione Ctrl+C para parar o servidor")
+    snapshots = SnapshotWriter(metrics, args.metrics_file, args.metrics_interval).start() if args.metrics_file else None
+
+    # One thread per connection, so a slow client does not hold up the others
+    with http.server.ThreadingHTTPServer((args.bind, port), Handler) as httpd:
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print("\nServidor encerrado")
+            httpd.server_close()
+        except Exception as e:
+            print(f"\nErro: {e}")
+            httpd.server_close()
+        finally:
+            if snapshots is not None:
+                snapshots.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Request metrics for serve.py, in the Prometheus text exposition format.
+
+ServerMetrics counts what the server does, per class of path (see
+path_class) so that the number of series stays small whatever is requested:
+
+    site_http_requests_total{class,status}          requests answered
+    site_http_request_duration_seconds{class}       latency histogram, from the
+                                                    request line to the last byte
+    site_http_response_bytes_total{class}           bytes written, headers included
+    site_http_connections_open                      connections being served
+    site_http_requests_in_flight                    requests being answered
+    site_http_compression_{input,output}_bytes_total{encoding}
+    site_http_compression_ratio{encoding}           output / input bytes
+    site_http_slow_path_duration_seconds{path}      mean latency of the slowest paths
+    site_http_slow_path_requests{path}              and how often they were requested
+
+serve.py adds the file cache's hit ratio through a collector, and answers
+GET /metrics with render(). SnapshotWriter writes the same numbers to a file
+every few seconds: the exposition text for a .prom file (overwritten, as
+node_exporter's textfile collector expects) or one JSON object per snapshot
+appended to any other file, for a history of a load test.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds of the latency histogram buckets, in seconds
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Paths whose latency is tracked one by one; later paths are not tracked
+MAX_TRACKED_PATHS = 1000
+# Slowest tracked paths reported
+SLOW_PATHS = 10
+# Seconds between snapshots
+SNAPSHOT_INTERVAL = 60.0
+
+PATH_CLASSES = {
+    '.html': 'html', '.htm': 'html',
+    '.js': 'script', '.mjs': 'script',
+    '.css': 'style',
+    '.json': 'data', '.csv': 'data',
+    '.jpg': 'image', '.jpeg': 'image', '.png': 'image', '.gif': 'image', '.svg': 'image', '.webp': 'image',
+    '.avif': 'image', '.ico': 'image',
+    '.woff': 'font', '.woff2': 'font', '.ttf': 'font',
+}
+
+# (labels, value) samples of one metric
+Samples = List[Tuple[Dict[str, str], float]]
+# (name, type, help, samples)
+Family = Tuple[str, str, str, Samples]
+
+
+def path_class(path: str) -> str:
+    """
+    Class of a request path: api, metrics, html, script, style, data, image,
+    font or other.
+    """
+    path = path.split('?', 1)[0].split('#', 1)[0]
+    if path.startswith('/api/'):
+        return 'api'
+    if path == '/metrics':
+        return 'metrics'
+    if path.endswith('/'):
+        return 'html'
+    return PATH_CLASSES.get(os.path.splitext(path)[1].lower(), 'other')
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_families(families: List[Family]) -> str:
+    """Render metric families in the text exposition format."""
+    lines = []
+    for name, kind, help_text, samples in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            # Histograms name their _bucket, _sum and _count samples in __name__
+            labels = dict(labels)
+            sample_name = labels.pop('__name__', name)
+            label_text = ','.join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+            lines.append(f"{sample_name}{{{label_text}}} {_format_value(value)}" if label_text
+                         else f"{sample_name} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+class ServerMetrics:
+    """Thread-safe counters, gauges and histograms of a running server."""
+
+    def __init__(self, collectors: List[Callable[[], List[Family]]] = None):
+        """
+        Parameters:
+        collectors (list): Functions returning more metric families to
+            include in every rendering, e.g. the state of a cache
+        """
+        self.collectors = list(collectors or [])
+        self.started = time.time()
+        self.lock = threading.Lock()
+        # (class, status) -> count
+        self.requests: Dict[Tuple[str, str], int] = {}
+        # class -> [bucket counts..., sum, count]
+        self.durations: Dict[str, List[float]] = {}
+        # class -> bytes
+        self.bytes_sent: Dict[str, int] = {}
+        # encoding -> [responses, input bytes, output bytes]
+        self.compression: Dict[str, List[int]] = {}
+        # path -> [requests, seconds]
+        self.paths: Dict[str, List[float]] = {}
+        self.connections_open = 0
+        self.connections_total = 0
+        self.requests_in_flight = 0
+
+    def connection_opened(self) -> None:
+        with self.lock:
+            self.connections_open += 1
+            self.connections_total += 1
+
+    def connection_closed(self) -> None:
+        with self.lock:
+            self.connections_open -= 1
+
+    def request_started(self) -> None:
+        with self.lock:
+            self.requests_in_flight += 1
+
+    def request_finished(self, path: str, status: int, seconds: float, bytes_sent: int,
+                         encoding: str = None, identity_bytes: int = 0, encoded_bytes: int = 0) -> None:
+        """
+        Record an answered request.
+
+        Parameters:
+        path (str): Request path, query included
+        status (int): Response status
+        seconds (float): Time from reading the request line to the end of the response
+        bytes_sent (int): Bytes written for the response, headers included
+        encoding (str): Content coding of the body, if it was compressed
+        identity_bytes (int): Size of the body before compression
+        encoded_bytes (int): Size of the compressed body
+        """
+        kind = path_class(path)
+        bucket = bisect_left(DURATION_BUCKETS, seconds)
+        path = path.split('?', 1)[0]
+        with self.lock:
+            self.requests_in_flight -= 1
+            key = (kind, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.durations.get(kind)
+            if histogram is None:
+                histogram = self.durations[kind] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0, 0]
+            histogram[bucket] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+            self.bytes_sent[kind] = self.bytes_sent.get(kind, 0) + bytes_sent
+            if encoding:
+                totals = self.compression.setdefault(encoding, [0, 0, 0])
+                totals[0] += 1
+                totals[1] += identity_bytes
+                totals[2] += encoded_bytes
+            tracked = self.paths.get(path)
+            if tracked is None and len(self.paths) < MAX_TRACKED_PATHS:
+                tracked = self.paths[path] = [0, 0.0]
+            if tracked is not None:
+                tracked[0] += 1
+                tracked[1] += seconds
+
+    def families(self) -> List[Family]:
+        """All metric families, the collectors' included."""
+        with self.lock:
+            requests = sorted(self.requests.items())
+            durations = {kind: list(values) for kind, values in sorted(self.durations.items())}
+            bytes_sent = sorted(self.bytes_sent.items())
+            compression = {encoding: list(values) for encoding, values in sorted(self.compression.items())}
+            slowest = sorted(self.paths.items(), key=lambda entry: -entry[1][1] / entry[1][0])[:SLOW_PATHS]
+            slowest = [(path, count, seconds) for path, (count, seconds) in slowest]
+            gauges = (self.connections_open, self.connections_total, self.requests_in_flight)
+
+        histogram_samples: Samples = []
+        for kind, values in durations.items():
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS + (float('inf'),), values):
+                cumulative += count
+                histogram_samples.append(({'__name__': 'site_http_request_duration_seconds_bucket',
+                                           'class': kind, 'le': _format_value(bound)}, cumulative))
+            histogram_samples.append(({'__name__': 'site_http_request_duration_seconds_sum', 'class': kind},
+                                      values[-2]))
+            histogram_samples.append(({'__name__': 'site_http_request_duration_seconds_count', 'class': kind},
+                                      values[-1]))
+
+        families: List[Family] = [
+            ('site_start_time_seconds', 'gauge', 'Time the server started, in seconds since the epoch.',
+             [({}, round(self.started, 3))]),
+            ('site_http_requests_total', 'counter', 'Requests answered, by path class and status.',
+             [({'class': kind, 'status': status}, count) for (kind, status), count in requests]),
+            ('site_http_request_duration_seconds', 'histogram',
+             'Time from the request line to the end of the response, by path class.', histogram_samples),
+            ('site_http_response_bytes_total', 'counter', 'Bytes written in responses, headers included.',
+             [({'class': kind}, count) for kind, count in bytes_sent]),
+            ('site_http_connections_open', 'gauge', 'Connections being served.', [({}, gauges[0])]),
+            ('site_http_connections_total', 'counter', 'Connections accepted.', [({}, gauges[1])]),
+            ('site_http_requests_in_flight', 'gauge', 'Requests being answered.', [({}, gauges[2])]),
+            ('site_http_compressed_responses_total', 'counter', 'Responses sent with a content coding.',
+             [({'encoding': encoding}, values[0]) for encoding, values in compression.items()]),
+            ('site_http_compression_input_bytes_total', 'counter', 'Size of compressed bodies before compression.',
+             [({'encoding': encoding}, values[1]) for encoding, values in compression.items()]),
+            ('site_http_compression_output_bytes_total', 'counter', 'Size of compressed bodies as sent.',
+             [({'encoding': encoding}, values[2]) for encoding, values in compression.items()]),
+            ('site_http_compression_ratio', 'gauge', 'Bytes sent per byte of content, for compressed bodies.',
+             [({'encoding': encoding}, round(values[2] / values[1], 4))
+              for encoding, values in compression.items() if values[1]]),
+            ('site_http_slow_path_duration_seconds', 'gauge',
+             f'Mean latency of the {SLOW_PATHS} paths slowest on average.',
+             [({'path': path}, round(seconds / count, 6)) for path, count, seconds in slowest]),
+            ('site_http_slow_path_requests', 'gauge', 'Requests for each of the slowest paths.',
+             [({'path': path}, count) for path, count, _ in slowest]),
+        ]
+        for collect in self.collectors:
+            families.extend(collect())
+        return families
+
+    def render(self) -> str:
+        """The metrics in the text exposition format."""
+        return format_families(self.families())
+
+    def snapshot(self) -> dict:
+        """
+        The metrics as JSON-serializable samples.
+
+        Returns:
+        dict: {'time': seconds since the epoch, 'samples': [{'name', 'labels', 'value'}]}
+        """
+        samples = []
+        for name, _, _, family_samples in self.families():
+            for labels, value in family_samples:
+                labels = dict(labels)
+                samples.append({'name': labels.pop('__name__', name), 'labels': labels, 'value': value})
+        return {'time': round(time.time(), 3), 'samples': samples}
+
+
+class SnapshotWriter:
+    """Write a ServerMetrics snapshot to a file at a fixed interval."""
+
+    def __init__(self, metrics: ServerMetrics, path: str, interval: float = SNAPSHOT_INTERVAL):
+        """
+        Parameters:
+        metrics (ServerMetrics): Metrics to write
+        path (str): A .prom file, rewritten with the exposition text each
+            time, or any other file, to which a JSON line is appended each time
+        interval (float): Seconds between snapshots
+        """
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-snapshots', daemon=True)
+
+    def start(self) -> 'SnapshotWriter':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the thread and write a last snapshot."""
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        if self.path.endswith('.prom'):
+            # Replaced atomically so that readers never see half a file
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(self.metrics.render())
+            os.replace(self.path + '.tmp', self.path)
+        else:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(self.metrics.snapshot(), separators=(',', ':')) + '\n')
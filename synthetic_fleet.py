@@ -0,0 +1,369 @@
+"""
+Synthetic aircraft and bird datasets of any size, for scale testing.
+
+data/aircraft.json and data/birds.json hold a few dozen records, too few for
+any scaling limit of the pipeline to show. FleetModel fits the real records
+and generate_dataset writes as many synthetic ones as asked for, in the same
+{"metadata": ..., "aircraft": [...]} layout the pipeline reads:
+
+- Records are drawn per category_type and era (determine_era of the first
+  flight year), in the proportions of the real data. Each group has a
+  log-normal MTOW and a first flight year between the group's extremes.
+- Every other numeric field follows a log-log fit on MTOW with normally
+  distributed residuals, per category_type where it has enough records and
+  over the whole dataset otherwise. Drawn values are clipped to the range of
+  the real values of the fit, so no tail draw leaves what the pipeline
+  accepts (a cruise altitude above the ISA model's, for instance).
+- Categorical fields (manufacturer, engine type and count, the bird
+  categories, the image) and the set of fields come from the real record of
+  the group closest in MTOW, so absent optional fields stay absent at the
+  real rates. Fields the closest real record lacks are never added.
+
+missing_rate, invalid_rate and duplicate_rate add optional fields set to
+null, numeric fields that are null or not numbers, and names already used by
+an earlier record.
+
+Values are drawn with NumPy a chunk at a time and records are written one
+per line with the C JSON encoder, so a million records take seconds; indent
+writes the indented layout of the real files through JsonStreamWriter
+instead, which is several times slower.
+
+Usage:
+    python synthetic_fleet.py --aircraft 1000000 --birds 100000
+    python synthetic_fleet.py --aircraft 20000000 --missing-rate 0.2 --invalid-rate 0.001 \\
+        --duplicate-rate 0.01 --output-dir /tmp/fleet
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+
+from json_stream import JsonStreamWriter
+from process_aircraft_data import REQUIRED_FIELDS, determine_era
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DATASETS = {
+    'aircraft': os.path.join(ROOT, 'data', 'aircraft.json'),
+    'birds': os.path.join(ROOT, 'data', 'birds.json'),
+}
+DEFAULT_OUTPUT_DIR = os.path.join(ROOT, 'data', 'synthetic')
+CHUNK_SIZE = 10000
+
+# Numeric fields that are not fitted on MTOW
+UNFITTED_FIELDS = ('mtow_N', 'first_flight_year', 'engine_count', 'id')
+# Fewest records of a category_type for a fit of its own
+MIN_FIT_RECORDS = 4
+# Floor of the fitted spreads, in natural log units, so that groups with one
+# or two records still vary
+MIN_LOG_SPREAD = 0.05
+MIN_MTOW_SPREAD = 0.3
+# Years added on both sides of a group's first flight years
+YEAR_MARGIN = 3
+# Significant digits kept in the generated values
+SIGNIFICANT_DIGITS = 4
+# Values written into fields by invalid_rate
+INVALID_VALUES = (None, 'unknown', 'n/a')
+
+
+def log_values(records: List[dict], field: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Log MTOW and log value of the records where both are positive numbers."""
+    pairs = [
+        (math.log(record['mtow_N']), math.log(record[field]))
+        for record in records
+        if _positive(record.get('mtow_N')) and _positive(record.get(field))
+    ]
+    return np.array([x for x, _ in pairs]), np.array([y for _, y in pairs])
+
+
+def _positive(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+
+def fit_line(x: np.ndarray, y: np.ndarray) -> Tuple[float, float, float]:
+    """
+    Least-squares fit of y on x.
+
+    Returns:
+    tuple: (intercept, slope, residual standard deviation); the slope is 0
+        when x does not vary
+    """
+    if len(x) >= 2 and np.ptp(x) > 0:
+        slope, intercept = np.polyfit(x, y, 1)
+        residuals = y - (intercept + slope * x)
+    else:
+        slope, intercept = 0.0, float(np.mean(y))
+        residuals = y - intercept
+    spread = float(np.sqrt(np.mean(residuals ** 2))) if len(y) > 2 else 0.0
+    return float(intercept), float(slope), max(spread, MIN_LOG_SPREAD)
+
+
+def round_significant(values: np.ndarray, digits: int = SIGNIFICANT_DIGITS) -> np.ndarray:
+    magnitude = np.floor(np.log10(np.abs(values)))
+    scale = 10.0 ** (digits - 1 - magnitude)
+    return np.round(values * scale) / scale
+
+
+class FleetGroup:
+    """The real records of one category_type and era, sorted by MTOW."""
+
+    def __init__(self, category_type: str, era: str, records: List[dict]):
+        self.category_type = category_type
+        self.era = era
+        self.records = sorted(records, key=lambda record: record['mtow_N'])
+        log_mtow = np.log([record['mtow_N'] for record in self.records])
+        self.log_mtow = log_mtow
+        self.mtow_mean = float(np.mean(log_mtow))
+        self.mtow_spread = max(float(np.std(log_mtow)), MIN_MTOW_SPREAD)
+        years = [record['first_flight_year'] for record in self.records
+                 if isinstance(record.get('first_flight_year'), int)]
+        self.years = (min(years) - YEAR_MARGIN, max(years) + YEAR_MARGIN) if years else None
+        # Set by FleetModel: the fitted fields each record has, and their union
+        self.fields: List[List[str]] = []
+        self.drawn: List[str] = []
+
+    def nearest(self, log_mtow: np.ndarray) -> np.ndarray:
+        """Index of the record closest in MTOW to each value."""
+        index = np.clip(np.searchsorted(self.log_mtow, log_mtow), 1, len(self.log_mtow) - 1)
+        if len(self.log_mtow) == 1:
+            return np.zeros(len(log_mtow), dtype=int)
+        lower = self.log_mtow[index - 1]
+        upper = self.log_mtow[index]
+        return np.where(log_mtow - lower < upper - log_mtow, index - 1, index)
+
+
+class FleetModel:
+    """Distributions of one dataset's fields, fitted to its real records."""
+
+    def __init__(self, key: str, records: List[dict]):
+        """
+        Parameters:
+        key (str): Dataset key, 'aircraft' or 'birds'
+        records (list): The real records; those without a positive MTOW are ignored
+        """
+        self.key = key
+        records = [record for record in records if _positive(record.get('mtow_N'))]
+        if not records:
+            raise ValueError(f"no {key} records with an MTOW to fit")
+
+        grouped: Dict[Tuple[str, str], List[dict]] = {}
+        for record in records:
+            year = record.get('first_flight_year')
+            era = determine_era(year if isinstance(year, int) else None)
+            grouped.setdefault((record.get('category_type'), era), []).append(record)
+        self.groups = [FleetGroup(category_type, era, members) for (category_type, era), members in grouped.items()]
+        self.weights = np.array([len(group.records) for group in self.groups], dtype=float)
+        self.weights /= self.weights.sum()
+
+        self.numeric_fields = sorted({
+            field for record in records for field, value in record.items()
+            if _positive(value) and field not in UNFITTED_FIELDS
+        })
+        self.integer_fields = {
+            field for field in self.numeric_fields
+            if all(isinstance(record[field], int) for record in records if _positive(record.get(field)))
+        }
+        self.optional_fields = [field for field in self.numeric_fields if field not in REQUIRED_FIELDS]
+        for group in self.groups:
+            # The fields each real record has a value for, and all of them
+            group.fields = [['mtow_N'] + [field for field in self.numeric_fields if _positive(record.get(field))]
+                            for record in group.records]
+            group.drawn = sorted({field for fields in group.fields for field in fields[1:]})
+        # (intercept, slope, spread) of every fitted field per category_type,
+        # and the (lowest, highest) log value of the records it was fitted on
+        self.fits: Dict[Tuple[str, str], Tuple[float, float, float]] = {}
+        self.limits: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        for field in self.numeric_fields:
+            x, y = log_values(records, field)
+            overall = fit_line(x, y), (float(y.min()), float(y.max()))
+            for category_type in {group.category_type for group in self.groups}:
+                members = [record for record in records if record.get('category_type') == category_type]
+                x, y = log_values(members, field)
+                fit = (fit_line(x, y), (float(y.min()), float(y.max()))) if len(x) >= MIN_FIT_RECORDS else overall
+                self.fits[(category_type, field)], self.limits[(category_type, field)] = fit
+
+    @classmethod
+    def from_file(cls, key: str, file_path: str) -> 'FleetModel':
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return cls(key, json.load(f)[key])
+
+    def generate(self, count: int, seed: int = None, missing_rate: float = 0.0, invalid_rate: float = 0.0,
+                 duplicate_rate: float = 0.0, chunk_size: int = CHUNK_SIZE) -> Iterator[List[dict]]:
+        """
+        Generate records a chunk at a time.
+
+        Parameters:
+        count (int): Number of records
+        seed (int): Random seed; the same seed gives the same records
+        missing_rate (float): Share of the optional numeric fields a record
+            has that are set to null
+        invalid_rate (float): Share of records with one invalid value
+        duplicate_rate (float): Share of records named like an earlier one
+        chunk_size (int): Records per chunk
+
+        Returns:
+        iterator: Lists of up to chunk_size records
+        """
+        rng = np.random.default_rng(seed)
+        produced = 0
+        recent_names: List[str] = []
+        while produced < count:
+            size = min(chunk_size, count - produced)
+            chunk = self._chunk(rng, size, produced, missing_rate)
+            self._spoil(rng, chunk, invalid_rate, duplicate_rate, recent_names)
+            recent_names = [record['name'] for record in chunk[-1000:]]
+            produced += size
+            yield chunk
+
+    def _chunk(self, rng: np.random.Generator, size: int, offset: int, missing_rate: float) -> List[dict]:
+        group_index = rng.choice(len(self.groups), size=size, p=self.weights)
+        records: List[Optional[dict]] = [None] * size
+        for g, group in enumerate(self.groups):
+            rows = np.flatnonzero(group_index == g)
+            if not len(rows):
+                continue
+            log_mtow = rng.normal(group.mtow_mean, group.mtow_spread, len(rows))
+            templates = group.nearest(log_mtow)
+            drawn = {'mtow_N': round_significant(np.exp(log_mtow)).tolist()}
+            for field in group.drawn:
+                intercept, slope, spread = self.fits[(group.category_type, field)]
+                low, high = self.limits[(group.category_type, field)]
+                log_drawn = np.clip(intercept + slope * log_mtow + rng.normal(0, spread, len(rows)), low, high)
+                values = round_significant(np.exp(log_drawn))
+                drawn[field] = (np.round(values).astype(np.int64) if field in self.integer_fields else values).tolist()
+            years = (rng.integers(group.years[0], group.years[1] + 1, len(rows)).tolist()
+                     if group.years else None)
+            missing = ({field: (rng.random(len(rows)) < missing_rate).tolist()
+                        for field in group.drawn if field not in REQUIRED_FIELDS}
+                       if missing_rate else None)
+
+            for i, row in enumerate(rows.tolist()):
+                t = templates[i]
+                template = group.records[t]
+                record = dict(template)
+                number = offset + row + 1
+                record['name'] = f"{template['name']} #{number}"
+                if 'model' in record:
+                    record['model'] = f"{template['model']} #{number}"
+                if years is not None:
+                    record['first_flight_year'] = years[i]
+                for field in group.fields[t]:
+                    record[field] = drawn[field][i]
+                if missing is not None:
+                    for field in group.fields[t]:
+                        if field in missing and missing[field][i]:
+                            record[field] = None
+                record.pop('id', None)
+                records[row] = record
+        return records
+
+    def _spoil(self, rng: np.random.Generator, records: List[dict], invalid_rate: float, duplicate_rate: float,
+               recent_names: List[str]) -> None:
+        """Add the invalid values and duplicate names asked for, in place."""
+        if invalid_rate:
+            candidates = [field for field in REQUIRED_FIELDS if field != 'name'] + self.optional_fields
+            for row in np.flatnonzero(rng.random(len(records)) < invalid_rate).tolist():
+                fields = [field for field in candidates if field in records[row]]
+                records[row][fields[rng.integers(len(fields))]] = INVALID_VALUES[rng.integers(len(INVALID_VALUES))]
+        if duplicate_rate:
+            for row in np.flatnonzero(rng.random(len(records)) < duplicate_rate).tolist():
+                earlier = recent_names + [record['name'] for record in records[max(0, row - 1000):row]]
+                if earlier:
+                    records[row]['name'] = earlier[rng.integers(len(earlier))]
+
+
+def write_dataset(f: TextIO, model: FleetModel, count: int, seed: int = None, missing_rate: float = 0.0,
+                  invalid_rate: float = 0.0, duplicate_rate: float = 0.0, indent: bool = False) -> int:
+    """
+    Write a generated dataset as {"metadata": ..., "<key>": [...]}.
+
+    Parameters:
+    f (TextIO): File to write to
+    model (FleetModel): Fitted model of the dataset
+    count (int): Number of records
+    seed, missing_rate, invalid_rate, duplicate_rate: See FleetModel.generate
+    indent (bool): Indent like the real files (json.dump with indent=2)
+        instead of one compact record per line
+
+    Returns:
+    int: Number of records written
+    """
+    metadata = {
+        'count': count,
+        'generated_at': datetime.datetime.now().isoformat(),
+        'version': '1.0',
+        'synthetic': {'seed': seed, 'missing_rate': missing_rate, 'invalid_rate': invalid_rate,
+                      'duplicate_rate': duplicate_rate},
+    }
+    chunks = model.generate(count, seed, missing_rate, invalid_rate, duplicate_rate)
+    written = 0
+    if indent:
+        writer = JsonStreamWriter(f)
+        writer.write_member('metadata', metadata)
+        writer.begin_array(model.key)
+        for chunk in chunks:
+            for record in chunk:
+                writer.write_item(record)
+            written += len(chunk)
+        writer.end_array()
+        writer.close()
+        return written
+
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    f.write(f'{{"metadata": {json.dumps(metadata)},\n"{model.key}": [')
+    for chunk in chunks:
+        lines = '\n,'.join(encode(record) for record in chunk)
+        f.write(('\n' if not written else '\n,') + lines)
+        written += len(chunk)
+    f.write('\n]}\n')
+    return written
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--aircraft', type=int, default=0, help='aircraft records to write')
+    parser.add_argument('--birds', type=int, default=0, help='bird records to write')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help=f'directory for <dataset>.json (default: {os.path.relpath(DEFAULT_OUTPUT_DIR)})')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: 1)')
+    parser.add_argument('--missing-rate', type=float, default=0.0,
+                        help='share of the optional numeric fields a record has that are set to null')
+    parser.add_argument('--invalid-rate', type=float, default=0.0, help='share of records with an invalid value')
+    parser.add_argument('--duplicate-rate', type=float, default=0.0, help='share of records with a repeated name')
+    parser.add_argument('--indent', action='store_true', help='indent like the real files (slower)')
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    counts = {'aircraft': args.aircraft, 'birds': args.birds}
+    if not any(counts.values()):
+        print("Nothing to generate; pass --aircraft and/or --birds", file=sys.stderr)
+        return 2
+    os.makedirs(args.output_dir, exist_ok=True)
+    for key, count in counts.items():
+        if not count:
+            continue
+        model = FleetModel.from_file(key, DATASETS[key])
+        output_file = os.path.join(args.output_dir, f'{key}.json')
+        start = time.perf_counter()
+        with open(output_file + '.tmp', 'w', encoding='utf-8') as f:
+            written = write_dataset(f, model, count, args.seed, args.missing_rate, args.invalid_rate,
+                                    args.duplicate_rate, args.indent)
+        os.replace(output_file + '.tmp', output_file)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(output_file)
+        print(f"Wrote {written} {key} records to {output_file} ({size / 1e6:.1f} MB) in {elapsed:.1f}s "
+              f"({written / elapsed:,.0f} records/s, {size / 1e6 / elapsed:.0f} MB/s); "
+              f"{len(model.groups)} category/era groups")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+const test = require('node:test');
+const assert = require('node:assert/strict');
+const fs = require('node:fs');
+const path = require('node:path');
+const {
+    decodeColumn,
+    decodeRecords,
+    fromColumnar,
+    loadDataset
+} = require('../js/columnar-data');
+
+const processedDir = path.join(__dirname, '..', 'data', 'processed');
+
+function readJson(name) {
+    return JSON.parse(fs.readFileSync(path.join(processedDir, name), 'utf8'));
+}
+
+test('decodes dictionary-encoded and plain columns', () => {
+    assert.deepEqual(
+        decodeColumn({ dictionary: ['Heavy', 'Light'], codes: [1, 0, 1] }),
+        ['Light', 'Heavy', 'Light']
+    );
+    assert.deepEqual(decodeColumn([1.5, null, 3]), [1.5, null, 3]);
+});
+
+test('leaves out fields listed as missing for a row', () => {
+    const records = decodeRecords({
+        format: 'columnar-v1',
+        key: 'aircraft',
+        count: 2,
+        fields: ['name', 'max_power_kW'],
+        columns: { name: ['A', 'B'], max_power_kW: [null, null] },
+        missing: { max_power_kW: [1] }
+    });
+
+    assert.deepEqual(records, [{ name: 'A', max_power_kW: null }, { name: 'B' }]);
+});
+
+for (const name of ['aircraft', 'birds']) {
+    test(`rebuilds ${name}_processed.json from the columnar export`, () => {
+        const processed = readJson(`${name}_processed.json`);
+        const rebuilt = fromColumnar(readJson(`${name}_columns.json`), readJson(`${name}_text.json`));
+
+        assert.deepEqual(rebuilt, processed);
+    });
+}
+
+test('falls back to the processed file when the columnar file is missing', async () => {
+    const requested = [];
+    const originalFetch = globalThis.fetch;
+    const originalWarn = console.warn;
+    globalThis.fetch = async url => {
+        requested.push(url);
+        if (url.endsWith('_columns.json')) {
+            return { ok: false, status: 404, statusText: 'Not Found' };
+        }
+        return { ok: true, json: async () => ({ metadata: {}, birds: [] }) };
+    };
+    console.warn = () => {};
+    try {
+        assert.deepEqual(await loadDataset('birds'), { metadata: {}, birds: [] });
+    } finally {
+        globalThis.fetch = originalFetch;
+        console.warn = originalWarn;
+    }
+
+    assert.deepEqual(requested, [
+        'data/processed/birds_columns.json',
+        'data/processed/birds_processed.json'
+    ]);
+});
@@ -0,0 +1,57 @@
+const test = require('node:test');
+const assert = require('node:assert/strict');
+const fs = require('node:fs');
+const path = require('node:path');
+const { sources, pictureHtml } = require('../js/responsive-images');
+
+const record = {
+    name: 'Concorde "SST"',
+    image_url: 'images/wikimedia/aircraft/concorde.jpg',
+    image_width: 960,
+    image_height: 640,
+    image_variants: [
+        { url: 'v/concorde-320w.avif', type: 'image/avif', width: 320, height: 213 },
+        { url: 'v/concorde-160w.avif', type: 'image/avif', width: 160, height: 107 },
+        { url: 'v/concorde-160w.webp', type: 'image/webp', width: 160, height: 107 }
+    ]
+};
+
+test('groups variants by type in first-seen order, narrowest first', () => {
+    assert.deepEqual(sources(record.image_variants), [
+        { type: 'image/avif', srcset: 'v/concorde-160w.avif 160w, v/concorde-320w.avif 320w' },
+        { type: 'image/webp', srcset: 'v/concorde-160w.webp 160w' }
+    ]);
+});
+
+test('builds a picture with the cached image as fallback', () => {
+    const html = pictureHtml(record, { className: 'gallery-img', sizes: '200px', loading: 'lazy' });
+    assert.equal(
+        html,
+        '<picture>' +
+        '<source type="image/avif" srcset="v/concorde-160w.avif 160w, v/concorde-320w.avif 320w" sizes="200px">' +
+        '<source type="image/webp" srcset="v/concorde-160w.webp 160w" sizes="200px">' +
+        '<img src="images/wikimedia/aircraft/concorde.jpg" alt="Concorde &quot;SST&quot;" class="gallery-img" ' +
+        'width="960" height="640" loading="lazy">' +
+        '</picture>'
+    );
+});
+
+test('falls back to a plain img without variants', () => {
+    assert.equal(
+        pictureHtml({ name: 'Wright Flyer', thumbnail_url: 'thumb.jpg', image_url: 'full.jpg' }),
+        '<img src="thumb.jpg" alt="Wright Flyer">'
+    );
+});
+
+test('every variant in the processed data exists on disk', () => {
+    const root = path.join(__dirname, '..');
+    for (const name of ['aircraft', 'birds']) {
+        const data = JSON.parse(fs.readFileSync(path.join(root, 'data', 'processed', `${name}_processed.json`), 'utf8'));
+        for (const item of data[name]) {
+            for (const variant of item.image_variants || []) {
+                assert.ok(fs.existsSync(path.join(root, variant.url)), `${variant.url} is missing`);
+                assert.ok(variant.width <= item.image_width);
+            }
+        }
+    }
+});
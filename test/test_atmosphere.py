@@ -0,0 +1,56 @@
+"""Tests of the ISA model and its lookup table."""
+
+import numpy as np
+import pytest
+
+from atmosphere import (LAYER_BASES_M, MAX_ALTITUDE_M, MIN_ALTITUDE_M, SEA_LEVEL_DENSITY, IsaTable,
+                        isa_atmosphere)
+
+
+def test_sea_level_and_tropopause_match_the_1976_standard():
+    sea_level = isa_atmosphere(0.0)
+    assert sea_level.temperature_K == pytest.approx(288.15)
+    assert sea_level.pressure_Pa == pytest.approx(101325.0)
+    assert sea_level.density_kgm3 == pytest.approx(1.2250, abs=1e-4)
+    assert SEA_LEVEL_DENSITY == pytest.approx(1.2250, abs=1e-4)
+    # Published values at the bases of the next layers
+    for altitude_m, pressure_Pa in ((11000.0, 22632.1), (20000.0, 5474.89), (32000.0, 868.019)):
+        assert isa_atmosphere(altitude_m).pressure_Pa == pytest.approx(pressure_Pa, rel=1e-5)
+
+
+def test_scalar_and_array_evaluation_agree():
+    altitudes = np.array([MIN_ALTITUDE_M, -1000.0, 0.0, 5500.0] + list(LAYER_BASES_M) + [MAX_ALTITUDE_M])
+    arrays = isa_atmosphere(altitudes, delta_T=-15.0)
+    for i, altitude_m in enumerate(altitudes):
+        scalar = isa_atmosphere(float(altitude_m), delta_T=-15.0)
+        for field in scalar._fields:
+            assert getattr(scalar, field) == pytest.approx(getattr(arrays, field)[i], rel=1e-12)
+
+
+@pytest.mark.parametrize('altitude_m', [MIN_ALTITUDE_M - 1.0, MAX_ALTITUDE_M + 1.0, float('nan')])
+def test_altitudes_outside_the_model_are_rejected(altitude_m):
+    with pytest.raises(ValueError):
+        isa_atmosphere(altitude_m)
+    with pytest.raises(ValueError):
+        isa_atmosphere(np.array([0.0, altitude_m]))
+
+
+@pytest.mark.parametrize('step_m', [10.0, 100.0])
+def test_isa_table_stays_within_its_error_bound(step_m):
+    table = IsaTable(step_m)
+    altitudes = np.concatenate([
+        np.linspace(MIN_ALTITUDE_M, MAX_ALTITUDE_M, 100001),
+        np.random.default_rng(0).uniform(MIN_ALTITUDE_M, MAX_ALTITUDE_M, 100000),
+    ])
+    exact = isa_atmosphere(altitudes, delta_T=10.0)
+    approximate = table(altitudes, delta_T=10.0)
+    np.testing.assert_allclose(approximate.temperature_K, exact.temperature_K, rtol=1e-12)
+    for field in ('pressure_Pa', 'density_kgm3'):
+        relative_error = np.abs(getattr(approximate, field) / getattr(exact, field) - 1)
+        # Allow for rounding on top of the interpolation error
+        assert relative_error.max() <= table.max_relative_error + 1e-12
+
+
+def test_isa_table_step_must_divide_1000_m():
+    with pytest.raises(ValueError):
+        IsaTable(7.0)
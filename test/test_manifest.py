@@ -0,0 +1,107 @@
+"""
+Tests of incremental processing with the build manifest: which records are
+reused after an insert, a delete or an edit, and that the output matches a
+build without the manifest.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+import instrumentation
+import process_aircraft_data
+
+ROOT = Path(__file__).resolve().parent.parent
+AIRCRAFT_FILE = ROOT / 'data' / 'aircraft.json'
+BIRDS_FILE = ROOT / 'data' / 'birds.json'
+
+
+@pytest.fixture
+def counters():
+    instrumentation.enable()
+    instrumentation.reset()
+    yield
+    instrumentation.enable(False)
+    instrumentation.reset()
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build(tmp_path, aircraft, birds, manifest=True):
+    """
+    Process the aircraft and then the birds, with IDs chained between them.
+
+    Returns:
+    list: (hits, misses, evicted) for the aircraft and for the birds
+    """
+    aircraft_data = load(AIRCRAFT_FILE)
+    aircraft_data['aircraft'] = aircraft
+    birds_data = load(BIRDS_FILE)
+    birds_data['birds'] = birds
+    (tmp_path / 'aircraft.json').write_text(json.dumps(aircraft_data), encoding='utf-8')
+    (tmp_path / 'birds.json').write_text(json.dumps(birds_data), encoding='utf-8')
+
+    out_dir = tmp_path / ('out' if manifest else 'fresh')
+    out_dir.mkdir(exist_ok=True)
+    manifest_file = str(out_dir / 'manifest.json') if manifest else None
+    next_id = 1
+    cache = []
+    for name in ('aircraft', 'birds'):
+        instrumentation.reset()
+        next_id = process_aircraft_data.process_database(
+            str(tmp_path / f'{name}.json'), str(out_dir / f'{name}_processed.json'), next_id,
+            batch=True, manifest_file=manifest_file)
+        counters = instrumentation.snapshot()['counters']
+        cache.append(tuple(counters.get(f'process_aircraft_data.cache_{kind}', 0)
+                           for kind in ('hits', 'misses', 'evicted')))
+    return cache
+
+
+def assert_same_as_fresh_build(tmp_path, aircraft, birds):
+    build(tmp_path, aircraft, birds, manifest=False)
+    for name in ('aircraft', 'birds'):
+        incremental = (tmp_path / 'out' / f'{name}_processed.json').read_bytes()
+        assert incremental == (tmp_path / 'fresh' / f'{name}_processed.json').read_bytes()
+
+
+def test_insert_recomputes_only_the_new_record(tmp_path, counters):
+    aircraft = load(AIRCRAFT_FILE)['aircraft']
+    birds = load(BIRDS_FILE)['birds']
+    build(tmp_path, aircraft, birds)
+
+    new = dict(aircraft[5], name='Inserted Aircraft', mtow_N=aircraft[5]['mtow_N'] * 1.1)
+    aircraft = [new] + aircraft
+    assert build(tmp_path, aircraft, birds) == [(len(aircraft) - 1, 1, 0), (len(birds), 0, 0)]
+    assert_same_as_fresh_build(tmp_path, aircraft, birds)
+
+
+def test_delete_recomputes_nothing(tmp_path, counters):
+    aircraft = load(AIRCRAFT_FILE)['aircraft']
+    birds = load(BIRDS_FILE)['birds']
+    build(tmp_path, aircraft, birds)
+
+    del aircraft[0]
+    assert build(tmp_path, aircraft, birds) == [(len(aircraft), 0, 1), (len(birds), 0, 0)]
+    assert_same_as_fresh_build(tmp_path, aircraft, birds)
+
+
+def test_edit_recomputes_only_the_edited_record(tmp_path, counters):
+    aircraft = load(AIRCRAFT_FILE)['aircraft']
+    birds = load(BIRDS_FILE)['birds']
+    build(tmp_path, aircraft, birds)
+
+    aircraft[10]['wingspan_m'] += 1
+    birds[3]['mtow_N'] *= 2
+    assert build(tmp_path, aircraft, birds) == [(len(aircraft) - 1, 1, 1), (len(birds) - 1, 1, 1)]
+    assert_same_as_fresh_build(tmp_path, aircraft, birds)
+
+
+def test_unchanged_inputs_skip_the_run(tmp_path, counters):
+    aircraft = load(AIRCRAFT_FILE)['aircraft']
+    birds = load(BIRDS_FILE)['birds']
+    build(tmp_path, aircraft, birds)
+    assert build(tmp_path, aircraft, birds) == [(0, 0, 0), (0, 0, 0)]
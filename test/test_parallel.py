@@ -0,0 +1,44 @@
+"""Tests of the process-pool runner against the serial processing."""
+
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+import process_aircraft_data
+from json_stream import JsonStreamWriter, encode_array_item
+
+ROOT = Path(__file__).resolve().parent.parent
+AIRCRAFT_FILE = ROOT / 'data' / 'aircraft.json'
+BIRDS_FILE = ROOT / 'data' / 'birds.json'
+
+
+def test_encoded_items_match_written_items():
+    items = [{'id': 1, 'name': 'Aé', 'wing': {'span': 10.5, 'tags': []}}, [1, [2]], None]
+    direct, encoded = io.StringIO(), io.StringIO()
+    for f, write in ((direct, lambda writer, item: writer.write_item(item)),
+                     (encoded, lambda writer, item: writer.write_encoded_item(encode_array_item(item)))):
+        writer = JsonStreamWriter(f)
+        writer.begin_array('items')
+        for item in items:
+            write(writer, item)
+        writer.end_array()
+        writer.close()
+    assert encoded.getvalue() == direct.getvalue() == json.dumps({'items': items}, indent=2)
+
+
+@pytest.mark.parametrize('batch', [False, True])
+def test_parallel_processing_matches_serial_processing(tmp_path, batch):
+    serial = [tmp_path / 'aircraft_serial.json', tmp_path / 'birds_serial.json']
+    parallel = [tmp_path / 'aircraft_parallel.json', tmp_path / 'birds_parallel.json']
+    next_id = process_aircraft_data.process_database(str(AIRCRAFT_FILE), str(serial[0]), batch=batch)
+    next_id = process_aircraft_data.process_database(str(BIRDS_FILE), str(serial[1]), start_id=next_id, batch=batch)
+
+    # Small chunks so that each dataset is split across the workers
+    parallel_next_id = process_aircraft_data.process_databases_parallel(
+        [(str(AIRCRAFT_FILE), str(parallel[0]), None), (str(BIRDS_FILE), str(parallel[1]), None)],
+        workers=2, chunk_size=7, batch=batch)
+    assert parallel_next_id == next_id
+    for serial_file, parallel_file in zip(serial, parallel):
+        assert parallel_file.read_bytes() == serial_file.read_bytes()
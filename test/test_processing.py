@@ -0,0 +1,60 @@
+"""
+Tests of the streaming mode of process_database: the JSON stream writer and
+reader, and streamed output against the output of a loaded file.
+"""
+
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+import process_aircraft_data
+from json_stream import JsonStreamWriter, iter_json_members
+
+ROOT = Path(__file__).resolve().parent.parent
+AIRCRAFT_FILE = ROOT / 'data' / 'aircraft.json'
+
+
+def test_stream_writer_matches_json_dump():
+    data = {
+        'metadata': {'count': 3, 'version': '1.0', 'tags': ['a', 'b']},
+        'aircraft': [{'id': 1, 'name': 'Aé', 'wing': {'span': 10.5}}, {'id': 2, 'x': None}, []],
+        'empty': [],
+        'birds': [],
+    }
+    f = io.StringIO()
+    writer = JsonStreamWriter(f)
+    writer.write_member('metadata', data['metadata'])
+    for key in ('aircraft', 'empty', 'birds'):
+        writer.begin_array(key)
+        for item in data[key]:
+            writer.write_item(item)
+        writer.end_array()
+    writer.close()
+    assert f.getvalue() == json.dumps(data, indent=2)
+
+
+def test_empty_stream_writer_matches_json_dump():
+    f = io.StringIO()
+    JsonStreamWriter(f).close()
+    assert f.getvalue() == json.dumps({}, indent=2)
+
+
+def test_iter_json_members_reads_what_json_load_reads():
+    with open(AIRCRAFT_FILE, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    # A small chunk size so that values span chunk boundaries
+    members = {key: list(value) if key == 'aircraft' else value
+               for key, value in iter_json_members(str(AIRCRAFT_FILE), stream_keys=('aircraft',), chunk_size=4096)}
+    assert members == data
+
+
+@pytest.mark.parametrize('batch', [False, True])
+def test_streamed_processing_matches_loaded_processing(tmp_path, batch):
+    loaded = tmp_path / 'loaded.json'
+    streamed = tmp_path / 'streamed.json'
+    next_id = process_aircraft_data.process_database(str(AIRCRAFT_FILE), str(loaded), batch=batch)
+    assert process_aircraft_data.process_database(str(AIRCRAFT_FILE), str(streamed), batch=batch,
+                                                  stream=True) == next_id
+    assert streamed.read_bytes() == loaded.read_bytes()
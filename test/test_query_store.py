@@ -0,0 +1,110 @@
+"""Tests of the indexed query store behind /api."""
+
+import json
+
+import pytest
+
+from query_store import QueryError, QueryStore, ReloadingQueryStore
+
+
+def make_store():
+    return QueryStore({
+        'aircraft': [
+            {'id': 1, 'name': 'Glider', 'category_type': 'Light', 'wingspan_m': 15.0},
+            {'id': 2, 'name': 'Airliner', 'category_type': 'Heavy', 'wingspan_m': 35.8},
+            {'id': 3, 'name': 'Trainer', 'category_type': 'Light', 'wingspan_m': 10.9},
+            {'id': 4, 'name': 'Freighter', 'category_type': 'Heavy', 'wingspan_m': 64.4},
+            {'id': 5, 'name': 'Prototype', 'category_type': 'Light'},
+        ],
+        'birds': [
+            {'id': 6, 'name': 'Albatross', 'wingspan_m': 3.4},
+        ],
+    })
+
+
+def names(result):
+    return [item['name'] for item in result['items']]
+
+
+def test_query_filters_by_value_and_range():
+    store = make_store()
+    assert names(store.query({'category_type': ['Light']})) == ['Glider', 'Trainer', 'Prototype']
+    assert names(store.query({'category_type': ['Light,Heavy'], 'range': ['wingspan_m:11:40']})) == \
+        ['Glider', 'Airliner']
+    assert names(store.query({'range': ['wingspan_m::11']})) == ['Trainer', 'Albatross']
+    assert names(store.query({'dataset': ['birds']})) == ['Albatross']
+
+
+def test_query_sorts_with_missing_values_last():
+    store = make_store()
+    assert names(store.query({'sort': ['wingspan_m']})) == \
+        ['Albatross', 'Trainer', 'Glider', 'Airliner', 'Freighter', 'Prototype']
+    assert names(store.query({'sort': ['-wingspan_m']})) == \
+        ['Freighter', 'Airliner', 'Glider', 'Trainer', 'Albatross', 'Prototype']
+    assert names(store.query({'sort': ['category_type,-wingspan_m'], 'dataset': ['aircraft']})) == \
+        ['Freighter', 'Airliner', 'Glider', 'Trainer', 'Prototype']
+
+
+def test_query_pages_and_projects():
+    store = make_store()
+    result = store.query({'sort': ['name'], 'limit': ['2'], 'offset': ['1'], 'fields': ['id,name']})
+    assert result == {'total': 6, 'offset': 1, 'limit': 2,
+                      'items': [{'id': 6, 'name': 'Albatross'}, {'id': 4, 'name': 'Freighter'}]}
+    assert store.query({'limit': ['2'], 'offset': ['10']})['items'] == []
+
+
+def test_get_returns_one_record():
+    store = make_store()
+    assert store.get(4)['name'] == 'Freighter'
+    assert store.get(4)['dataset'] == 'aircraft'
+    assert store.get(99) is None
+
+
+@pytest.mark.parametrize('params', [
+    {'unknown_field': ['x']},
+    {'range': ['name:1:2']},
+    {'range': ['wingspan_m:a:b']},
+    {'range': ['wingspan_m:nan:']},
+    {'range': ['wingspan_m::inf']},
+    {'range': ['wingspan_m:-Infinity:3']},
+    {'sort': ['nonexistent']},
+    {'limit': ['-1']},
+    {'offset': ['two']},
+    {'fields': ['id,nonexistent']},
+])
+def test_query_rejects_malformed_parameters(params):
+    with pytest.raises(QueryError):
+        make_store().query(params)
+
+
+def test_walked_and_sorted_orders_agree():
+    # Enough rows that wide filters walk a field's order and narrow ones sort
+    records = [{'id': i, 'name': f'Aircraft {i % 7}', 'category_type': 'Light' if i % 3 else 'Heavy',
+                'wingspan_m': float(i % 11) if i % 5 else None}
+               for i in range(1, 101)]
+    store = QueryStore({'aircraft': records})
+    for sort in ('wingspan_m', '-wingspan_m', 'name', '-name'):
+        field = sort.lstrip('-')
+        present = [record for record in records if record[field] is not None]
+        present.sort(key=lambda record: record['id'])
+        present.sort(key=lambda record: record[field], reverse=sort.startswith('-'))
+        expected = present + [record for record in records if record[field] is None]
+        for params, wanted in [({}, expected),
+                               ({'category_type': ['Light']}, [r for r in expected if r['category_type'] == 'Light']),
+                               ({'range': ['wingspan_m:3:3']}, [r for r in expected if r['wingspan_m'] == 3.0])]:
+            result = store.query(dict(params, sort=[sort], limit=['1000']))
+            assert [item['id'] for item in result['items']] == [record['id'] for record in wanted]
+            page = store.query(dict(params, sort=[sort], limit=['5'], offset=['3']))
+            assert page['total'] == len(wanted)
+            assert [item['id'] for item in page['items']] == [record['id'] for record in wanted[3:8]]
+
+
+def test_reloading_store_reloads_when_a_file_changes(tmp_path):
+    path = tmp_path / 'aircraft_processed.json'
+    path.write_text(json.dumps({'aircraft': [{'id': 1, 'name': 'Glider'}]}), encoding='utf-8')
+    reloading = ReloadingQueryStore({'aircraft': str(path)})
+    store = reloading.current()
+    assert reloading.current() is store
+    path.write_text(json.dumps({'aircraft': [{'id': 1, 'name': 'Glider'}, {'id': 2, 'name': 'Trainer'}]}),
+                    encoding='utf-8')
+    assert names(reloading.current().query({})) == ['Glider', 'Trainer']
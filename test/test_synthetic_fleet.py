@@ -0,0 +1,42 @@
+"""
+Tests of the synthetic fleet generator: clean fleets pass the pipeline's
+validation, and drawn values stay within the range of the real ones.
+"""
+
+import json
+
+import pytest
+
+import process_aircraft_data
+from atmosphere import MAX_ALTITUDE_M, MIN_ALTITUDE_M
+from synthetic_fleet import DATASETS, FleetModel
+
+COUNT = 20000
+
+
+@pytest.fixture(scope='module', params=sorted(DATASETS))
+def fleet(request):
+    model = FleetModel.from_file(request.param, DATASETS[request.param])
+    return model, [record for chunk in model.generate(COUNT, seed=1) for record in chunk]
+
+
+def test_clean_fleet_processes_without_rejections(fleet):
+    _, records = fleet
+    results, errors = process_aircraft_data.compute_derived_values_batch([dict(record) for record in records])
+    assert errors == []
+    assert all(results)
+    assert all(process_aircraft_data.compute_derived_values(record) for record in records)
+
+
+def test_drawn_values_stay_within_the_real_range(fleet):
+    model, records = fleet
+    with open(DATASETS[model.key], 'r', encoding='utf-8') as f:
+        real = json.load(f)[model.key]
+    for field in model.numeric_fields:
+        # Records copy the values their real template has but cannot be fitted, zeros for instance
+        values = [record[field] for record in real if isinstance(record.get(field), (int, float))]
+        drawn = [record[field] for record in records if isinstance(record.get(field), (int, float))]
+        # Drawn values are rounded to SIGNIFICANT_DIGITS after clipping
+        assert min(values) * 0.999 <= min(drawn) and max(drawn) <= max(values) * 1.001, field
+    altitudes = [record['cruise_altitude_m'] for record in records if 'cruise_altitude_m' in record]
+    assert MIN_ALTITUDE_M <= min(altitudes) and max(altitudes) <= MAX_ALTITUDE_M
@@ -0,0 +1,208 @@
+"""
+Concurrent lookup of Wikimedia Commons thumbnail URLs.
+
+For each image, the smallest rendition listed under "Other resolutions" on
+its Commons description page is used as the thumbnail. ThumbnailResolver
+fetches the pages on a bounded thread pool over one pooled requests.Session,
+with connect/read timeouts, and a HostLimiter caps the request rate and the
+number of requests in flight per host. A full refresh therefore takes about
+(number of images) / (requests per second), however slow each round trip is.
+"""
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from http_cache import COMMONS_URL, CachedSession, HTTPCache
+from rate_limit import HostLimiter
+
+USER_AGENT = (
+    "aircraft-databank-thumbnails/1.0 "
+    "(https://github.com/flavioluiz/FlightDataBank)"
+)
+COMMONS_FILE_URL = COMMONS_URL + "/wiki/File:{filename}"
+
+# Status codes worth retrying after a pause
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def clean_wikimedia_url(url: str) -> Optional[str]:
+    """Return the Commons file name of an upload or thumbnail URL."""
+    if not url:
+        return None
+
+    # First remove any query parameters (after ?)
+    url = url.split('?')[0]
+
+    # Get the filename
+    filename = url.split('/')[-1]
+
+    # If it's a thumb URL, get the original filename
+    if '/thumb/' in url:
+        # Remove resolution prefix (e.g., '1599px-')
+        if 'px-' in filename:
+            filename = filename.split('px-')[-1]
+        # Remove the thumbnail resolution version completely
+        parts = url.split('/thumb/')
+        if len(parts) > 1:
+            filename = parts[1].split('/')[-2]
+
+    return filename
+
+
+def description_page_url(image_url: str) -> Optional[str]:
+    """Return the Commons description page URL for an image URL."""
+    filename = clean_wikimedia_url(image_url)
+    return COMMONS_FILE_URL.format(filename=filename) if filename else None
+
+
+def parse_thumbnail_url(html: str) -> Optional[str]:
+    """Return the first link under "Other resolutions" on a description page."""
+    soup = BeautifulSoup(html, 'html.parser')
+    resolution_text = soup.find(string=re.compile("Other resolutions:"))
+    if resolution_text:
+        first_thumbnail = resolution_text.find_next('a', class_='mw-thumbnail-link')
+        if first_thumbnail:
+            return first_thumbnail['href']
+    return None
+
+
+def _retry_after_seconds(response: requests.Response, default: float) -> float:
+    value = response.headers.get('Retry-After')
+    try:
+        return max(0.0, float(value)) if value is not None else default
+    except ValueError:
+        return default
+
+
+class ThumbnailResolver:
+    """Resolves thumbnail URLs concurrently within per-host politeness limits."""
+
+    def __init__(self, workers: int = 8, requests_per_second: float = 5.0, per_host_concurrency: int = 4,
+                 timeout: tuple = (5.0, 20.0), retries: int = 3, session: requests.Session = None,
+                 cache: HTTPCache = None, use_cache: bool = True):
+        """
+        Parameters:
+        workers (int): Size of the thread pool
+        requests_per_second (float): Request rate allowed per host
+        per_host_concurrency (int): Requests allowed in flight per host
+        timeout (tuple): (connect, read) timeouts in seconds
+        retries (int): Further attempts after a timeout, connection error,
+            429 or 5xx response
+        session (requests.Session): Session to use instead of a new pooled one
+        cache (HTTPCache): Response cache for the new session (default: the
+            shared on-disk cache)
+        use_cache (bool): Whether the new session uses a cache at all
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self.retries = retries
+        self.limiter = HostLimiter(requests_per_second, per_host_concurrency)
+        if session is None:
+            session = CachedSession(cache) if use_cache else requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['User-Agent'] = USER_AGENT
+        self.session = session
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> 'ThumbnailResolver':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def resolve(self, image_url: str) -> Optional[str]:
+        """
+        Look up the thumbnail URL of one image.
+
+        Returns:
+        str: The thumbnail URL, or None if the page could not be fetched or
+            lists no other resolutions
+        """
+        page_url = description_page_url(image_url)
+        if not page_url:
+            return None
+        delay = 1.0
+        for attempt in range(self.retries + 1):
+            try:
+                if isinstance(self.session, CachedSession) and self.session.is_fresh(page_url):
+                    response = self.session.get(page_url, timeout=self.timeout)
+                else:
+                    with self.limiter.limit(page_url):
+                        response = self.session.get(page_url, timeout=self.timeout)
+            except requests.RequestException as e:
+                if attempt == self.retries:
+                    print(f"    Error getting thumbnail for {page_url}: {e}")
+                    return None
+            else:
+                if response.status_code == 200:
+                    return parse_thumbnail_url(response.text)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    print(f"    Failed to get description page {page_url}: {response.status_code}")
+                    return None
+                # Slow down every worker talking to this host, not just this one
+                self.limiter.defer(page_url, _retry_after_seconds(response, delay))
+            time.sleep(delay)
+            delay *= 2
+        return None
+
+    def resolve_many(self, image_urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Look up the thumbnail URLs of many images concurrently.
+
+        Parameters:
+        image_urls (iterable): Image URLs; duplicates are looked up once
+
+        Returns:
+        dict: Thumbnail URL (or None) by image URL, in input order
+        """
+        unique = list(dict.fromkeys(url for url in image_urls if url))
+        if not unique:
+            return {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(unique))) as executor:
+            results = dict(zip(unique, executor.map(self.resolve, unique)))
+        found = sum(1 for url in results.values() if url)
+        elapsed = time.perf_counter() - start
+        print(f"  Resolved {found} of {len(unique)} thumbnails in {elapsed:.1f}s "
+              f"({len(unique) / elapsed:.1f} pages/s)")
+        if isinstance(self.session, CachedSession):
+            print(f"  {self.session.cache.stats.report()}")
+        return results
+
+
+def resolve_thumbnails(items: List[dict], resolver: ThumbnailResolver = None) -> int:
+    """
+    Set thumbnail_url on every item whose image has a thumbnail.
+
+    Parameters:
+    items (list): Records with an image_url
+    resolver (ThumbnailResolver): Resolver to use (default: a new one)
+
+    Returns:
+    int: Number of items that got a thumbnail URL
+    """
+    own_resolver = resolver is None
+    if own_resolver:
+        resolver = ThumbnailResolver()
+    try:
+        thumbnails = resolver.resolve_many(item.get('image_url') for item in items)
+    finally:
+        if own_resolver:
+            resolver.close()
+    updated = 0
+    for item in items:
+        thumbnail_url = thumbnails.get(item.get('image_url'))
+        if thumbnail_url:
+            item['thumbnail_url'] = thumbnail_url
+            updated += 1
+    return updated
@@ -3,10 +3,41 @@ import json
 import re
 import argparse
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse, unquote
+from rate_limit import TokenBucket
+from attribution_extractor import extract_fields
+from http_cache import COMMONS_URL, CachedSession, commons_endpoint
+
+USER_AGENT = (
+    "aircraft-databank-attribution/1.0 "
+    "(https://github.com/flavioluiz/FlightDataBank)"
+)
+
+# Status codes worth retrying after a pause
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DEFAULT_MAX_RETRIES = 4
+
+class ScrapeStats:
+    """Thread-safe counters for a scraping run."""
+    
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.waited = 0.0
+        self.lock = threading.Lock()
+    
+    def add(self, requests=0, retries=0, waited=0.0):
+        with self.lock:
+            self.requests += requests
+            self.retries += retries
+            self.waited += waited
 
 def load_json_file(file_path):
     """Load a JSON file and return its contents."""
@@ -52,7 +83,7 @@ def convert_to_description_url(image_url):
 
     # The datasets may already contain the canonical Commons description page.
     if parsed_url.netloc == "commons.wikimedia.org" and "/wiki/File:" in parsed_url.path:
-        return image_url.split('?', 1)[0]
+        return commons_endpoint(image_url.split('?', 1)[0])
     
     # Extract the filename from the path
     path_parts = parsed_url.path.split('/')
@@ -77,226 +108,73 @@ def convert_to_description_url(image_url):
     filename = unquote(filename)
     
     # Create the description page URL
-    return f"https://commons.wikimedia.org/wiki/File:{filename}"
+    return f"{COMMONS_URL}/wiki/File:{filename}"
+
+def fetch_page(url, session=None, limiter=None, stats=None, max_retries=DEFAULT_MAX_RETRIES):
+    """
+    Fetch a page, retrying 429 and 5xx responses with exponential backoff.
+    
+    A Retry-After header on a retried response is honored; with a limiter,
+    the pause applies to every worker sharing it.
+    
+    Args:
+        url (str): Page to fetch
+        session (requests.Session): Session to use (default: plain requests.get)
+        limiter (TokenBucket): Rate limiter to take a token from per request
+        stats (ScrapeStats): Counters to update
+        max_retries (int): Attempts after the first one
+    
+    Returns:
+        str: The page HTML
+    
+    Raises:
+        requests.RequestException: If the page could not be fetched
+    """
+    get = session.get if session is not None else requests.get
+    delay = 1.0
+    for attempt in range(max_retries + 1):
+        # Pages the cache can answer by itself do not count against the rate
+        cached = isinstance(session, CachedSession) and session.is_fresh(url)
+        if limiter is not None and not cached:
+            waited = limiter.acquire()
+            if stats is not None:
+                stats.add(waited=waited)
+        response = get(url, timeout=10)
+        if stats is not None and not getattr(response, 'from_cache', False):
+            stats.add(requests=1)
+        if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+            response.raise_for_status()
+            return response.text
+        pause = retry_after_seconds(response, delay)
+        print(f"  HTTP {response.status_code} for {url}, retrying in {pause:.1f}s")
+        if stats is not None:
+            stats.add(retries=1)
+        if limiter is not None:
+            limiter.defer(pause)
+        else:
+            time.sleep(pause)
+        delay *= 2
 
-def extract_author_info(description_url):
+def retry_after_seconds(response, default):
+    """Return the delay requested by a Retry-After header, or default."""
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    return max(0.0, retry_at.timestamp() - time.time())
+
+def extract_author_info(description_url, session=None, limiter=None, stats=None):
     """Extract author information from a Wikimedia Commons description page."""
     try:
-        response = requests.get(description_url, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Initialize author info
-        author_info = {
-            "author": None,
-            "license": None,
-            "description": None,
-            "date": None,
-            "source": None,
-            "url": description_url,
-            "formatted_attribution": None  # New field for the ready-made attribution
-        }
-        
-        # Look for the ready-made attribution text
-        attribution_input = soup.find('input', id='stockphoto_attribution')
-        if attribution_input and attribution_input.get('value'):
-            author_info["formatted_attribution"] = attribution_input.get('value')
-        
-        # Method 1: Find the information section table
-        info_section = soup.find('table', class_='fileinfotpl-type-information')
-        if info_section:
-            # Extract author - look for the specific td with id="fileinfotpl_aut"
-            author_td = soup.find('td', id='fileinfotpl_aut')
-            if author_td and author_td.find_next('td'):
-                author_info["author"] = author_td.find_next('td').get_text(strip=True)
-            else:
-                # Try the old method
-                author_header = info_section.find('th', string=re.compile(r'Author|Creator|Photographer', re.IGNORECASE))
-                if author_header:
-                    author_cell = author_header.find_next('td')
-                    if author_cell:
-                        author_info["author"] = author_cell.get_text(strip=True)
-            
-            # Extract license
-            license_header = info_section.find('th', string=re.compile(r'License|Copyright', re.IGNORECASE))
-            if license_header:
-                license_cell = license_header.find_next('td')
-                if license_cell:
-                    author_info["license"] = license_cell.get_text(strip=True)
-            
-            # Extract description
-            desc_header = info_section.find('th', string=re.compile(r'Description', re.IGNORECASE))
-            if desc_header:
-                desc_cell = desc_header.find_next('td')
-                if desc_cell:
-                    author_info["description"] = desc_cell.get_text(strip=True)
-            
-            # Extract date
-            date_header = info_section.find('th', string=re.compile(r'Date', re.IGNORECASE))
-            if date_header:
-                date_cell = date_header.find_next('td')
-                if date_cell:
-                    author_info["date"] = date_cell.get_text(strip=True)
-            
-            # Extract source
-            source_header = info_section.find('th', string=re.compile(r'Source', re.IGNORECASE))
-            if source_header:
-                source_cell = source_header.find_next('td')
-                if source_cell:
-                    author_info["source"] = source_cell.get_text(strip=True)
-        
-        # Method 2: Look for credit line
-        if not author_info["author"]:
-            credit_div = soup.find('div', class_='commons-file-information-credit')
-            if credit_div:
-                author_info["author"] = credit_div.get_text(strip=True)
-        
-        # Method 3: Look for structured data
-        structured_data_section = soup.find('h2', string=lambda s: s and 'Structured data' in s)
-        if structured_data_section:
-            # Look for license information in structured data
-            license_section = soup.find(string=lambda s: s and 'copyright license' in s.lower())
-            if license_section:
-                # Find the next element which might contain the license info
-                license_elem = license_section.find_next(['a', 'div', 'span'])
-                if license_elem:
-                    license_text = license_elem.get_text(strip=True)
-                    if license_text and not author_info["license"]:
-                        author_info["license"] = license_text
-            
-            # Look for author information in structured data
-            author_section = soup.find(string=lambda s: s and 'creator' in s.lower())
-            if author_section:
-                # Find the next element which might contain the author info
-                author_elem = author_section.find_next(['a', 'div', 'span'])
-                if author_elem:
-                    author_text = author_elem.get_text(strip=True)
-                    if author_text and not author_info["author"]:
-                        author_info["author"] = author_text
-        
-        # Method 4: Look for license templates
-        if not author_info["license"]:
-            # Look for Public Domain markers
-            pd_markers = [
-                'This file is in the public domain',
-                'This work is in the public domain',
-                'Public domain',
-                'PD-old',
-                'Creative Commons Public Domain Mark',
-                'CC0',
-                'CC-Zero'
-            ]
-            
-            for marker in pd_markers:
-                pd_match = soup.find(string=lambda s: s and marker in s)
-                if pd_match:
-                    author_info["license"] = "Public Domain"
-                    break
-            
-            # Look for GNU Free Documentation License
-            if not author_info["license"]:
-                gfdl_match = soup.find(string=lambda s: s and 'GNU Free Documentation License' in s)
-                if gfdl_match:
-                    # Try to find the version
-                    version_match = re.search(r'Version (\d+\.\d+)', gfdl_match)
-                    if version_match:
-                        author_info["license"] = f"GNU Free Documentation License, version {version_match.group(1)}"
-                    else:
-                        author_info["license"] = "GNU Free Documentation License"
-            
-            # Look for other license templates
-            if not author_info["license"]:
-                license_templates = soup.find_all('div', class_='licensetpl')
-                if license_templates:
-                    for template in license_templates:
-                        template_text = template.get_text(strip=True)
-                        if template_text:
-                            author_info["license"] = template_text
-                            break
-        
-        # Method 5: Look for the file information section
-        if not any(author_info.values()):
-            file_info = soup.find('div', class_='mw-parser-output')
-            if file_info:
-                # Look for paragraphs that might contain author info
-                paragraphs = file_info.find_all('p')
-                for p in paragraphs:
-                    p_text = p.get_text(strip=True)
-                    if 'author' in p_text.lower() or 'creator' in p_text.lower() or 'photographer' in p_text.lower():
-                        author_info["author"] = p_text
-                        break
-                
-                # Look for public domain mentions in paragraphs
-                if not author_info["license"]:
-                    for p in paragraphs:
-                        p_text = p.get_text(strip=True).lower()
-                        if 'public domain' in p_text or 'pd-old' in p_text or 'cc0' in p_text:
-                            author_info["license"] = "Public Domain"
-                            break
-        
-        # Method 6: Look for the information section with different class names
-        if not any(author_info.values()):
-            all_tables = soup.find_all('table')
-            for table in all_tables:
-                if 'fileinfotpl' in str(table.get('class', '')):
-                    rows = table.find_all('tr')
-                    for row in rows:
-                        header = row.find('th')
-                        if header:
-                            header_text = header.get_text(strip=True).lower()
-                            value = row.find('td')
-                            if value:
-                                value_text = value.get_text(strip=True)
-                                if 'author' in header_text or 'creator' in header_text or 'photographer' in header_text:
-                                    author_info["author"] = value_text
-                                elif 'license' in header_text or 'copyright' in header_text:
-                                    author_info["license"] = value_text
-                                elif 'description' in header_text:
-                                    author_info["description"] = value_text
-                                elif 'date' in header_text:
-                                    author_info["date"] = value_text
-                                elif 'source' in header_text:
-                                    author_info["source"] = value_text
-        
-        # Method 7: Look for the metadata section
-        metadata_section = soup.find('div', id='mw-imagepage-content')
-        if metadata_section and not any(author_info.values()):
-            # Look for spans with labels
-            spans = metadata_section.find_all('span')
-            for span in spans:
-                span_text = span.get_text(strip=True).lower()
-                if 'author' in span_text or 'creator' in span_text:
-                    next_sibling = span.next_sibling
-                    if next_sibling:
-                        author_info["author"] = next_sibling.get_text(strip=True) if hasattr(next_sibling, 'get_text') else str(next_sibling).strip()
-        
-        # Method 8: Direct search for specific elements
-        if not author_info["author"]:
-            # Look for the specific td with id="fileinfotpl_aut"
-            author_td = soup.find('td', id='fileinfotpl_aut')
-            if author_td and author_td.find_next('td'):
-                author_info["author"] = author_td.find_next('td').get_text(strip=True)
-            
-            # Look for photographer field in the summary table
-            photographer_row = soup.find('th', string='Photographer')
-            if photographer_row:
-                photographer_cell = photographer_row.find_next('td')
-                if photographer_cell:
-                    author_info["author"] = photographer_cell.get_text(strip=True)
-        
-        # Clean up the extracted data
-        for key, value in author_info.items():
-            if value:
-                # Remove excessive whitespace
-                author_info[key] = re.sub(r'\s+', ' ', value).strip()
-        
-        # Generate a formatted attribution if not already found
-        if not author_info["formatted_attribution"] and author_info["author"]:
-            license_short = extract_license_short(author_info["license"]) if author_info["license"] else "Unknown License"
-            author_info["formatted_attribution"] = f"{author_info['author']}, {license_short}, via Wikimedia Commons"
-        
-        return author_info
+        html = fetch_page(description_url, session=session, limiter=limiter, stats=stats)
+        return parse_author_info(html, description_url)
     
     except Exception as e:
         print(f"Error extracting author info from {description_url}: {e}")
@@ -311,6 +189,23 @@ def extract_author_info(description_url):
             "error": str(e)
         }
 
+def parse_author_info(html, description_url):
+    """Extract author information from the HTML of a Commons description page."""
+    author_info = extract_fields(html, description_url)
+    
+    # Clean up the extracted data
+    for key, value in author_info.items():
+        if value:
+            # Remove excessive whitespace
+            author_info[key] = re.sub(r'\s+', ' ', value).strip()
+    
+    # Generate a formatted attribution if not already found
+    if not author_info["formatted_attribution"] and author_info["author"]:
+        license_short = extract_license_short(author_info["license"]) if author_info["license"] else "Unknown License"
+        author_info["formatted_attribution"] = f"{author_info['author']}, {license_short}, via Wikimedia Commons"
+    
+    return author_info
+
 def extract_license_short(license_text):
     """Extract a short license description from the full license text."""
     if not license_text:
@@ -374,7 +269,66 @@ def process_single_url(image_url, name="Test Image"):
         print("Could not convert to description URL")
         return None
 
-def process_file(file_path, output_dir="output"):
+def scrape_items(image_items, workers=1, requests_per_second=1.0, use_cache=True):
+    """
+    Scrape attribution for a list of image items, optionally concurrently.
+    
+    Requests share one pooled session and a token bucket limiter, so at
+    most requests_per_second pages are fetched on average however many
+    workers run. With the defaults this behaves like the original serial
+    loop with a one-second pause per image.
+    
+    Args:
+        image_items (list): Items from extract_image_urls
+        workers (int): Number of pages fetched at the same time
+        requests_per_second (float): Average request rate to Commons
+        use_cache (bool): Answer from, and revalidate against, the on-disk
+            HTTP cache (http_cache.py)
+    
+    Returns:
+        list: Attribution results in input order, skipping items without a
+            description page URL
+    """
+    stats = ScrapeStats()
+    limiter = TokenBucket(requests_per_second, capacity=1.0)
+    session = CachedSession() if use_cache else requests.Session()
+    session.mount('https://', HTTPAdapter(pool_maxsize=workers))
+    session.headers['User-Agent'] = USER_AGENT
+    total = len(image_items)
+    done = [0]
+    done_lock = threading.Lock()
+    
+    def scrape(item):
+        description_url = convert_to_description_url(item['url'])
+        if not description_url:
+            print(f"Could not convert to description URL: {item['url']}")
+            return None
+        author_info = extract_author_info(description_url, session=session, limiter=limiter, stats=stats)
+        
+        # Add item name and original URL to the results
+        author_info["item_name"] = item["name"]
+        author_info["original_url"] = item["url"]
+        with done_lock:
+            done[0] += 1
+            print(f"[{done[0]}/{total}] {item['name']}: {description_url}")
+        return author_info
+    
+    start = time.perf_counter()
+    with session, ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        # map keeps the results in input order
+        results = [result for result in executor.map(scrape, image_items) if result is not None]
+    elapsed = time.perf_counter() - start
+    
+    errors = sum(1 for result in results if result.get("error"))
+    print(f"\nScraped {len(results)} of {total} images in {elapsed:.1f}s "
+          f"({len(results) / elapsed if elapsed else 0:.2f} images/s) with {workers} worker(s) at {requests_per_second:g} req/s")
+    print(f"Requests: {stats.requests}, retries: {stats.retries}, errors: {errors}, "
+          f"waiting for the rate limit: {stats.waited:.1f}s")
+    if use_cache:
+        print(session.cache.stats.report())
+    return results
+
+def process_file(file_path, output_dir="output", workers=1, requests_per_second=1.0, use_cache=True):
     """Process all image URLs in a JSON file and save the results."""
     print(f"Processing file: {file_path}")
     
@@ -389,25 +343,7 @@ def process_file(file_path, output_dir="output"):
     os.makedirs(output_dir, exist_ok=True)
     
     # Process each URL
-    results = []
-    for i, item in enumerate(image_items):
-        print(f"\nProcessing image {i+1}/{len(image_items)}: {item['name']}")
-        
-        description_url = convert_to_description_url(item['url'])
-        if description_url:
-            print(f"Description URL: {description_url}")
-            author_info = extract_author_info(description_url)
-            
-            # Add item name and original URL to the results
-            author_info["item_name"] = item["name"]
-            author_info["original_url"] = item["url"]
-            
-            results.append(author_info)
-            
-            # Be nice to the server
-            time.sleep(1)
-        else:
-            print(f"Could not convert to description URL: {item['url']}")
+    results = scrape_items(image_items, workers, requests_per_second, use_cache)
     
     # Save the results
     base_filename = os.path.basename(file_path).split('.')[0]
@@ -419,7 +355,7 @@ def process_file(file_path, output_dir="output"):
     print(f"\nResults saved to {output_path}")
     return results
 
-def process_file_sample(file_path, sample_size=5, output_dir="output"):
+def process_file_sample(file_path, sample_size=5, output_dir="output", workers=1, requests_per_second=1.0, use_cache=True):
     """Process a sample of image URLs in a JSON file and save the results."""
     print(f"Processing sample from file: {file_path}")
     
@@ -434,25 +370,7 @@ def process_file_sample(file_path, sample_size=5, output_dir="output"):
     os.makedirs(output_dir, exist_ok=True)
     
     # Process a sample of URLs
-    results = []
-    for i, item in enumerate(image_items[:sample_size]):
-        print(f"\nProcessing image {i+1}/{min(sample_size, len(image_items))}: {item['name']}")
-        
-        description_url = convert_to_description_url(item['url'])
-        if description_url:
-            print(f"Description URL: {description_url}")
-            author_info = extract_author_info(description_url)
-            
-            # Add item name and original URL to the results
-            author_info["item_name"] = item["name"]
-            author_info["original_url"] = item["url"]
-            
-            results.append(author_info)
-            
-            # Be nice to the server
-            time.sleep(1)
-        else:
-            print(f"Could not convert to description URL: {item['url']}")
+    results = scrape_items(image_items[:sample_size], workers, requests_per_second, use_cache)
     
     # Save the results
     base_filename = os.path.basename(file_path).split('.')[0]
@@ -623,6 +541,9 @@ def main():
     parser.add_argument('--output', default='output', help='Output directory')
     parser.add_argument('--sample', type=int, help='Process only a sample of URLs from the file')
     parser.add_argument('--debug', action='store_true', help='Print debug information about the page structure')
+    parser.add_argument('--workers', type=int, default=1, help='Number of pages to fetch concurrently')
+    parser.add_argument('--rps', type=float, default=1.0, help='Average requests per second to Wikimedia Commons')
+    parser.add_argument('--no-cache', action='store_true', help='Fetch every page instead of using the on-disk HTTP cache')
     
     args = parser.parse_args()
     
@@ -638,10 +559,10 @@ def main():
         process_single_url(args.url)
     elif args.file and args.sample:
         # Process a sample from a file
-        process_file_sample(args.file, args.sample, args.output)
+        process_file_sample(args.file, args.sample, args.output, args.workers, args.rps, not args.no_cache)
     elif args.file:
         # Process a file
-        process_file(args.file, args.output)
+        process_file(args.file, args.output, args.workers, args.rps, not args.no_cache)
     else:
         parser.print_help()
 